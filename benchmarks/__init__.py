@@ -0,0 +1,4 @@
+"""
+Benchmark suite of the mqtt-forger.
+Run it with `python -m benchmarks` from the root of the repository.
+"""
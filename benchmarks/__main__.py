@@ -0,0 +1,75 @@
+"""Command line interface of the benchmark suite."""
+
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.suite import SCENARIOS, compare, run
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def main(args=None) -> int:
+    """
+    Run the benchmark suite, print the results and compare them against the baseline.
+
+    :param args: Command line arguments (sys.argv is used by default).
+    :return: Exit code. 1 if a regression was found and --fail-on-regression is given.
+    """
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "scenarios", nargs="*", help="any of: %s" % ", ".join(SCENARIOS)
+    )
+    parser.add_argument("--quick", action="store_true", help="fewer runs and sizes")
+    parser.add_argument("--ip", help="broker ip for publish (default: in-process)")
+    parser.add_argument(
+        "--port", type=int, default=1883, help="broker port for publish"
+    )
+    parser.add_argument("--output", help="write results as json to this file")
+    parser.add_argument("--baseline", default=BASELINE, help="json file to compare to")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="store results as new baseline"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    options = parser.parse_args(args)
+
+    unknown = set(options.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error("unknown scenarios: %s" % ", ".join(sorted(unknown)))
+
+    results = run(
+        scenarios=options.scenarios or None,
+        quick=options.quick,
+        ip=options.ip,
+        port=options.port,
+    )
+
+    if options.output:
+        with open(options.output, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+
+    comparison = {}
+    if options.save_baseline:
+        with open(options.baseline, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+    elif os.path.exists(options.baseline):
+        with open(options.baseline, "r") as fh:
+            comparison = compare(results, json.load(fh), tolerance=options.tolerance)
+
+    for name, result in results["results"].items():
+        if "value" not in result:
+            print(f"{name:<24} skipped: {result.get('skipped')}")
+            continue
+        line = f"{name:<24} {result['value']:>14.3f} {result['unit']:<12}"
+        if name in comparison:
+            line += " {ratio:>6.2f}x baseline  {verdict}".format(**comparison[name])
+        print(line)
+
+    regressions = [n for n, c in comparison.items() if c["verdict"] == "regression"]
+    return 1 if regressions and options.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
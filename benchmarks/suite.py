@@ -0,0 +1,396 @@
+"""This module contains all scenarios of the benchmark suite and the comparison against a baseline."""
+
+__all__ = [
+    "SCENARIOS",
+    "run",
+    "compare",
+]
+
+import gc
+import platform
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from apscheduler.events import EVENT_JOB_SUBMITTED
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from forger.auxiliary.enums import ChannelTypes
+from forger.auxiliary.exceptions import OnConnectError
+from forger.engine.broker import Broker
+from forger.engine.channels import Channel, Channels
+from forger.engine.generator import Generator
+from forger.engine.metrics import Histogram
+from forger.engine.pipelines import Pipeline
+
+# name, frequency, channel_type, dead_frequency, dead_period, scale, replay_data, seed
+GENERATOR_SETTINGS = {
+    channel_type: ("Foo", 1, channel_type.value[0], 0, 0, [0, 10], None, 42)
+    for channel_type in ChannelTypes
+}
+GENERATOR_SETTINGS[ChannelTypes.REPLAY] = (
+    "Foo",
+    1,
+    "replay",
+    0,
+    0,
+    [0, 10],
+    list(np.linspace(-1, 1, 1000)),
+    42,
+)
+
+PAYLOAD_SIZES = (10, 1000, 100000)
+QUICK_PAYLOAD_SIZES = (10, 1000)
+SCHEDULER_SIZES = (1, 100, 10000)
+CHANNEL_SIZES = (1000, 10000)
+QUICK_CHANNEL_SIZES = (1000,)
+QUICK_SCHEDULER_SIZES = (1, 100)
+
+
+def _time_per_call(func: Callable, number: int, repeat: int = 5) -> float:
+    """
+    Measure the time a single call of func takes.
+    The garbage collector is turned off while measuring. The best of all repetitions is returned.
+
+    :param func: Function (without arguments) to measure.
+    :param number: Number of calls per repetition.
+    :param repeat: Number of repetitions.
+    :return: Time (in seconds) of a single call.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            best = min(best, (time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def _result(value: float, unit: str, higher_is_better: bool = False, **info) -> Dict:
+    """
+    Create a single benchmark result.
+
+    :param value: Measured value.
+    :param unit: Unit of the measured value.
+    :param higher_is_better: True if larger values are better (e.g. throughput).
+    :param info: Further information that is stored along the result but never compared.
+    :return: Result as dictionary.
+    """
+    return {
+        "value": value,
+        "unit": unit,
+        "higher_is_better": higher_is_better,
+        **info,
+    }
+
+
+def _create_channels(size: int) -> Channels:
+    """
+    Create a Channels instance with the given number of sine channels (each with a unique name).
+
+    :param size: Number of channels.
+    :return: Channels instance.
+    """
+    channels = Channels()
+    for cid in range(size):
+        # fill dict directly. adding one by one would make setup of large sizes slow.
+        channels.channels[cid] = Channel(
+            name=f"channel_{cid}",
+            scale=[0, 10],
+            frequency=1,
+            channel_type="sin",
+            dead_frequency=0,
+            dead_period=0,
+            replay_data=None,
+            seed=None,
+        )
+    return channels
+
+
+def bench_generator(quick: bool = False, **_) -> Dict:
+    """
+    Cost of a single sample of Generator.get_data per channel type.
+    """
+    results = {}
+    now = datetime.now()
+    for channel_type, settings in GENERATOR_SETTINGS.items():
+        generator = Generator(*settings)
+        seconds = _time_per_call(
+            lambda: generator.get_data(current_datetime=now),
+            number=2000 if quick else 20000,
+        )
+        results[f"generator.{channel_type.name.lower()}"] = _result(
+            seconds * 1e9, "ns/sample"
+        )
+    return results
+
+
+def bench_payload(quick: bool = False, **_) -> Dict:
+    """
+    Cost of building the data of one tick (Channels.get_data) for several numbers of channels.
+    """
+    results = {}
+    for size in QUICK_PAYLOAD_SIZES if quick else PAYLOAD_SIZES:
+        channels = _create_channels(size=size)
+        seconds = _time_per_call(
+            channels.get_data, number=max(1, 10000 // size), repeat=3
+        )
+        results[f"payload.{size}"] = _result(
+            seconds * 1e6, "us/payload", per_channel_ns=seconds * 1e9 / size
+        )
+    return results
+
+
+def bench_encode(quick: bool = False, **_) -> Dict:
+    """
+    Cost of encoding the data of one tick into its payload.
+    """
+    results = {}
+    for size in QUICK_PAYLOAD_SIZES if quick else PAYLOAD_SIZES:
+        channels = _create_channels(size=size)
+        data = channels.get_data()
+        seconds = _time_per_call(
+            lambda: Channels.encode(data).encode(),
+            number=max(1, 10000 // size),
+            repeat=3,
+        )
+        results[f"encode.{size}"] = _result(
+            seconds * 1e6,
+            "us/payload",
+            bytes=len(Channels.encode(data).encode()),
+        )
+    return results
+
+
+def bench_scheduler(quick: bool = False, **_) -> Dict:
+    """
+    Overhead of dispatching jobs for several numbers of pipelines.
+    Each pipeline is a job that does nothing, so only the scheduler itself is measured.
+    """
+    results = {}
+    duration = 1.5 if quick else 3.5
+    for size in QUICK_SCHEDULER_SIZES if quick else SCHEDULER_SIZES:
+        # aim for 1000 dispatches per second in total but run each job at least once per second.
+        frequency = min(10.0, max(1.0, 1000.0 / size))
+        lag = Histogram()
+        dispatched = [0]
+
+        def on_submit(event):
+            delay = datetime.now(scheduler.timezone) - event.scheduled_run_times[-1]
+            lag.observe(max(delay.total_seconds(), 0.0))
+
+        def noop():
+            dispatched[0] += 1
+
+        scheduler = BackgroundScheduler(
+            job_defaults={"misfire_grace_time": None, "coalesce": False}
+        )
+        scheduler.add_listener(on_submit, EVENT_JOB_SUBMITTED)
+        scheduler.start(paused=True)
+        for _ in range(size):
+            scheduler.add_job(noop, trigger="interval", seconds=1 / frequency)
+
+        cpu_start = time.process_time()
+        scheduler.resume()
+        time.sleep(duration)
+        scheduler.pause()
+        cpu = time.process_time() - cpu_start
+        scheduler.shutdown(wait=True)
+
+        # interval jobs fire for the first time after one interval.
+        target = size * int(duration * frequency)
+        results[f"scheduler.{size}"] = _result(
+            cpu * 1e6 / max(dispatched[0], 1),
+            "us/dispatch",
+            achieved_ratio=dispatched[0] / target,
+            lag_p50=lag.get_percentile(50),
+            lag_p99=lag.get_percentile(99),
+        )
+    return results
+
+
+def bench_publish(
+    quick: bool = False, ip: Optional[str] = None, port: Optional[int] = None, **_
+) -> Dict:
+    """
+    End-to-end throughput of Pipeline.publish against a broker.
+    The in-process broker is used unless ip and port of another broker are given.
+    """
+    if ip is None:
+        with Broker() as broker:
+            results = bench_publish(quick=quick, ip=broker.host, port=broker.port)
+            results["publish.throughput"]["broker_messages"] = broker.messages
+            return results
+
+    scheduler = BackgroundScheduler()
+    try:
+        pipeline = Pipeline(
+            pid=0, ip=ip, port=port, topic="bench", frequency=1, scheduler=scheduler
+        )
+    except OnConnectError as err:
+        return {"publish.throughput": {"skipped": str(err)}}
+
+    for cid in range(10):
+        pipeline.add_channel(name=f"channel_{cid}")
+
+    number = 2000 if quick else 20000
+    start = time.perf_counter()
+    for _ in range(number):
+        pipeline.publish()
+    # wait until everything was written to the network (but not forever).
+    deadline = start + 60
+    while (
+        pipeline.connection.metrics.queue_depth > 0 and time.perf_counter() < deadline
+    ):
+        time.sleep(0.001)
+    seconds = time.perf_counter() - start
+    pipeline.connection.close()
+
+    return {
+        "publish.throughput": _result(
+            number / seconds,
+            "msgs/s",
+            higher_is_better=True,
+            bytes_per_message=pipeline.metrics.bytes / number,
+        )
+    }
+
+
+def bench_channels(
+    quick: bool = False, ip: Optional[str] = None, port: Optional[int] = None, **_
+) -> Dict:
+    """
+    Sustained throughput of a Pipeline with per_channel=True (one message per channel and tick).
+    The data of a tick is only generated once, so encoding and sending are measured.
+    The in-process broker is used unless ip and port of another broker are given.
+    """
+    if ip is None:
+        with Broker() as broker:
+            return bench_channels(quick=quick, ip=broker.host, port=broker.port)
+
+    results = {}
+    for size in QUICK_CHANNEL_SIZES if quick else CHANNEL_SIZES:
+        try:
+            pipeline = Pipeline(
+                pid=0,
+                ip=ip,
+                port=port,
+                topic="bench",
+                frequency=1,
+                scheduler=BackgroundScheduler(),
+                per_channel=True,
+                queue_limit=size * 100,
+                fast_batches=True,
+            )
+        except OnConnectError as err:
+            return {f"channels.{size}": {"skipped": str(err)}}
+
+        pipeline.channels = _create_channels(size=size)
+        data = pipeline.channels.get_data()
+        ticks = max(10, (20000 if quick else 200000) // size)
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            topics, payloads = pipeline._encode(dict(data))
+            pipeline._send(topics=topics, payloads=payloads)
+        # wait until everything was written to the network (but not forever).
+        deadline = start + 60
+        while (
+            pipeline.connection.metrics.queue_depth > 0
+            and time.perf_counter() < deadline
+        ):
+            time.sleep(0.001)
+        seconds = time.perf_counter() - start
+        pipeline.connection.close()
+
+        results[f"channels.{size}"] = _result(
+            ticks * size / seconds,
+            "msgs/s",
+            higher_is_better=True,
+            us_per_tick=seconds * 1e6 / ticks,
+            dropped=pipeline.connection.metrics.dropped,
+        )
+    return results
+
+
+SCENARIOS = {
+    "generator": bench_generator,
+    "payload": bench_payload,
+    "encode": bench_encode,
+    "scheduler": bench_scheduler,
+    "publish": bench_publish,
+    "channels": bench_channels,
+}
+
+
+def run(
+    scenarios: Optional[List[str]] = None,
+    quick: bool = False,
+    ip: Optional[str] = None,
+    port: Optional[int] = None,
+) -> Dict:
+    """
+    Run the given scenarios.
+
+    :param scenarios: Names of scenarios to run (see SCENARIOS). All scenarios are run by default.
+    :param quick: Use fewer repetitions and skip the largest sizes.
+    :param ip: IP of the broker that is used by the publish scenario. The in-process broker by default.
+    :param port: Port of the broker that is used by the publish scenario.
+    :return: Dictionary with meta information and all results.
+    """
+    results = {}
+    for name in scenarios or list(SCENARIOS):
+        results.update(SCENARIOS[name](quick=quick, ip=ip, port=port))
+
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.2) -> Dict:
+    """
+    Compare results against a baseline.
+
+    :param results: Output of run.
+    :param baseline: Output of an earlier run.
+    :param tolerance: Relative change that is still accepted (0.2 -> 20 percent).
+    :return: Dictionary with ratio and verdict (ok, regression, improvement) per result.
+    """
+    comparison = {}
+    for name, result in results["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None or "value" not in result or "value" not in reference:
+            continue
+
+        ratio = result["value"] / reference["value"] if reference["value"] else 1.0
+        change = ratio - 1 if result["higher_is_better"] else 1 - ratio
+
+        if change < -tolerance:
+            verdict = "regression"
+        elif change > tolerance:
+            verdict = "improvement"
+        else:
+            verdict = "ok"
+
+        comparison[name] = {
+            "baseline": reference["value"],
+            "value": result["value"],
+            "unit": result["unit"],
+            "ratio": ratio,
+            "verdict": verdict,
+        }
+    return comparison
@@ -8,8 +8,90 @@ DEFAULT_PIPELINE_SETTINGS = {
     "dead_period": 0.0,
     "replay_data": None,
     "seed": None,
+    "replay_offset": 0,
 }
 
 MEMORY = 50
+# maximum number of received payloads that wait to be drawn by the plotter
+BUFFER_SIZE = 10000
+# frames per second the plotter aims for
+FPS = 30
+# room (relative to the shown time span) that is left on the right before the x axis is moved
+X_HEADROOM = 0.25
+# margin (relative to the data range) that is added above and below when the y axis is rescaled
+Y_MARGIN = 0.1
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
 DISPLAY_DATE_FORMAT = "%M:%S"
+
+# upper bounds (in seconds) of the histogram buckets used by forger.engine.metrics
+LATENCY_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9100
+BROKER_HOST = "127.0.0.1"
+# size (in bytes) of each segment file of forger.engine.spool.Spool
+SPOOL_SEGMENT_SIZE = 16 * 1024 * 1024
+# maximum size (in bytes) of all segment files of a spool
+SPOOL_MAX_BYTES = 1024 * 1024 * 1024
+# messages per second that are sent from a spool once the broker is available again
+SPOOL_RATE = 1000
+# seconds between two batches of spooled messages
+SPOOL_INTERVAL = 0.1
+# seconds a connection waits at most before its first attempt to reconnect. doubled after each failed attempt
+RECONNECT_MIN_DELAY = 0.5
+# upper bound (in seconds) of the delay between two attempts to reconnect
+RECONNECT_MAX_DELAY = 30.0
+# number of state transitions that are remembered per connection
+STATE_HISTORY = 100
+# number of topic aliases the in-process broker grants each mqtt 5 client (same as mosquitto)
+TOPIC_ALIAS_MAXIMUM = 10
+# number of messages a mqtt 5 connection publishes before it checks which topics deserve an alias
+ALIAS_INTERVAL = 1000
+# number of messages that may wait to be written to a single broker before a pipeline skips that broker
+TARGET_QUEUE_LIMIT = 1000
+# minimum time (in seconds) and number of intervals the achieved rate of a pipeline is measured over
+OVERRUN_WINDOW = 1.0
+OVERRUN_INTERVALS = 10
+# share of its frequency a pipeline has to achieve, otherwise the window counts as overrun
+OVERRUN_THRESHOLD = 0.9
+# number of overrun windows in a row before the overrun policy of a pipeline is applied
+OVERRUN_PATIENCE = 3
+# maximum number of ticks a pipeline publishes per run with the batch overrun policy
+OVERRUN_MAX_BATCH = 64
+# number of overrun decisions that are remembered per pipeline
+OVERRUN_HISTORY = 100
+# number of arrivals that are drawn at once by an arrival process
+ARRIVAL_CHUNK = 4096
+# minimum time (in seconds) between two arrivals of a burst, so each of them gets a tick of its own
+ARRIVAL_RESOLUTION = 1e-6
+# keys that are added to each payload of a pipeline when measuring latency and loss
+SEQUENCE_KEY = "_sequence"
+SENT_KEY = "_sent"
+# number of previous sequence numbers that are remembered to tell duplicates from late messages
+SEQUENCE_WINDOW = 1024
+# number of rows per segment file written by forger.engine.recorder
+SEGMENT_SIZE = 100000
+# seconds between two writes of received payloads to disk by forger.engine.recorder
+RECORD_INTERVAL = 0.5
+# seconds between two batches of received payloads processed by forger.engine.connections.MultiListener
+LISTEN_INTERVAL = 0.05
+# number of data points that a file based forger.engine.replay.Replay keeps in memory at once
+REPLAY_WINDOW = 65536
+# number of ticks a generator remembers its value for (see forger.engine.generator.Generator.get_sample)
+SAMPLE_CACHE_SIZE = 4
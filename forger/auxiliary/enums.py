@@ -4,6 +4,8 @@ This modules holds all enums that are used in the code base.
 
 __all__ = [
     "ChannelTypes",
+    "ConnectionStates",
+    "OverrunPolicies",
 ]
 
 from enum import Enum
@@ -14,3 +16,18 @@ class ChannelTypes(Enum):
     RANDOM = ["random", "rand", "rnd"]
     FIXED = ["fixed", "static", "constant", "const"]
     REPLAY = ["replay", "repeating", "custom"]
+
+
+class ConnectionStates(Enum):
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    DISCONNECTED = "disconnected"
+    RECONNECTING = "reconnecting"
+    CLOSED = "closed"
+
+
+class OverrunPolicies(Enum):
+    WARN = "warn"
+    THROTTLE = "throttle"
+    BATCH = "batch"
+    SHED = "shed"
@@ -7,13 +7,21 @@ __all__ = [
     "count_up",
     "get_new_id",
     "datestr2num",
+    "datestrs2num",
+    "to_datetime64",
+    "decode_payloads",
+    "compile_topic_filter",
+    "topic_matches",
 ]
 
+import json
+import re
 from datetime import datetime
 from re import search as research
-from typing import List
+from typing import Dict, Iterable, List, Pattern
 
 import matplotlib.dates as mdates
+import numpy as np
 
 from forger.auxiliary.constants import DATE_FORMAT
 
@@ -69,3 +77,83 @@ def datestr2num(date_string: str) -> int:
     :return Date as numeric value
     """
     return mdates.date2num(datetime.strptime(date_string, DATE_FORMAT))
+
+
+def datestrs2num(timestamps: Iterable) -> np.ndarray:
+    """
+    Convert many timestamps to numeric values at once.
+    :param timestamps: ISO 8601 strings or seconds since epoch.
+    :return Dates as numeric values. Timestamps that can not be converted become NaN.
+    """
+    return mdates.date2num(to_datetime64(timestamps))
+
+
+def to_datetime64(timestamps: Iterable) -> np.ndarray:
+    """
+    Convert many timestamps to datetime64 at once.
+    :param timestamps: ISO 8601 strings or seconds since epoch.
+    :return Array of datetime64 (microseconds). Timestamps that can not be converted become NaT.
+    """
+    timestamps = list(timestamps)
+    try:
+        values = np.asarray(timestamps)
+        if values.dtype.kind in "iuf":
+            micros = values.astype(float) * 1e6
+            result = np.full(len(micros), np.datetime64("NaT"), dtype="datetime64[us]")
+            finite = np.isfinite(micros)
+            result[finite] = micros[finite].astype("int64")
+            return result
+        return values.astype("datetime64[us]")
+    except (TypeError, ValueError):
+        if len(timestamps) == 1:
+            return np.array([np.datetime64("NaT")], dtype="datetime64[us]")
+        return np.concatenate([to_datetime64([value]) for value in timestamps])
+
+
+def decode_payloads(payloads: List[bytes]) -> List[Dict]:
+    """
+    Decode many json payloads at once.
+    All payloads are decoded by a single call. Only if that fails, they are decoded one by one.
+    :param payloads: Raw payloads.
+    :return List of decoded payloads. Payloads that are not valid json objects are skipped.
+    """
+    try:
+        decoded = json.loads(b"[" + b",".join(payloads) + b"]")
+        if len(decoded) != len(payloads):
+            raise ValueError("A payload contains more than one json value.")
+    except (ValueError, TypeError):
+        decoded = []
+        for payload in payloads:
+            try:
+                decoded.append(json.loads(payload))
+            except (ValueError, TypeError):
+                pass
+    return [payload for payload in decoded if isinstance(payload, dict)]
+
+
+def compile_topic_filter(topic_filter: str) -> Pattern:
+    """
+    Compile a mqtt topic filter (that may contain the wildcards + and #) into a regular expression.
+    :param topic_filter: Topic filter (e.g. 'forger/+/data' or 'forger/#').
+    :return: Compiled regular expression that matches all topics of the filter.
+    """
+    parts = []
+    for level in topic_filter.split("/"):
+        if level == "+":
+            parts.append("[^/]*")
+        elif level == "#":
+            # '#' also matches the parent level itself (e.g. 'a/#' matches 'a').
+            return re.compile("/".join(parts) + "(/.*)?$" if parts else ".*$")
+        else:
+            parts.append(re.escape(level))
+    return re.compile("/".join(parts) + "$")
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """
+    Check if a topic matches a mqtt topic filter.
+    :param topic_filter: Topic filter (e.g. 'forger/+/data' or 'forger/#').
+    :param topic: Topic to check.
+    :return: True if the topic matches the filter.
+    """
+    return compile_topic_filter(topic_filter).match(topic) is not None
@@ -0,0 +1,256 @@
+"""Use this module to publish on irregular times (e.g. like a fleet of real devices) instead of a fixed grid."""
+
+__all__ = [
+    "ArrivalProcess",
+    "Poisson",
+    "Bursts",
+    "OnOff",
+    "ArrivalTrigger",
+]
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from threading import Lock
+from typing import List, Optional, Tuple
+
+import numpy as np
+from apscheduler.triggers.base import BaseTrigger
+
+from forger.auxiliary.constants import ARRIVAL_CHUNK, ARRIVAL_RESOLUTION
+from forger.auxiliary.exceptions import InvalidInputValueError
+
+
+class ArrivalProcess(ABC):
+    """
+    Base class of all arrival processes. An arrival process decides when a pipeline publishes.
+    Its mean rate is the frequency of the pipeline.
+
+    Note:
+    - Arrival times are drawn in chunks of many arrivals at once. Each chunk starts at a renewal
+      point of the process, so chunks can simply be put one after the other.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        """
+        Initialize variables
+
+        :param seed: Seed of the random numbers, so the same arrival times can be drawn again.
+        """
+        self.seed = seed
+
+    def check(self, frequency: float):
+        """
+        Make sure that the process can be used with the given frequency.
+
+        :param frequency: Mean rate (in Hz).
+        """
+
+    @abstractmethod
+    def draw(
+        self, rng: np.random.Generator, frequency: float
+    ) -> Tuple[np.ndarray, float]:
+        """
+        Draw the arrival times of a single chunk.
+
+        :param rng: Random number generator to draw from.
+        :param frequency: Mean rate (in Hz).
+        :return: Sorted arrival times (in seconds since the start of the chunk) and length of the chunk.
+        """
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(seed={self.seed})"
+
+
+class Poisson(ArrivalProcess):
+    """
+    Arrivals that are independent of each other (exponentially distributed time between them).
+    """
+
+    def draw(
+        self, rng: np.random.Generator, frequency: float
+    ) -> Tuple[np.ndarray, float]:
+        gaps = rng.exponential(1 / frequency, size=ARRIVAL_CHUNK)
+        times = np.cumsum(gaps)
+        # the chunk ends with its last arrival, so the next chunk starts with a gap.
+        return times, times[-1]
+
+
+class Bursts(ArrivalProcess):
+    """
+    Periodic bursts of size arrivals that are spacing seconds apart.
+    A new burst starts every size / frequency seconds.
+
+    Note:
+    - Arrivals of a burst are at least ARRIVAL_RESOLUTION apart, so each message gets a tick
+      (and samples of the channels) of its own.
+    """
+
+    def __init__(self, size: int, spacing: float = 0.0):
+        """
+        Initialize variables
+
+        :param size: Number of arrivals per burst.
+        :param spacing: Time (in seconds) between two arrivals of a burst. 0 publishes a burst (almost) at once.
+        """
+        super().__init__()
+        if size < 1 or spacing < 0:
+            raise InvalidInputValueError(
+                f"Given size ({size}) must be at least 1 and spacing ({spacing}) must not be negative."
+            )
+        self.size = size
+        self.spacing = spacing
+
+    def check(self, frequency: float):
+        spacing = max(self.spacing, ARRIVAL_RESOLUTION)
+        if spacing * (self.size - 1) >= self.size / frequency:
+            raise InvalidInputValueError(
+                f"Bursts of {self.size} arrivals that are {spacing} s apart do not fit into "
+                f"a period of {self.size / frequency} s ({frequency} Hz)."
+            )
+
+    def draw(
+        self, rng: np.random.Generator, frequency: float
+    ) -> Tuple[np.ndarray, float]:
+        period = self.size / frequency
+        bursts = max(1, ARRIVAL_CHUNK // self.size)
+        times = np.arange(bursts)[:, None] * period + np.arange(self.size)[
+            None, :
+        ] * max(self.spacing, ARRIVAL_RESOLUTION)
+        return times.ravel(), bursts * period
+
+    def __repr__(self) -> str:
+        return f"Bursts(size={self.size}, spacing={self.spacing})"
+
+
+class OnOff(ArrivalProcess):
+    """
+    Arrivals that switch between on (Poisson arrivals) and off (no arrivals) at random.
+    The time spent in each state is exponentially distributed (a Markov-modulated Poisson process).
+    While on, the rate is higher than the frequency, so the mean rate is the frequency.
+    """
+
+    def __init__(self, on_time: float, off_time: float, seed: Optional[int] = None):
+        """
+        Initialize variables
+
+        :param on_time: Mean time (in seconds) of an on period.
+        :param off_time: Mean time (in seconds) of an off period.
+        :param seed: Seed of the random numbers, so the same arrival times can be drawn again.
+        """
+        super().__init__(seed=seed)
+        if on_time <= 0 or off_time < 0:
+            raise InvalidInputValueError(
+                f"Given on_time ({on_time}) must be greater than zero and off_time ({off_time}) must not be negative."
+            )
+        self.on_time = on_time
+        self.off_time = off_time
+
+    def draw(
+        self, rng: np.random.Generator, frequency: float
+    ) -> Tuple[np.ndarray, float]:
+        rate = frequency * (self.on_time + self.off_time) / self.on_time
+        # enough on and off periods for about one chunk of arrivals.
+        periods = max(1, int(ARRIVAL_CHUNK / (rate * self.on_time)))
+        on = rng.exponential(self.on_time, size=periods)
+        off = rng.exponential(self.off_time, size=periods)
+
+        # draw all arrivals as if the process was always on, then move each behind
+        # the off periods that come before its on period.
+        on_ends = np.cumsum(on)
+        on_times = np.sort(
+            rng.uniform(0, on_ends[-1], size=rng.poisson(rate * on_ends[-1]))
+        )
+        period = np.searchsorted(on_ends, on_times, side="right")
+        off_before = np.concatenate(([0.0], np.cumsum(off)))
+        return on_times + off_before[period], on_ends[-1] + off_before[-1]
+
+    def __repr__(self) -> str:
+        return (
+            f"OnOff(on_time={self.on_time}, off_time={self.off_time}, seed={self.seed})"
+        )
+
+
+class ArrivalTrigger(BaseTrigger):
+    """
+    Scheduler trigger that fires at the arrival times of an arrival process.
+
+    Note:
+    - Arrival times are drawn in chunks (see ArrivalProcess) and kept in microseconds until they were published.
+    - The scheduler may skip or merge runs that are late, so each run of the job takes all
+      arrivals that are due (see pop_due). That way no arrival is lost.
+    """
+
+    def __init__(
+        self,
+        process: ArrivalProcess,
+        frequency: float,
+        start_date: Optional[datetime] = None,
+    ):
+        """
+        Initialize variables
+
+        :param process: Arrival process to draw the arrival times from.
+        :param frequency: Mean rate (in Hz).
+        :param start_date: Time of the first possible arrival. Now by default.
+        """
+        process.check(frequency)
+        self.process = process
+        self.frequency = frequency
+        self.start = round(
+            (start_date.timestamp() if start_date else datetime.now().timestamp()) * 1e6
+        )
+        self.rng = np.random.default_rng(process.seed)
+        # arrival times and end of the last chunk (in microseconds since epoch).
+        self.times = np.empty(0, dtype=np.int64)
+        self._end = self.start
+        self._lock = Lock()
+
+    def _extend(self):
+        """
+        Draw the next chunk of arrival times.
+        """
+        times, length = self.process.draw(self.rng, self.frequency)
+        times = self._end + np.round(times * 1e6).astype(np.int64)
+        self.times = np.concatenate((self.times, times))
+        self._end += round(length * 1e6)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        with self._lock:
+            if previous_fire_time is None:
+                # (re)started (e.g. resumed after a pause). arrivals in the past are skipped.
+                threshold = max(self.start, round(now.timestamp() * 1e6))
+                self.times = self.times[np.searchsorted(self.times, threshold) :]
+                while self._end <= threshold:
+                    self._extend()
+                    self.times = self.times[np.searchsorted(self.times, threshold) :]
+                index = 0
+            else:
+                threshold = round(previous_fire_time.timestamp() * 1e6)
+                index = np.searchsorted(self.times, threshold, side="right")
+
+            while index >= len(self.times):
+                self._extend()
+            arrival = int(self.times[index])
+
+        return datetime.fromtimestamp(arrival / 1e6, timezone.utc)
+
+    def pop_due(self, now: float) -> List[int]:
+        """
+        Take all arrivals up to now.
+
+        :param now: Current time (in seconds since epoch).
+        :return: Times of the arrivals (in nanoseconds since epoch), oldest first.
+        """
+        now = round(now * 1e6)
+        with self._lock:
+            while self._end <= now:
+                self._extend()
+            end = np.searchsorted(self.times, now, side="right")
+            due, self.times = self.times[:end], self.times[end:]
+        return (due * 1000).tolist()
+
+    def __str__(self) -> str:
+        return f"arrivals[{self.process!r}, {self.frequency} Hz]"
+
+    def __repr__(self) -> str:
+        return f"<ArrivalTrigger ({self.process!r}, frequency={self.frequency})>"
@@ -0,0 +1,471 @@
+"""Use this module to run a minimal mqtt broker in the same process (e.g. for tests and benchmarks)."""
+
+__all__ = [
+    "Broker",
+]
+
+import asyncio
+import ssl
+import struct
+from threading import Event, Thread
+from typing import Dict, List, Optional, Tuple
+
+from forger.auxiliary.constants import BROKER_HOST, TOPIC_ALIAS_MAXIMUM
+from forger.auxiliary.misc import compile_topic_filter
+from forger.engine.protocol import (
+    TOPIC_ALIAS,
+    TOPIC_ALIAS_MAXIMUM_PROPERTY,
+    decode_variable_integer,
+    encode_remaining_length,
+)
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+# size of each mqtt 5 property value by property identifier.
+# None: variable byte integer, "s": string or binary data (with length), "p": string pair.
+PROPERTY_SIZES = {
+    **dict.fromkeys((0x01, 0x17, 0x19, 0x24, 0x25, 0x28, 0x29, 0x2A), 1),
+    **dict.fromkeys((0x13, 0x21, 0x22, 0x23), 2),
+    **dict.fromkeys((0x02, 0x11, 0x18, 0x27), 4),
+    **dict.fromkeys((0x03, 0x08, 0x09, 0x12, 0x15, 0x16, 0x1A, 0x1C, 0x1F), "s"),
+    0x0B: None,
+    0x26: "p",
+}
+
+
+def decode_properties(data: bytes, position: int) -> Tuple[Dict, int]:
+    """
+    Decode the properties of a mqtt 5 packet.
+
+    :param data: Data that contains the properties.
+    :param position: Position of the property length.
+    :return: Dictionary of integer properties (by identifier) and the position right after the properties.
+    """
+    length, position = decode_variable_integer(data, position)
+    end = position + length
+    properties = {}
+    while position < end:
+        identifier = data[position]
+        size = PROPERTY_SIZES[identifier]
+        position += 1
+        if size is None:
+            properties[identifier], position = decode_variable_integer(data, position)
+        elif size == "s":
+            position += 2 + struct.unpack_from("!H", data, position)[0]
+        elif size == "p":
+            for _ in range(2):
+                position += 2 + struct.unpack_from("!H", data, position)[0]
+        else:
+            properties[identifier] = int.from_bytes(
+                data[position : position + size], "big"
+            )
+            position += size
+    return properties, end
+
+
+def encode_publish(topic: bytes, payload: bytes, version: int = 4) -> bytes:
+    """
+    Encode a PUBLISH packet with QoS 0.
+
+    :param topic: Encoded topic.
+    :param payload: Payload to publish.
+    :param version: Protocol level (4 for mqtt 3.1.1, 5 for mqtt 5). Mqtt 5 packets carry no properties.
+    :return: Complete packet.
+    """
+    properties = b"\x00" if version == 5 else b""
+    body_length = 2 + len(topic) + len(properties) + len(payload)
+    return (
+        bytes((PUBLISH << 4,))
+        + encode_remaining_length(body_length)
+        + struct.pack("!H", len(topic))
+        + topic
+        + properties
+        + payload
+    )
+
+
+class _Session(asyncio.Protocol):
+    """
+    Connection of a single client to the broker.
+    """
+
+    def __init__(self, broker: "Broker"):
+        """
+        Initialize variables
+
+        :param broker: Broker that accepted the connection.
+        """
+        self.broker = broker
+        self.transport = None
+        self.buffer = bytearray()
+        self.filters = set()
+        self.version = 4
+        self.aliases = {}  # topic alias -> encoded topic (mqtt 5 only).
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.broker.sessions.add(self)
+
+    def connection_lost(self, exc):
+        self.broker.sessions.discard(self)
+        if self.filters:
+            self.broker.unsubscribe(self, list(self.filters))
+
+    def data_received(self, data: bytes):
+        buffer = self.buffer
+        buffer += data
+
+        while True:
+            # fixed header: packet type and flags, followed by the remaining length.
+            if len(buffer) < 2:
+                return
+            length = 0
+            multiplier = 1
+            position = 1
+            while True:
+                if position >= len(buffer):
+                    return
+                byte = buffer[position]
+                length += (byte & 0x7F) * multiplier
+                multiplier *= 128
+                position += 1
+                if not byte & 0x80:
+                    break
+            end = position + length
+            if len(buffer) < end:
+                return
+
+            header = buffer[0]
+            body = bytes(buffer[position:end])
+            del buffer[:end]
+            if header >> 4 == PUBLISH:
+                self.broker.packet_bytes += end
+            self.handle(packet_type=header >> 4, flags=header & 0x0F, body=body)
+
+            if self.transport.is_closing():
+                return
+
+    def handle(self, packet_type: int, flags: int, body: bytes):
+        """
+        Handle a single complete packet.
+
+        :param packet_type: Type of the packet (e.g. PUBLISH).
+        :param flags: Flags of the fixed header.
+        :param body: Variable header and payload of the packet.
+        """
+        if packet_type == PUBLISH:
+            topic_length = struct.unpack_from("!H", body)[0]
+            topic = body[2 : 2 + topic_length]
+            position = 2 + topic_length
+            qos = (flags >> 1) & 0x03
+            if qos:
+                packet_id = body[position : position + 2]
+                position += 2
+                reply = PUBACK if qos == 1 else PUBREC
+                self.transport.write(bytes((reply << 4, 2)) + packet_id)
+            if self.version == 5:
+                properties, position = decode_properties(body, position)
+                topic = self.resolve_alias(
+                    topic=topic, alias=properties.get(TOPIC_ALIAS)
+                )
+                if topic is None:
+                    self.transport.close()
+                    return
+            self.broker.publish(topic=topic, payload=body[position:])
+        elif packet_type == CONNECT:
+            self.connect(body=body)
+        elif packet_type == SUBSCRIBE:
+            self.subscribe(body=body)
+        elif packet_type == UNSUBSCRIBE:
+            filters = []
+            position = 2
+            if self.version == 5:
+                _, position = decode_properties(body, position)
+            while position < len(body):
+                length = struct.unpack_from("!H", body, position)[0]
+                filters.append(body[position + 2 : position + 2 + length].decode())
+                position += 2 + length
+            self.broker.unsubscribe(self, filters)
+            if self.version == 5:
+                payload = body[:2] + b"\x00" + bytes(len(filters))
+                self.transport.write(
+                    bytes((UNSUBACK << 4,))
+                    + encode_remaining_length(len(payload))
+                    + payload
+                )
+            else:
+                self.transport.write(bytes((UNSUBACK << 4, 2)) + body[:2])
+        elif packet_type == PUBREL:
+            self.transport.write(bytes((PUBCOMP << 4, 2)) + body[:2])
+        elif packet_type == PINGREQ:
+            self.transport.write(bytes((PINGRESP << 4, 0)))
+        elif packet_type == DISCONNECT:
+            self.transport.close()
+
+    def connect(self, body: bytes):
+        """
+        Handle a CONNECT packet. Mqtt 5 clients are told how many topic aliases they may use.
+
+        :param body: Variable header and payload of the packet.
+        """
+        name_length = struct.unpack_from("!H", body)[0]
+        self.version = body[2 + name_length]
+
+        if self.version == 5:
+            properties = bytes((TOPIC_ALIAS_MAXIMUM_PROPERTY,)) + struct.pack(
+                "!H", self.broker.topic_alias_maximum
+            )
+            payload = (
+                b"\x00\x00" + encode_remaining_length(len(properties)) + properties
+            )
+            self.transport.write(
+                bytes((CONNACK << 4,)) + encode_remaining_length(len(payload)) + payload
+            )
+        else:
+            self.transport.write(bytes((CONNACK << 4, 2, 0, 0)))
+
+    def resolve_alias(self, topic: bytes, alias: Optional[int]) -> Optional[bytes]:
+        """
+        Remember or look up the topic of a topic alias.
+
+        :param topic: Encoded topic of the packet (empty if only the alias is given).
+        :param alias: Topic alias of the packet (if any).
+        :return: Encoded topic or None if the alias is unknown or invalid.
+        """
+        if alias is None:
+            return topic or None
+        if not 0 < alias <= self.broker.topic_alias_maximum:
+            return None
+        if topic:
+            self.aliases[alias] = topic
+            return topic
+        return self.aliases.get(alias)
+
+    def subscribe(self, body: bytes):
+        """
+        Handle a SUBSCRIBE packet. All subscriptions are granted with QoS 0.
+
+        :param body: Variable header and payload of the packet.
+        """
+        filters = []
+        position = 2
+        if self.version == 5:
+            _, position = decode_properties(body, position)
+        while position < len(body):
+            length = struct.unpack_from("!H", body, position)[0]
+            filters.append(body[position + 2 : position + 2 + length].decode())
+            position += 3 + length
+
+        self.broker.subscribe(self, filters)
+        properties = b"\x00" if self.version == 5 else b""
+        payload = body[:2] + properties + bytes(len(filters))
+        self.transport.write(
+            bytes((SUBACK << 4,)) + encode_remaining_length(len(payload)) + payload
+        )
+
+
+class Broker:
+    """
+    Minimal mqtt 3.1.1 and mqtt 5 broker that runs an asyncio event loop in a background thread.
+    It accepts CONNECT, PUBLISH, SUBSCRIBE and friends on a local tcp port and counts what it receives.
+
+    Note:
+    - Messages are forwarded to subscribers with QoS 0. Retained messages and sessions are not stored.
+    - Mqtt 5 clients may use topic aliases. All other properties are ignored and not forwarded.
+    """
+
+    def __init__(
+        self,
+        host: str = BROKER_HOST,
+        port: int = 0,
+        topic_alias_maximum: int = TOPIC_ALIAS_MAXIMUM,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ):
+        """
+        Initialize variables
+
+        :param host: Host to bind to.
+        :param port: Port to bind to. By default any free port is used.
+        :param topic_alias_maximum: Number of topic aliases each mqtt 5 client may use.
+        :param ssl_context: Server context (with certificate and key) to accept TLS connections only.
+        """
+        self.host = host
+        self.port = port
+        self.topic_alias_maximum = topic_alias_maximum
+        self.ssl_context = ssl_context
+        self.messages = 0
+        self.bytes = 0
+        self.packet_bytes = 0
+
+        self.sessions = set()
+        self.subscriptions = {}
+        self._routes = {}
+
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    def __enter__(self) -> "Broker":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self) -> "Broker":
+        """
+        Start accepting connections. Returns as soon as the broker is ready.
+
+        :return: This Broker instance.
+        """
+        ready = Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._server = self._loop.run_until_complete(
+                    self._loop.create_server(
+                        lambda: _Session(self),
+                        self.host,
+                        self.port,
+                        ssl=self.ssl_context,
+                    )
+                )
+                self.port = self._server.sockets[0].getsockname()[1]
+            except Exception as err:
+                errors.append(err)
+                ready.set()
+                self._loop.close()
+                return
+
+            ready.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop(self):
+        """
+        Close all connections and stop the broker.
+        """
+        if self._thread is None:
+            return
+
+        def shutdown():
+            self._server.close()
+            for session in list(self.sessions):
+                session.transport.close()
+            # the sockets are closed in the next iteration of the loop, so stop after that.
+            self._loop.call_soon(self._loop.stop)
+
+        self._loop.call_soon_threadsafe(shutdown)
+        self._thread.join()
+        self._thread = None
+
+    def get_stats(self) -> Dict:
+        """
+        Get what the broker received so far.
+
+        :return: Dictionary with number of messages, payload bytes and bytes of all PUBLISH packets.
+        """
+        return {
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "packet_bytes": self.packet_bytes,
+            "sessions": len(self.sessions),
+        }
+
+    def publish(self, topic: bytes, payload: bytes):
+        """
+        Count a message and forward it to all subscribers of its topic.
+
+        :param topic: Encoded topic of the message.
+        :param payload: Payload of the message.
+        """
+        self.messages += 1
+        self.bytes += len(payload)
+
+        sessions = self._routes.get(topic)
+        if sessions is None:
+            sessions = self._routes[topic] = self._get_subscribers(topic.decode())
+
+        packets = {}
+        for session in sessions:
+            packet = packets.get(session.version)
+            if packet is None:
+                packet = packets[session.version] = encode_publish(
+                    topic=topic, payload=payload, version=session.version
+                )
+            session.transport.write(packet)
+
+    def subscribe(self, session: _Session, filters: List[str]):
+        """
+        Add subscriptions of a session.
+
+        :param session: Session that subscribes.
+        :param filters: Topic filters to subscribe to.
+        """
+        for topic_filter in filters:
+            if topic_filter not in self.subscriptions:
+                self.subscriptions[topic_filter] = (
+                    compile_topic_filter(topic_filter),
+                    set(),
+                )
+            self.subscriptions[topic_filter][1].add(session)
+            session.filters.add(topic_filter)
+        self._routes = {}
+
+    def unsubscribe(self, session: _Session, filters: List[str]):
+        """
+        Remove subscriptions of a session.
+
+        :param session: Session that unsubscribes.
+        :param filters: Topic filters to unsubscribe from.
+        """
+        for topic_filter in filters:
+            session.filters.discard(topic_filter)
+            _, sessions = self.subscriptions.get(topic_filter, (None, set()))
+            sessions.discard(session)
+            if not sessions:
+                self.subscriptions.pop(topic_filter, None)
+        self._routes = {}
+
+    def _get_subscribers(self, topic: str) -> List[_Session]:
+        """
+        Find all sessions that subscribed to the given topic.
+
+        :param topic: Topic to look up.
+        :return: List of sessions (each session only once).
+        """
+        subscribers = set()
+        for pattern, sessions in self.subscriptions.values():
+            if pattern.match(topic):
+                subscribers |= sessions
+        return list(subscribers)
+
+    def get_address(self) -> Tuple:
+        """
+        Get address information (host and port) the broker is listening on.
+
+        :return: host and port as tuple.
+        """
+        return self.host, self.port
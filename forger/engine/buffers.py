@@ -0,0 +1,221 @@
+"""This module contains buffers that keep the latest data points of a channel."""
+
+__all__ = [
+    "RingBuffer",
+    "MinMaxBuffer",
+    "ChannelStore",
+]
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated buffer of fixed size. Adding a value overwrites the oldest one.
+
+    Note:
+    - Every value is written twice into an array of double size.
+      That way the values (oldest to newest) are always a contiguous view and reading never copies.
+    """
+
+    def __init__(self, size: int, fill_value: float = np.nan):
+        """
+        Initialize variables
+
+        :param size: Number of values to keep.
+        :param fill_value: Initial value of all entries.
+        """
+        self.size = size
+        self.data = np.full(2 * size, fill_value, dtype=float)
+        self.index = 0  # position that will be overwritten next.
+        self.trailing_nans = size if np.isnan(fill_value) else 0
+
+    def append(self, value: float):
+        """
+        Add a new value and drop the oldest one.
+
+        :param value: Value to add. None is stored as NaN.
+        """
+        if value is None or value != value:
+            value = np.nan
+            self.trailing_nans += 1
+        else:
+            self.trailing_nans = 0
+
+        self.data[self.index] = value
+        self.data[self.index + self.size] = value
+        self.index = (self.index + 1) % self.size
+
+    def get(self) -> np.ndarray:
+        """
+        Get all values (oldest to newest).
+
+        :return: Read-only view of all values.
+        """
+        view = self.data[self.index : self.index + self.size]
+        view.flags.writeable = False
+        return view
+
+    def is_empty(self) -> bool:
+        """
+        Check if the buffer holds no valid value (only NaN).
+
+        :return: True if all values are NaN.
+        """
+        return self.trailing_nans >= self.size
+
+
+class MinMaxBuffer:
+    """
+    Buffer that keeps the last size data points (x and y) reduced to a fixed number of buckets.
+    Each bucket only keeps its lowest and highest value (in the order they arrived).
+    Drawing them looks like drawing all data points, but costs at most 2 * buckets points.
+
+    Note:
+    - The buckets are updated with every new data point. Nothing is recomputed when reading.
+    - If a bucket would only hold a single data point (size <= buckets), all data points are kept as they are.
+    - Like in RingBuffer, every point is written twice, so reading never copies.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        buckets: int,
+        fill_x: float = np.nan,
+        fill_y: float = np.nan,
+    ):
+        """
+        Initialize variables
+
+        :param size: Number of data points to keep.
+        :param buckets: Maximum number of buckets (e.g. width of the plot in pixels).
+        :param fill_x: Initial x value of all entries.
+        :param fill_y: Initial y value of all entries.
+        """
+        self.size = size
+        self.bucket_size = -(-size // max(1, buckets))
+        self.width = 1 if self.bucket_size == 1 else 2  # points per bucket.
+        self.points = self.width * -(-size // self.bucket_size)
+
+        self.x = np.full(2 * self.points, fill_x, dtype=float)
+        self.y = np.full(2 * self.points, fill_y, dtype=float)
+        self.index = 0  # position where the next bucket starts.
+        self.start = 0  # position of the current bucket.
+        self.count = 0  # data points in the current bucket.
+        self.low = None  # x and y of the lowest value in the current bucket.
+        self.high = None  # x and y of the highest value in the current bucket.
+        self.trailing_nans = size if np.isnan(fill_y) else 0
+
+    def append(self, x: float, y: float):
+        """
+        Add a new data point. Drops the oldest bucket when a new bucket is started.
+
+        :param x: X value of the data point.
+        :param y: Y value of the data point. None is stored as NaN.
+        """
+        if y is None or y != y:
+            y = np.nan
+            self.trailing_nans += 1
+        else:
+            self.trailing_nans = 0
+
+        if not self.count:
+            self.start = self.index
+            self.index = (self.index + self.width) % self.points
+            self.low = self.high = None
+
+        if y == y:
+            if self.low is None or y < self.low[1]:
+                self.low = (x, y)
+            if self.high is None or y > self.high[1]:
+                self.high = (x, y)
+
+        if self.low is None:
+            bucket = [(x, np.nan)] * self.width
+        elif self.width == 1:
+            bucket = [self.low]
+        else:
+            bucket = sorted((self.low, self.high))
+
+        for offset, (bucket_x, bucket_y) in enumerate(bucket):
+            position = self.start + offset
+            self.x[position] = self.x[position + self.points] = bucket_x
+            self.y[position] = self.y[position + self.points] = bucket_y
+
+        self.count = (self.count + 1) % self.bucket_size
+
+    def get(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get x and y values of all buckets (oldest to newest).
+
+        :return: Read-only views of x and y values.
+        """
+        x = self.x[self.index : self.index + self.points]
+        y = self.y[self.index : self.index + self.points]
+        x.flags.writeable = False
+        y.flags.writeable = False
+        return x, y
+
+    def is_empty(self) -> bool:
+        """
+        Check if none of the last size data points is valid (only NaN).
+
+        :return: True if all y values are NaN.
+        """
+        return self.trailing_nans >= self.size
+
+
+class ChannelStore:
+    """
+    Keeps the last size data points of all channels that are published on a single topic.
+    All buffers are aligned, so the newest value of each channel belongs to the newest timestamp.
+    """
+
+    def __init__(self, size: int):
+        """
+        Initialize variables
+
+        :param size: Number of data points to keep per channel.
+        """
+        self.size = size
+        self.timestamps = RingBuffer(size=size)
+        self.channels = {}
+        self.count = 0
+
+    def append(self, x: float, payload: Dict):
+        """
+        Add the data points of a payload. Channels that are not known yet get a new buffer.
+
+        :param x: Timestamp of the payload (as numeric value).
+        :param payload: Decoded payload without timestamp.
+        """
+        self.timestamps.append(x)
+        for name, buffer in self.channels.items():
+            value = payload.get(name)
+            buffer.append(value if isinstance(value, (int, float)) else None)
+
+        for name in payload.keys() - self.channels.keys():
+            value = payload[name]
+            buffer = self.channels[name] = RingBuffer(size=self.size)
+            buffer.append(value if isinstance(value, (int, float)) else None)
+
+        self.count += 1
+
+    def get(self, channel: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get timestamps and values of a channel (oldest to newest).
+
+        :param channel: Name of the channel.
+        :return: Read-only views of timestamps and values.
+        """
+        return self.timestamps.get(), self.channels[channel].get()
+
+    def get_channels(self) -> List[str]:
+        """
+        Get the names of all channels.
+
+        :return: List of channel names.
+        """
+        return list(self.channels)
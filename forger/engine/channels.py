@@ -7,10 +7,14 @@ __all__ = [
 
 import json
 from datetime import datetime
-from typing import List, Optional, Union
+from threading import Lock
+from time import perf_counter, time_ns
+from typing import Container, Dict, List, Optional, Union
 
 from forger.auxiliary.misc import get_new_id
 from forger.engine.generator import Generator
+from forger.engine.profiler import TRACER
+from forger.engine.replay import Replay
 
 
 class Channel:
@@ -26,8 +30,9 @@ class Channel:
         channel_type: str,
         dead_frequency: float,
         dead_period: float,
-        replay_data: Optional[List],
+        replay_data: Optional[Union[List, Replay]],
         seed: Optional[int],
+        replay_offset: int = 0,
     ):
         """
         Initialize variables
@@ -50,7 +55,56 @@ class Channel:
             dead_period=dead_period,
             replay_data=replay_data,
             seed=seed,
+            replay_offset=replay_offset,
         )
+        # keep the (shared) replay data of the generator instead of the given one.
+        self.replay_data = self.generator.replay_data
+
+        self._pending = {}
+        self._pending_lock = Lock()
+
+    def update(
+        self,
+        scale: Optional[List[Union[float, int]]] = None,
+        frequency: Optional[float] = None,
+        dead_frequency: Optional[float] = None,
+        dead_period: Optional[float] = None,
+    ):
+        """
+        Change the settings of this channel while it is running.
+        Changes are not applied right away but at the beginning of the next tick of its pipeline.
+        That way all changes of one call are applied at once and never in the middle of a payload.
+
+        :param scale: The new lower/upper scale. Pass an empty list to turn off scaling.
+        :param frequency: New frequency (in Hertz) in that the data will repeat itself.
+        :param dead_frequency: New frequency in that the dead period will be applied again.
+        :param dead_period: New time in seconds that the channel will not produce any data.
+        """
+        changes = {
+            "scale": scale,
+            "frequency": frequency,
+            "dead_frequency": dead_frequency,
+            "dead_period": dead_period,
+        }
+
+        with self._pending_lock:
+            self._pending.update(
+                {key: value for key, value in changes.items() if value is not None}
+            )
+
+    def apply_pending(self):
+        """
+        Apply all changes that were requested by update since the last tick.
+        """
+        if not self._pending:
+            return
+
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+
+        for key, value in pending.items():
+            setattr(self, key, value)
+            setattr(self.generator, key, value)
 
 
 class Channels:
@@ -72,8 +126,9 @@ class Channels:
         channel_type: str,
         dead_frequency: float,
         dead_period: float,
-        replay_data: Optional[List],
+        replay_data: Optional[Union[List, Replay]],
         seed: Optional[int],
+        replay_offset: int = 0,
     ) -> Channel:
         """
         Add new channel to dict of channels.
@@ -84,8 +139,9 @@ class Channels:
         :param channel_type: Type of channel (e.g. sin, cos, ...).
         :param dead_frequency: Frequency in that the dead period will be applied again.
         :param dead_period: Time in seconds that the channel will not produce any data.
-        :param replay_data: List of data points that will be replayed.
+        :param replay_data: List of data points that will be replayed. Pass a Replay to replay by time.
         :param seed: Integer to set as seed so random values are reproducible.
+        :param replay_offset: Position in the replay data to start at.
         :return: Instance of Channel class that has just been added.
         """
         cid = get_new_id(self.channels)
@@ -99,10 +155,22 @@ class Channels:
             dead_period=dead_period,
             replay_data=replay_data,
             seed=seed,
+            replay_offset=replay_offset,
         )
 
         return self.channels[cid]
 
+    def attach(self, channel: Channel) -> Channel:
+        """
+        Add an existing channel (e.g. of another pipeline) to dict of channels.
+        Its generator is shared, so it is only evaluated once per tick.
+
+        :param channel: Channel instance to add.
+        :return: The given Channel instance.
+        """
+        self.channels[get_new_id(self.channels)] = channel
+        return channel
+
     def remove(self, channel_to_remove: Channel):
         """
         Removes a given Channel instance from the dict of channels.
@@ -113,41 +181,54 @@ class Channels:
             if self.channels[cid] is channel_to_remove:
                 self.channels.pop(cid)
 
-    def _get_overall_output(self, name: str, time: Optional[datetime] = None) -> float:
+    def get_data(self, tick: Optional[int] = None, skip: Container[str] = ()) -> Dict:
         """
-        Get the combined output of all generators.
-
-        :param name: Name of channel that the data should be extracted from.
-        :param time: Timestamp that the data should be extracted from.
-        :return: Sum of all values of each channel on this pipeline.
+        Gather the data of all generators.
+        :param tick: Time of the tick (in nanoseconds since epoch). Now by default.
+            Generators that are shared with other pipelines are only evaluated once per tick.
+        :param skip: Names of channels that are not evaluated (e.g. shed by the overrun policy of a pipeline).
+        :return: current data as dictionary
         """
-        if not time:
-            time = datetime.now()
-
-        return sum(
-            [
-                channel.generator.get_data(current_datetime=time)
-                for cid, channel in self.channels.items()
-                if channel.name == name
-            ]
-        )
-
-    def _get_unique_channels(self):
+        for channel in list(self.channels.values()):
+            channel.apply_pending()
+
+        if tick is None:
+            tick = time_ns()
+        time = datetime.fromtimestamp(tick / 1e9)
+        data = {"timestamp": time.isoformat(timespec="microseconds")}
+
+        # read the flag once, tracing may be started or stopped by another thread meanwhile.
+        tracing = TRACER.enabled
+        if tracing:
+            start = perf_counter()
+
+        # sum up all generators that output on the same channel (name) in one go.
+        values = {}
+        for channel in list(self.channels.values()):
+            if channel.name in skip:
+                continue
+            values[channel.name] = values.get(
+                channel.name, 0.0
+            ) + channel.generator.get_sample(tick=tick, current_datetime=time)
+        data.update(values)
+
+        if tracing:
+            TRACER.record(stage="generate", duration=perf_counter() - start)
+
+        return data
+
+    @staticmethod
+    def encode(data: Dict) -> str:
         """
-        Extract the unique channel names since multiple generators can output on the same channel (name).
+        Pack the given data into a nice json.
+        :param data: Data as returned by get_data.
+        :return: data as json string
         """
-        return list(set([channel.name for key, channel in self.channels.items()]))
+        return json.dumps(data)
 
     def get_payload(self) -> str:
         """
         Gather the data of all generators and pack it into a nice json.
-        :return: current payload as dictionary
+        :return: current payload as json string
         """
-        time = datetime.now()
-        data = {"timestamp": time.isoformat()}
-        channels = self._get_unique_channels()
-
-        for channel in channels:
-            data[channel] = self._get_overall_output(channel, time)
-
-        return json.dumps(data)
+        return self.encode(self.get_data())
@@ -1,34 +1,327 @@
 """This module contains all Connection classes that are used by the manager class."""
 
 __all__ = [
+    "TopicAliases",
+    "Backoff",
     "Connection",
     "Listener",
+    "MultiListener",
 ]
 
-from typing import Callable, Tuple
+import heapq
+import inspect
+import random
+import struct
+import time
+from collections import deque
+from threading import Event, Lock, Thread, current_thread
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 
-from forger.auxiliary.exceptions import OnConnectError
+from forger.auxiliary.constants import (
+    ALIAS_INTERVAL,
+    LISTEN_INTERVAL,
+    MEMORY,
+    RECONNECT_MAX_DELAY,
+    RECONNECT_MIN_DELAY,
+    SPOOL_INTERVAL,
+    STATE_HISTORY,
+)
+from forger.auxiliary.enums import ConnectionStates
+from forger.auxiliary.exceptions import InvalidInputValueError, OnConnectError
+from forger.auxiliary.misc import compile_topic_filter, datestrs2num, decode_payloads
+from forger.engine.buffers import ChannelStore
+from forger.engine.metrics import ConnectionMetrics
+from forger.engine.protocol import MESSAGE_EXPIRY, TOPIC_ALIAS, encode_remaining_length
+from forger.engine.spool import Spool
+from forger.engine.tls import TLSPool
+
+
+class TopicAliases:
+    """
+    Assigns the topic aliases of a mqtt 5 connection to the topics that are published most often.
+    Messages with an alias only carry the alias instead of the whole topic.
+
+    Note:
+    - Aliases are handed out as long as there are free ones. After that, the topics are reviewed
+      from time to time and aliases move to topics that were published more than twice as often.
+      That way equally busy topics keep their aliases.
+    - The topic has to be sent along with its alias once, whenever an alias is (re)assigned.
+    """
+
+    def __init__(self, maximum: int, interval: int = ALIAS_INTERVAL):
+        """
+        Initialize variables
+
+        :param maximum: Number of aliases the broker accepts (topic alias maximum of its CONNACK).
+        :param interval: Minimum number of messages between two reviews.
+        """
+        self.maximum = maximum
+        self.interval = interval
+        self.aliases = {}  # topic -> alias
+        self.announced = set()  # topics whose alias is known by the broker.
+        self.counts = {}  # topic -> messages since the last review.
+        self.messages = 0
+
+    def get(self, topic: str) -> Tuple[int, bool]:
+        """
+        Get the alias to use for the next message of a topic.
+
+        :param topic: Topic of the message.
+        :return: Alias (0 if the topic has none) and whether the topic has to be sent along.
+        """
+        counts = self.counts
+        counts[topic] = counts.get(topic, 0) + 1
+        self.messages += 1
+        # every topic is counted a few times before aliases are moved.
+        if self.messages >= max(self.interval, 4 * len(counts)):
+            self._review()
+
+        alias = self.aliases.get(topic)
+        if alias is None:
+            if len(self.aliases) >= self.maximum:
+                return 0, True
+            alias = self.aliases[topic] = len(self.aliases) + 1
+
+        if topic in self.announced:
+            return alias, False
+        self.announced.add(topic)
+        return alias, True
+
+    def _review(self):
+        """
+        Move aliases from rarely to often published topics and start counting again.
+        """
+        counts = self.counts
+        if len(counts) > len(self.aliases):
+            coldest = sorted(self.aliases, key=lambda topic: counts.get(topic, 0))
+            hottest = heapq.nlargest(
+                len(coldest),
+                (topic for topic in counts if topic not in self.aliases),
+                key=counts.get,
+            )
+            for cold, hot in zip(coldest, hottest):
+                if counts[hot] <= 2 * counts.get(cold, 0):
+                    break
+                self.aliases[hot] = self.aliases.pop(cold)
+                self.announced.discard(cold)
+
+        self.counts = {}
+        self.messages = 0
+
+
+class Backoff:
+    """
+    Exponential backoff with jitter for the delay between two attempts to reconnect.
+    The upper bound of the delay doubles with each failed attempt. The delay itself is drawn
+    from the upper half of it, so connections that were lost at the same time do not all
+    come back at the same time.
+    """
+
+    def __init__(
+        self,
+        min_delay: float = RECONNECT_MIN_DELAY,
+        max_delay: float = RECONNECT_MAX_DELAY,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize variables
+
+        :param min_delay: Upper bound (in seconds) of the delay before the first attempt.
+        :param max_delay: Upper bound (in seconds) of all delays.
+        :param seed: Seed of the jitter (e.g. to get the same delays in tests).
+        """
+        if not 0 < min_delay <= max_delay:
+            raise InvalidInputValueError(
+                f"Given delays ({min_delay}, {max_delay}) must be greater than zero and min_delay <= max_delay."
+            )
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.attempts = 0
+        self._random = random.Random(seed)
+
+    def get_delay(self) -> float:
+        """
+        Get the delay before the next attempt and count the attempt.
+
+        :return: Delay in seconds.
+        """
+        # the exponent is bounded, so it never overflows no matter how long the broker is gone.
+        bound = min(self.min_delay * 2 ** min(self.attempts, 32), self.max_delay)
+        self.attempts += 1
+        return self._random.uniform(bound / 2, bound)
+
+    def reset(self):
+        """
+        Start with the shortest delay again (e.g. once a connection was established).
+        """
+        self.attempts = 0
+
+
+class _PacketQueue:
+    """
+    Adapter to the internals of the mqtt client that queue prebuilt packets.
+    paho has no public way to do so. If the installed version does not have them (with the expected signature),
+    available is False and messages have to be published one by one instead.
+    """
+
+    def __init__(self, client: mqtt.Client):
+        """
+        Check the internals of the given client.
+
+        :param client: Client to queue packets with.
+        """
+        self.client = client
+        try:
+            client._mid_generate
+            parameters = list(inspect.signature(client._packet_queue).parameters)
+        except (AttributeError, TypeError, ValueError):
+            parameters = []
+        self.available = parameters[:5] == ["command", "packet", "mid", "qos", "info"]
+
+    def get_mid(self) -> int:
+        """
+        Get the message id of the next packet.
+
+        :return: New message id.
+        """
+        return self.client._mid_generate()
+
+    def put(self, packet: bytes, mid: int) -> mqtt.MQTTMessageInfo:
+        """
+        Queue a packet like a single QoS 0 publish, so on_publish is called (and the info is set)
+        once all of it was written.
+
+        :param packet: Encoded PUBLISH packet(s).
+        :param mid: Message id (see get_mid).
+        :return: Message info of the mqtt client.
+        """
+        info = mqtt.MQTTMessageInfo(mid)
+        info.rc = self.client._packet_queue(mqtt.PUBLISH, packet, mid, 0, info)
+        return info
 
 
 class Connection:
     """
     Connection class that is created by Connections class.
+
+    Note:
+    - A lost connection is established again in the background. The delay between two attempts
+      grows exponentially (with jitter, see Backoff). Publishing never waits for it:
+      messages are refused (or spooled) right away while disconnected.
+    - The current state is kept in state. Recent transitions are kept in transitions.
     """
 
-    def __init__(self, ip: str, port: int):
+    _PUBLISH_HEADER = bytes((mqtt.PUBLISH,))  # first byte of a QoS 0 PUBLISH packet.
+
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        mqtt5: bool = False,
+        message_expiry: Optional[int] = None,
+        spool: Optional[Spool] = None,
+        min_delay: float = RECONNECT_MIN_DELAY,
+        max_delay: float = RECONNECT_MAX_DELAY,
+        on_state_change: Optional[Callable] = None,
+        tls: Optional[TLSPool] = None,
+        fast_batches: bool = False,
+    ):
         """
         Initialize new connection.
 
         :param ip: IP of target host.
         :param port: Port of target host.
+        :param mqtt5: Use mqtt 5 instead of mqtt 3.1.1. The most published topics get topic aliases.
+        :param message_expiry: Seconds the broker keeps a message for subscribers that are offline (mqtt 5 only).
+            None or 0 keep messages until they were delivered, so no expiry is sent with them.
+        :param spool: Spool that keeps messages on disk while the broker is not available.
+            They are sent at the rate of the spool once the connection is established again.
+        :param min_delay: Upper bound (in seconds) of the delay before the first attempt to reconnect.
+        :param max_delay: Upper bound (in seconds) of the delay between two attempts to reconnect.
+        :param on_state_change: Function that is called with the connection and its new state on every transition.
+            It is called from the network threads, so it should return quickly.
+        :param tls: Pool whose context (and TLS sessions) are used to connect via TLS.
+        :param fast_batches: Encode the messages of a batch into PUBLISH packets and hand them to the client
+            as a single write (see publish_batch). This relies on internals of paho-mqtt.
+            Messages are published one by one as usual if the installed version does not have them.
         """
+        if message_expiry is not None and not mqtt5:
+            raise InvalidInputValueError(
+                "Message expiry is only supported by mqtt 5 connections (mqtt5=True)."
+            )
+
         self.ip = ip
         self.port = port
-        self.mqtt_client = mqtt.Client()
+        self.mqtt5 = mqtt5
+        self.message_expiry = message_expiry
+        self.spool = spool
+        self.tls = tls
+        self.metrics = ConnectionMetrics()
+        self.subscriptions = []
+        self.backoff = Backoff(min_delay=min_delay, max_delay=max_delay)
+        self.on_state_change = on_state_change
+        self.state = ConnectionStates.CONNECTING
+        # (timestamp, state) of the most recent transitions.
+        self.transitions = deque([(time.time(), self.state)], maxlen=STATE_HISTORY)
+        # the broker tells how many aliases it accepts once the connection is established.
+        self.aliases = TopicAliases(maximum=0)
+        # properties of every message (mqtt 5 only). messages without an expiry do not expire,
+        # so the property is left out unless it was set.
+        self._properties = (
+            bytes((MESSAGE_EXPIRY,)) + struct.pack("!I", message_expiry)
+            if message_expiry
+            else b""
+        )
+        # property length of messages without alias (mqtt 5 only).
+        self._plain_properties = (
+            encode_remaining_length(len(self._properties)) + self._properties
+            if mqtt5
+            else b""
+        )
+        self._topic_fields = {}  # topic -> encoded topic (incl. length).
+        self._properties_by_alias = (
+            {}
+        )  # alias -> properties for the public publish of the client.
+        # message id -> number of messages in batches that were not written yet.
+        self._batches = {}
+
+        # the client does not reconnect on its own. its network thread stops once the connection is lost
+        # and the reconnector takes over (see _reconnect).
+        self.mqtt_client = mqtt.Client(
+            protocol=mqtt.MQTTv5 if mqtt5 else mqtt.MQTTv311,
+            reconnect_on_failure=False,
+        )
+        self.mqtt_client.on_connect = self._on_connect
+        self.mqtt_client.on_disconnect = self._on_disconnect
+        self.mqtt_client.on_publish = self._on_publish
+        # prebuilt packets are queued through internals of the client, so only if asked for.
+        self._packets = _PacketQueue(self.mqtt_client) if fast_batches else None
+        if tls is not None:
+            self.mqtt_client.tls_set_context(
+                tls.get_context(host=ip, port=port, metrics=self.metrics)
+            )
 
         self.check_connection()
+        self._lost = Event()
+        self._closed = Event()
+        # network thread of the client that noticed the lost connection.
+        self._network = None
+        self.mqtt_client.loop_start()
+        self._reconnector = Thread(target=self._reconnect, daemon=True)
+        self._reconnector.start()
+
+        if spool is not None:
+            # taken while deciding between spool and client, so spooled messages are always sent first.
+            self._spool_lock = Lock()
+            self.metrics.spool_depth = len(spool)
+            self._wake = Event()
+            self.draining = True
+            self._drainer = Thread(target=self._drain, daemon=True)
+            self._drainer.start()
 
     def check_connection(self):
         """
@@ -43,6 +336,61 @@ class Connection:
                 % (self.ip, self.port, err)
             )
 
+    def _set_state(self, state: ConnectionStates):
+        """
+        Change the state and tell on_state_change about it.
+
+        :param state: New state of the connection.
+        """
+        if state is self.state or self.state is ConnectionStates.CLOSED:
+            return
+        self.state = state
+        self.transitions.append((time.time(), state))
+        if self.on_state_change is not None:
+            self.on_state_change(self, state)
+
+    def _reconnect(self):
+        """
+        Establish the connection again whenever it was lost. Waits between two attempts (see Backoff).
+        """
+        while True:
+            self._lost.wait()
+            if self._closed.is_set():
+                return
+            if self._network is not None and self._network is not current_thread():
+                self._network.join()
+                self._network = None
+            self._forget_queue()
+
+            if self._closed.wait(self.backoff.get_delay()):
+                return
+            self._set_state(ConnectionStates.RECONNECTING)
+            self.metrics.attempts += 1
+            try:
+                self.mqtt_client.reconnect()
+            except OSError:
+                self._set_state(ConnectionStates.DISCONNECTED)
+                continue
+
+            # the broker still has to accept the connection (see _on_connect).
+            self._set_state(ConnectionStates.CONNECTING)
+            self._lost.clear()
+            # the old network thread has ended, but not every version of the client forgets it on its own.
+            # loop_start does nothing as long as the client still knows a thread.
+            self.mqtt_client.loop_stop()
+            self.mqtt_client.loop_start()
+            if self._closed.is_set():
+                # closed while reconnecting. close stops the new network thread.
+                return
+
+    def _forget_queue(self):
+        """
+        Count the messages that were waiting to be written when the connection was lost.
+        The client drops them when it reconnects.
+        """
+        self.metrics.lost += self.metrics.queue_depth
+        self._batches.clear()
+
     def get_address(self) -> Tuple:
         """
         Get address information (ip and port).
@@ -51,8 +399,339 @@ class Connection:
         """
         return self.ip, self.port
 
+    def publish(self, topic: str, payload: bytes):
+        """
+        Publish the given payload on the given topic.
+
+        :param topic: Topic to publish payload onto.
+        :param payload: Encoded payload to publish.
+        :return: Message info of the mqtt client. None if the message was spooled.
+        """
+        if self.mqtt5 or self.spool is not None:
+            return self.publish_batch(topics=[topic], payloads=[payload])
+
+        self.metrics.published += 1
+        info = self.mqtt_client.publish(topic=topic, payload=payload)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            # the message never reaches the network, so it must not count as waiting.
+            self.metrics.published -= 1
+            self.metrics.errors += 1
+        else:
+            size = self._get_plain_size(
+                topic_field=self._get_topic_field(topic), payload=payload
+            )
+            self.metrics.bytes += size
+            self.metrics.plain_bytes += size
+        return info
+
+    def publish_batch(self, topics: List[str], payloads: List[bytes]):
+        """
+        Publish several messages at once as QoS 0 messages. With fast_batches, all of them are encoded
+        into PUBLISH packets and handed to the client as a single write instead of one publish call per message.
+
+        :param topics: Topic of each message.
+        :param payloads: Encoded payload of each message.
+        :return: Message info of the mqtt client. It is published once the whole batch was written.
+            If messages were refused, the info of the first refused message. None if the messages were spooled.
+        """
+        if self.spool is None:
+            return self._queue_batch(topics=topics, payloads=payloads)
+
+        with self._spool_lock:
+            if len(self.spool) or not self.mqtt_client.is_connected():
+                self._spill(topics=topics, payloads=payloads)
+                return None
+            return self._queue_batch(topics=topics, payloads=payloads)
+
+    def spill(self, topics: List[str], payloads: List[bytes]):
+        """
+        Put messages into the spool (e.g. because the broker does not keep up).
+        They are sent after all messages that are spooled already.
+
+        :param topics: Topic of each message.
+        :param payloads: Encoded payload of each message.
+        """
+        with self._spool_lock:
+            self._spill(topics=topics, payloads=payloads)
+
+    def _spill(self, topics: List[str], payloads: List[bytes]):
+        """
+        Same as spill but without taking the lock.
+        """
+        self.spool.extend(topics=topics, payloads=payloads)
+        self.metrics.spooled += len(payloads)
+        self.metrics.spool_depth = len(self.spool)
+        self.metrics.evicted = self.spool.evicted
+
+    def _drain(self):
+        """
+        Send spooled messages at the rate of the spool while the connection is established.
+        Messages are only marked as delivered once the client wrote them to the network.
+        If the connection is lost (or closed) before, they are sent again later.
+        """
+        interval = SPOOL_INTERVAL
+        while self.draining:
+            self._wake.wait(interval)
+            if not len(self.spool) or not self.mqtt_client.is_connected():
+                continue
+
+            # never put more than one interval of messages into the queue of the client.
+            budget = max(1, int(self.spool.rate * interval)) - self.metrics.queue_depth
+            if budget <= 0:
+                continue
+            with self._spool_lock:
+                topics, payloads = self.spool.read(count=budget)
+                if not payloads:
+                    continue
+                info = self._queue_batch(topics=topics, payloads=payloads)
+
+            # the client drops queued messages when the connection is lost, so on_publish is never called then.
+            # is_published raises if the messages were refused, so rc is checked first.
+            sent = info.rc == mqtt.MQTT_ERR_SUCCESS
+            while (
+                sent
+                and not info.is_published()
+                and self.draining
+                and self.mqtt_client.is_connected()
+            ):
+                info.wait_for_publish(timeout=interval)
+            if sent and info.is_published():
+                self.spool.commit(count=len(payloads))
+            else:
+                self.spool.rewind()
+            self.metrics.spool_depth = len(self.spool)
+
+    def _queue_batch(self, topics: List[str], payloads: List[bytes]):
+        """
+        Encode messages into PUBLISH packets and queue them as a single write if possible (see publish_batch).
+
+        :param topics: Topic of each message.
+        :param payloads: Encoded payload of each message.
+        :return: Message info of the mqtt client.
+        """
+        count = len(payloads)
+        if self.mqtt_client.socket() is None:
+            # same check as publish of the client. messages are only queued while a socket is open.
+            self.metrics.errors += count
+            info = mqtt.MQTTMessageInfo(0)
+            info.rc = mqtt.MQTT_ERR_NO_CONN
+            return info
+        if self._packets is None or not self._packets.available:
+            return self._publish_each(topics=topics, payloads=payloads)
+
+        header = self._PUBLISH_HEADER
+        aliases = self.aliases
+        plain_properties = self._plain_properties
+        packets = []
+        plain_bytes = 0
+        for topic, payload in zip(topics, payloads):
+            topic_field = self._topic_fields.get(topic) or self._get_topic_field(topic)
+            length = len(topic_field) + len(plain_properties) + len(payload)
+            remaining_length = encode_remaining_length(length)
+            plain_bytes += 1 + len(remaining_length) + length
+
+            # an alias takes 3 bytes, so it only pays off for topics that are longer than that.
+            if self.mqtt5 and len(topic_field) > 5:
+                properties = self._properties
+                alias, announce = aliases.get(topic)
+                if alias:
+                    properties += bytes((TOPIC_ALIAS,)) + struct.pack("!H", alias)
+                    if not announce:
+                        topic_field = b"\x00\x00"
+                properties = encode_remaining_length(len(properties)) + properties
+                length = len(topic_field) + len(properties) + len(payload)
+                packets += (
+                    header,
+                    encode_remaining_length(length),
+                    topic_field,
+                    properties,
+                    payload,
+                )
+            else:
+                packets += (
+                    header,
+                    remaining_length,
+                    topic_field,
+                    plain_properties,
+                    payload,
+                )
+        packet = b"".join(packets)
+
+        mid = self._packets.get_mid()
+        self._batches[mid] = count
+        self.metrics.published += count
+        self.metrics.bytes += len(packet)
+        self.metrics.plain_bytes += plain_bytes
+        return self._packets.put(packet=packet, mid=mid)
+
+    def _publish_each(self, topics: List[str], payloads: List[bytes]):
+        """
+        Publish messages one by one with the public publish of the client (see publish_batch).
+
+        :param topics: Topic of each message.
+        :param payloads: Encoded payload of each message.
+        :return: Message info of the mqtt client for the first message that was refused, otherwise the last message.
+        """
+        plain_properties = self._get_properties(alias=0)
+        info = refused = None
+        for topic, payload in zip(topics, payloads):
+            topic_field = self._topic_fields.get(topic) or self._get_topic_field(topic)
+            plain_size = size = self._get_plain_size(
+                topic_field=topic_field, payload=payload
+            )
+            properties = plain_properties
+            alias, announce = 0, True
+            # an alias takes 3 bytes, so it only pays off for topics that are longer than that.
+            if self.mqtt5 and len(topic_field) > 5:
+                alias, announce = self.aliases.get(topic)
+            if alias:
+                properties = self._get_properties(alias=alias)
+                length = (
+                    (len(topic_field) if announce else 2)
+                    + len(self._plain_properties)
+                    + 3
+                    + len(payload)
+                )
+                size = 1 + len(encode_remaining_length(length)) + length
+
+            self.metrics.published += 1
+            info = self.mqtt_client.publish(
+                topic=topic if announce else "", payload=payload, properties=properties
+            )
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                self.metrics.published -= 1
+                self.metrics.errors += 1
+                if alias and announce:
+                    # the broker never got to know the alias.
+                    self.aliases.announced.discard(topic)
+                refused = refused or info
+                continue
+            self.metrics.bytes += size
+            self.metrics.plain_bytes += plain_size
+        return refused or info
+
+    def _get_properties(self, alias: int) -> Optional[Properties]:
+        """
+        Get the properties of a message that is published with the public publish of the client.
+
+        :param alias: Topic alias of the message. 0 if it has none.
+        :return: Properties of the message. None if there are none (e.g. mqtt 3.1.1).
+        """
+        properties = self._properties_by_alias.get(alias)
+        if properties is None and (alias or self.message_expiry):
+            properties = self._properties_by_alias[alias] = Properties(
+                PacketTypes.PUBLISH
+            )
+            if self.message_expiry:
+                properties.MessageExpiryInterval = self.message_expiry
+            if alias:
+                properties.TopicAlias = alias
+        return properties
+
+    def _get_plain_size(self, topic_field: bytes, payload: bytes) -> int:
+        """
+        Get the size of a PUBLISH packet of this connection that is sent without topic alias.
+
+        :param topic_field: Encoded topic (see _get_topic_field).
+        :param payload: Encoded payload.
+        :return: Size of the packet in bytes.
+        """
+        length = len(topic_field) + len(self._plain_properties) + len(payload)
+        return 1 + len(encode_remaining_length(length)) + length
+
+    def _get_topic_field(self, topic: str) -> bytes:
+        """
+        Get the encoded topic (incl. its length) as it is written into PUBLISH packets.
+
+        :param topic: Topic to encode.
+        :return: Encoded topic.
+        """
+        topic_field = self._topic_fields.get(topic)
+        if topic_field is None:
+            encoded = topic.encode()
+            topic_field = self._topic_fields[topic] = (
+                struct.pack("!H", len(encoded)) + encoded
+            )
+        return topic_field
+
+    def is_connected(self) -> bool:
+        """
+        Check if the connection to the mqtt broker is currently established.
+
+        :return: True if connected.
+        """
+        return self.mqtt_client.is_connected()
+
+    def subscribe(self, topic: str):
+        """
+        Subscribe to the given topic.
+        The subscription is renewed whenever the connection is established again.
+
+        :param topic: Topic to subscribe to.
+        """
+        self.subscriptions.append(topic)
+        self.mqtt_client.subscribe(topic)
+
+    def close(self):
+        """
+        Terminate connection to mqtt broker. Spooled messages are kept on disk.
+        """
+        self._set_state(ConnectionStates.CLOSED)
+        self._closed.set()
+        self._lost.set()
+        if self._reconnector is not current_thread():
+            self._reconnector.join()
+
+        if self.spool is not None and self.draining:
+            self.draining = False
+            self._wake.set()
+            self._drainer.join()
+            self.spool.close()
+
+        # disconnect first, so the network loop wakes up and stops right away.
+        self.mqtt_client.disconnect()
+        self.mqtt_client.loop_stop()
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        """
+        Define what to do when connection was established.
+        """
+        if rc != 0:
+            # refused by the broker. the client calls _on_disconnect next.
+            return
+        self.metrics.connects += 1
+        self.backoff.reset()
+        if self.tls is not None:
+            # the broker sent everything that belongs to the session by now (see TLSPool).
+            self.tls.save_session(host=self.ip, port=self.port, sock=client.socket())
+        self._set_state(ConnectionStates.CONNECTED)
+        if self.mqtt5:
+            # aliases only live as long as a single network connection.
+            self.aliases = TopicAliases(
+                maximum=getattr(properties, "TopicAliasMaximum", 0)
+            )
+        if self.metrics.connects > 1:
+            for topic in self.subscriptions:
+                client.subscribe(topic)
+
+    def _on_disconnect(self, client, userdata, rc, properties=None):
+        """
+        Define what to do when connection was lost.
+        """
+        self.metrics.disconnects += 1
+        if not self._closed.is_set():
+            self._set_state(ConnectionStates.DISCONNECTED)
+            self._network = current_thread()
+            self._lost.set()
+
+    def _on_publish(self, client, userdata, mid):
+        """
+        Define what to do when a message was handed to the network.
+        """
+        self.metrics.completed += self._batches.pop(mid, 1)
 
-class Listener:  # pragma: no cover
+
+class Listener:
     """
     Class to listen for new data on mqtt connection.
     """
@@ -71,26 +750,166 @@ class Listener:  # pragma: no cover
         self.topic = topic
 
         self.connection = Connection(ip=ip, port=port)
-        self.connection.mqtt_client.on_connect = self._on_connect
         self.connection.mqtt_client.on_message = on_message
         self.connect()
 
     def connect(self):
         """
-        Establish connection to mqtt broker
+        Start listening on the topic.
         """
-        self.connection.mqtt_client.connect(self.ip, self.port, 60)
-        self.connection.mqtt_client.loop_start()
+        self.connection.subscribe(self.topic)
 
-    def _on_connect(self, client, userdata, flags, rc):
+    def disconnect(self):
         """
-        Define what to do when connection was established.
+        Terminate connection to mqtt broker
+        """
+        self.connection.close()
+
+
+class MultiListener:
+    """
+    Class to listen to many topics (e.g. a whole fleet of pipelines) on a single connection.
+    Each topic gets its own ChannelStore.
+
+    Note:
+    - Topic filters may contain wildcards (+ and #).
+    - The network thread only queues raw payloads. They are decoded in batches by a worker thread.
+    - The store of a topic is looked up in a dictionary. The topic filters are only matched once per new topic.
+    """
+
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        topics: Union[str, List[str]],
+        memory: int = MEMORY,
+        interval: float = LISTEN_INTERVAL,
+    ):
+        """
+        Initialize new listener and start listening right away.
+
+        :param ip: IP of target host.
+        :param port: Port of target host.
+        :param topics: Topic filter or list of topic filters to listen to.
+        :param memory: Number of data points to keep per channel.
+        :param interval: Seconds between two batches of received payloads.
+        """
+        self.memory = memory
+        self.interval = interval
+        self.filters = [
+            (topic, compile_topic_filter(topic))
+            for topic in ([topics] if isinstance(topics, str) else topics)
+        ]
+        self.stores = {}
+        self.dropped = 0
+
+        self.queue = deque()
+        self._routes = {}
+        self._wake = Event()
+        self.running = True
+        self._worker = Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+        self.connection = Connection(ip=ip, port=port)
+        self.connection.mqtt_client.on_message = self._on_message
+        for topic, _ in self.filters:
+            self.connection.subscribe(topic)
+
+    def _on_message(self, client, userdata, msg):
+        """
+        Define what to do when message is received.
+        Only queue the raw payload, so the network thread is never blocked.
+        """
+        self.queue.append((msg.topic, msg.payload))
+
+    def _run(self):
+        """
+        Process received payloads until the listener is disconnected.
         """
-        self.connection.mqtt_client.subscribe(self.topic)
+        while self.running:
+            self._wake.wait(self.interval)
+            self.process()
+
+    def process(self):
+        """
+        Decode all queued payloads and add them to the store of their topic.
+        """
+        queue = self.queue
+        batches = {}
+        for _ in range(len(queue)):
+            topic, payload = queue.popleft()
+            batches.setdefault(topic, []).append(payload)
+
+        for topic, payloads in batches.items():
+            store = self._get_route(topic)
+            if store is None:
+                self.dropped += len(payloads)
+                continue
+
+            rows = decode_payloads(payloads)
+            xs = datestrs2num([row.pop("timestamp", None) for row in rows])
+            added = 0
+            for x, row in zip(xs, rows):
+                if x == x:
+                    store.append(x=x, payload=row)
+                    added += 1
+            self.dropped += len(payloads) - added
+
+    def _get_route(self, topic: str) -> Optional[ChannelStore]:
+        """
+        Look up the store of a topic. Create it if the topic matches any topic filter.
+
+        :param topic: Topic a message was received on.
+        :return: Store of the topic. None if the topic does not match any topic filter.
+        """
+        try:
+            return self._routes[topic]
+        except KeyError:
+            pass
+
+        store = None
+        if any(pattern.match(topic) for _, pattern in self.filters):
+            store = self.stores[topic] = ChannelStore(size=self.memory)
+        self._routes[topic] = store
+        return store
+
+    def get_store(self, topic: str) -> ChannelStore:
+        """
+        Get the store of a topic.
+
+        :param topic: Topic to get the store of.
+        :return: Store with the latest data points of all channels of the topic.
+        """
+        return self.stores[topic]
+
+    def get_topics(self) -> List[str]:
+        """
+        Get all topics that were received so far.
+
+        :return: List of topics.
+        """
+        return list(self.stores)
+
+    def get_stats(self) -> Dict:
+        """
+        Get the number of received messages per topic.
+
+        :return: Dictionary with messages and channels per topic and the number of dropped payloads.
+        """
+        return {
+            "topics": {
+                topic: {"messages": store.count, "channels": store.get_channels()}
+                for topic, store in list(self.stores.items())
+            },
+            "dropped": self.dropped,
+        }
 
     def disconnect(self):
         """
-        Terminate connection to mqtt broker
+        Stop listening. Payloads that were already received are still processed.
         """
-        self.connection.mqtt_client.loop_stop()
-        self.connection.mqtt_client.disconnect()
+        self.connection.close()
+        self.running = False
+        self._wake.set()
+        self._worker.join()
+        self.process()
@@ -6,14 +6,17 @@ __all__ = [
 
 # import native libs
 from datetime import datetime
-from typing import List, Optional
+from threading import Lock
+from typing import List, Optional, Union
 
 # import 3rd party libs
 import numpy as np
 
 # import own libs
+from forger.auxiliary.constants import SAMPLE_CACHE_SIZE
 from forger.auxiliary.enums import ChannelTypes
 from forger.auxiliary.exceptions import InvalidInputTypeError, SeedReplantError
+from forger.engine.replay import Replay, get_trace_limits, intern
 
 
 class Generator:
@@ -29,8 +32,9 @@ class Generator:
         dead_frequency: float,
         dead_period: float,
         scale: Optional[List],
-        replay_data: Optional[List],
+        replay_data: Optional[Union[List, Replay]],
         seed: Optional[int] = None,
+        replay_offset: int = 0,
     ):
         """
         Initialize a new Generator instance.
@@ -51,16 +55,25 @@ class Generator:
         self.replay_data = replay_data  # data to replay
 
         # indexing for replay of data
-        self.replay_idx = 0
+        self.replay_idx = replay_offset  # position in (shared) replay data
         self.base_time = datetime.now()
         self.seed = np.abs(seed) if seed is not None else None
 
+        # values of the latest ticks, so pipelines that share this generator compute each tick only once.
+        self._samples = {}
+        self._samples_lock = Lock()
+
         if self.seed:
             self._plant_a_seed()
 
-        if self.replay_data:
+        if self.replay_data is not None and len(self.replay_data):
             self.channel_type = ChannelTypes.REPLAY.value[0]
-            self.limits = [np.min(self.replay_data), np.max(self.replay_data)]
+            if isinstance(self.replay_data, Replay):
+                self.limits = self.replay_data.limits
+            else:
+                # channels with equal replay data share a single read-only array.
+                self.replay_data = intern(self.replay_data)
+                self.limits = get_trace_limits(self.replay_data)
 
     def get_data(self, current_datetime: Optional[datetime] = None):
         """
@@ -68,6 +81,7 @@ class Generator:
 
         :param current_datetime: Use given timestamp of initialization of generator.
         """
+        current_datetime = current_datetime or datetime.now()
         seconds = self._seconds_since_init(current_datetime)
 
         if (self.dead_frequency != 0) and (
@@ -88,8 +102,14 @@ class Generator:
             elif self.channel_type in ChannelTypes.FIXED.value:
                 yr = 1.0
             elif self.channel_type in ChannelTypes.REPLAY.value:
-                yr = self.replay_data[self.replay_idx % len(self.replay_data)]
-                self.replay_idx += 1
+                if isinstance(self.replay_data, Replay):
+                    # replayed by time, independent of how often data is requested.
+                    yr = self.replay_data.get_at(current_datetime)
+                else:
+                    yr = float(
+                        self.replay_data[self.replay_idx % len(self.replay_data)]
+                    )
+                    self.replay_idx += 1
             else:
                 raise InvalidInputTypeError(
                     f"Given channel_type ({self.channel_type}) is not implemented."
@@ -100,6 +120,23 @@ class Generator:
             else:
                 return yr
 
+    def get_sample(self, tick: int, current_datetime: datetime) -> float:
+        """
+        Get the data of the given tick. Each tick is only computed once,
+        no matter how many pipelines ask for it.
+
+        :param tick: Time of the tick (in nanoseconds since epoch).
+        :param current_datetime: Time of the tick as datetime.
+        :return: Data of the tick.
+        """
+        with self._samples_lock:
+            sample = self._samples.get(tick)
+            if sample is None:
+                sample = self._samples[tick] = self.get_data(current_datetime)
+                if len(self._samples) > SAMPLE_CACHE_SIZE:
+                    del self._samples[min(self._samples)]
+            return sample
+
     def _seconds_since_init(self, current_datetime: Optional[datetime] = None) -> float:
         """
         Get seconds since init of this class.
@@ -1,12 +1,33 @@
 """Main module to run the mqtt-forger."""
 
-from typing import List
+import json
+import platform
+from datetime import datetime
+from time import sleep
+from typing import Dict, List, Optional
 
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+)
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from forger.auxiliary.constants import DEFAULT_PIPELINE_SETTINGS
+from forger.auxiliary.constants import (
+    DEFAULT_PIPELINE_SETTINGS,
+    METRICS_HOST,
+    METRICS_PORT,
+    TARGET_QUEUE_LIMIT,
+)
+from forger.auxiliary.enums import OverrunPolicies
 from forger.auxiliary.misc import get_new_id
+from forger.engine.arrivals import ArrivalProcess
+from forger.engine.metrics import MetricsServer
 from forger.engine.pipelines import Pipeline
+from forger.engine.profiler import TRACER
+from forger.engine.spool import Spool
+from forger.engine.tls import TLSPool
 
 
 class Manager:
@@ -22,11 +43,34 @@ class Manager:
         Initialize variables
         """
         self.pipelines = {}
+        self.metrics_server = None
         self.Scheduler = BackgroundScheduler()
+        self.Scheduler.add_listener(
+            self._on_job_event,
+            EVENT_JOB_SUBMITTED
+            | EVENT_JOB_MAX_INSTANCES
+            | EVENT_JOB_MISSED
+            | EVENT_JOB_ERROR,
+        )
         self.Scheduler.start()
 
     def add_pipeline(
-        self, ip: str, port: int, topic: str, frequency: float, pipeline_name: str = ""
+        self,
+        ip: str,
+        port: int,
+        topic: str,
+        frequency: float,
+        pipeline_name: str = "",
+        measure: bool = False,
+        queue_limit: int = TARGET_QUEUE_LIMIT,
+        per_channel: bool = False,
+        mqtt5: bool = False,
+        message_expiry: Optional[int] = None,
+        spool: Optional[Spool] = None,
+        tls: Optional[TLSPool] = None,
+        fast_batches: bool = False,
+        overrun_policy: str = OverrunPolicies.WARN.value,
+        arrivals: Optional[ArrivalProcess] = None,
     ) -> Pipeline:
         """
         Call Pipelines class to create a new pipeline.
@@ -36,6 +80,16 @@ class Manager:
         :param topic: Name of topic that data should be published on.
         :param frequency: Frequency (in Hz) in that the data will be published on the given topic.
         :param pipeline_name: Optional name of pipeline.
+        :param measure: Add a sequence number and send time to each payload (see LatencyListener).
+        :param queue_limit: Number of messages that may wait to be written to a single target (see add_target).
+        :param per_channel: Publish one message per channel on topic/name instead of one message on topic.
+        :param mqtt5: Connect with mqtt 5 and use topic aliases for the most published topics.
+        :param message_expiry: Seconds the broker keeps a message for subscribers that are offline (mqtt 5 only).
+        :param spool: Spool that keeps messages on disk while the broker is not available or does not keep up.
+        :param tls: Pool to connect via TLS with. Pass the same pool to all pipelines, so they share context and sessions.
+        :param fast_batches: Hand all messages of a tick to the mqtt client as a single prebuilt write (see Pipeline).
+        :param overrun_policy: What to do if the pipeline can not keep up with its frequency (see Pipeline).
+        :param arrivals: Publish at the times of this arrival process (e.g. Poisson) instead of every 1 / frequency seconds.
         :return: New Pipeline class instance.
         """
         pid = get_new_id(self.pipelines)
@@ -48,6 +102,16 @@ class Manager:
             topic=topic,
             frequency=frequency,
             scheduler=self.Scheduler,
+            measure=measure,
+            queue_limit=queue_limit,
+            per_channel=per_channel,
+            mqtt5=mqtt5,
+            message_expiry=message_expiry,
+            spool=spool,
+            tls=tls,
+            fast_batches=fast_batches,
+            overrun_policy=overrun_policy,
+            arrivals=arrivals,
         )
 
         return self.pipelines[pid]
@@ -58,3 +122,81 @@ class Manager:
         :return: List of names (strings) of pipelines.
         """
         return [v.name for k, v in self.pipelines.items()]
+
+    def stats(self) -> Dict:
+        """
+        Get the current metrics of all pipelines and their connections.
+        :return: Dictionary of metrics per pipeline id.
+        """
+        return {pid: pipeline.get_stats() for pid, pipeline in self.pipelines.items()}
+
+    def serve_metrics(
+        self, host: str = METRICS_HOST, port: int = METRICS_PORT
+    ) -> MetricsServer:
+        """
+        Serve the metrics of all pipelines in prometheus text format on a local http port.
+
+        :param host: Host to bind to.
+        :param port: Port to bind to. Pass 0 to use any free port.
+        :return: MetricsServer instance that can be stopped again.
+        """
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+
+        self.metrics_server = MetricsServer(get_stats=self.stats, host=host, port=port)
+        return self.metrics_server
+
+    def profile(
+        self,
+        duration: float,
+        cprofile: bool = False,
+        memory: bool = False,
+        top: int = 20,
+        path: Optional[str] = None,
+    ) -> Dict:
+        """
+        Trace the running engine for the given duration and report where the time goes.
+        This call blocks until the duration has passed.
+
+        :param duration: Time (in seconds) to trace.
+        :param cprofile: Also collect a cProfile of the traced stages.
+        :param memory: Also take a tracemalloc snapshot of the running engine.
+        :param top: Number of entries to keep of the cProfile and tracemalloc output.
+        :param path: Optional path of a json file to write the report to.
+        :return: Report with timings per stage and the metrics of all pipelines.
+        """
+        TRACER.start(cprofile=cprofile, memory=memory)
+        try:
+            sleep(duration)
+        finally:
+            report = TRACER.stop(top=top)
+
+        report["duration"] = duration
+        report["python"] = platform.python_version()
+        report["pipelines"] = self.stats()
+
+        if path is not None:
+            with open(path, "w") as fh:
+                json.dump(report, fh, indent=2, sort_keys=True, default=str)
+
+        return report
+
+    def _on_job_event(self, event):
+        """
+        Record what the scheduler did with the job of a pipeline.
+
+        :param event: Event that was fired by the scheduler.
+        """
+        pipeline = self.pipelines.get(int(event.job_id))
+        if pipeline is None:
+            return
+
+        if event.code == EVENT_JOB_SUBMITTED:
+            lag = datetime.now(self.Scheduler.timezone) - event.scheduled_run_times[-1]
+            pipeline.metrics.scheduler_lag.observe(max(lag.total_seconds(), 0.0))
+        elif event.code == EVENT_JOB_MAX_INSTANCES:
+            pipeline.metrics.skipped_runs += len(event.scheduled_run_times)
+        elif event.code == EVENT_JOB_MISSED:
+            pipeline.metrics.skipped_runs += 1
+        else:
+            pipeline.metrics.errors += 1
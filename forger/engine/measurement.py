@@ -0,0 +1,175 @@
+"""Use this module to measure latency and loss of the data that pipelines publish."""
+
+__all__ = [
+    "SequenceTracker",
+    "LatencyListener",
+]
+
+import json
+import time
+from threading import Lock
+from typing import Dict, Optional
+
+from forger.auxiliary.constants import SENT_KEY, SEQUENCE_KEY, SEQUENCE_WINDOW
+from forger.engine.connections import Listener
+from forger.engine.metrics import LogHistogram
+
+
+class SequenceTracker:
+    """
+    Class to find lost, duplicated and reordered messages by their sequence numbers.
+    Only the last window sequence numbers are remembered, so memory stays constant.
+    """
+
+    def __init__(self, window: int = SEQUENCE_WINDOW):
+        """
+        Initialize variables
+
+        :param window: Number of previous sequence numbers that are remembered.
+        """
+        self.window = window
+        self.highest = None
+        self.seen = 0  # bit i is set if sequence number (highest - i) was received.
+
+        self.received = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.late = 0
+
+    def add(self, sequence: int):
+        """
+        Add the sequence number of a received message.
+
+        :param sequence: Sequence number of received message.
+        """
+        self.received += 1
+
+        if self.highest is None:
+            self.highest = sequence
+            self.seen = 1
+            return
+
+        if sequence > self.highest:
+            gap = sequence - self.highest
+            self.lost += gap - 1
+            self.seen = ((self.seen << gap) | 1) & ((1 << self.window) - 1)
+            self.highest = sequence
+            return
+
+        age = self.highest - sequence
+        if age >= self.window:
+            # too old to tell if it is a duplicate or was counted as lost.
+            self.late += 1
+        elif self.seen >> age & 1:
+            self.duplicates += 1
+        else:
+            # arrived after messages with higher sequence numbers. not lost after all.
+            self.seen |= 1 << age
+            self.reordered += 1
+            self.lost -= 1
+
+    def get_stats(self) -> Dict:
+        """
+        Get the current counters.
+
+        :return: Dictionary with number of received, lost, duplicated, reordered and late messages.
+        """
+        return {
+            "received": self.received,
+            "lost": self.lost,
+            "duplicates": self.duplicates,
+            "reordered": self.reordered,
+            "late": self.late,
+        }
+
+
+class LatencyListener:
+    """
+    Class to listen to pipelines that publish with measure=True and
+    compute one-way latency, loss, duplicates and reordering per topic.
+
+    Note:
+    - One-way latency is only meaningful if the clocks of publisher and listener are in sync
+      (e.g. both run on the same host).
+    """
+
+    def __init__(self, ip: str, port: int, topic: str, window: int = SEQUENCE_WINDOW):
+        """
+        Initialize new listener and start listening right away.
+
+        :param ip: IP of target host.
+        :param port: Port of target host.
+        :param topic: Topic to listen to. Wildcards (+ and #) are allowed.
+        :param window: Number of previous sequence numbers that are remembered per topic.
+        """
+        self.window = window
+        self.topics = {}
+        self._lock = Lock()
+
+        self.listener = Listener(
+            ip=ip, port=port, topic=topic, on_message=self._on_message
+        )
+
+    def _on_message(self, client, userdata, msg):
+        """
+        Define what to do when message is received.
+        """
+        received = time.time_ns()
+        try:
+            payload = json.loads(msg.payload)
+            sequence = payload[SEQUENCE_KEY]
+            sent = payload[SENT_KEY]
+        except (ValueError, KeyError, TypeError):
+            return
+
+        self.add(topic=msg.topic, sequence=sequence, latency=received - sent)
+
+    def add(self, topic: str, sequence: int, latency: int):
+        """
+        Add a received message.
+
+        :param topic: Topic the message was received on.
+        :param sequence: Sequence number of the message.
+        :param latency: Time (in nanoseconds) from sending to receiving the message.
+        """
+        with self._lock:
+            stats = self.topics.get(topic)
+            if stats is None:
+                stats = self.topics[topic] = (
+                    SequenceTracker(window=self.window),
+                    LogHistogram(),
+                )
+            stats[0].add(sequence)
+            stats[1].record(latency)
+
+    def get_stats(self, topic: Optional[str] = None) -> Dict:
+        """
+        Get latency (in seconds) and loss per topic.
+
+        :param topic: Only get stats of this topic.
+        :return: Dictionary with counters and latency percentiles per topic.
+        """
+        with self._lock:
+            topics = {
+                name: (tracker.get_stats(), histogram.get_stats())
+                for name, (tracker, histogram) in self.topics.items()
+                if topic is None or name == topic
+            }
+
+        stats = {}
+        for name, (counters, latency) in topics.items():
+            stats[name] = {
+                **counters,
+                "latency": {
+                    key: value / 1e9 if key != "count" and value is not None else value
+                    for key, value in latency.items()
+                },
+            }
+        return stats
+
+    def disconnect(self):
+        """
+        Stop listening.
+        """
+        self.listener.disconnect()
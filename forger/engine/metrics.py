@@ -0,0 +1,473 @@
+"""This module contains all classes that are used to measure what the engine is doing."""
+
+__all__ = [
+    "Histogram",
+    "LogHistogram",
+    "PipelineMetrics",
+    "ConnectionMetrics",
+    "MetricsServer",
+    "to_prometheus",
+]
+
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+from forger.auxiliary.constants import LATENCY_BUCKETS, METRICS_HOST, METRICS_PORT
+
+
+class Histogram:
+    """
+    Histogram with a fixed set of buckets.
+    Observing a value only increments a counter, so it is cheap enough to stay on all the time.
+    """
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Initialize variables
+
+        :param bounds: Sorted upper bounds of each bucket. Larger values go into an implicit +Inf bucket.
+        """
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """
+        Add a new value to the histogram.
+
+        :param value: Value to add.
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def get_percentile(self, percentile: float) -> float:
+        """
+        Estimate a percentile of all observed values.
+        The estimate is the upper bound of the bucket that contains the percentile.
+
+        :param percentile: Percentile to estimate (between 0 and 100).
+        :return: Upper bound of the bucket that holds the percentile. NaN if nothing was observed.
+        """
+        if self.count == 0:
+            return float("nan")
+
+        rank = self.count * percentile / 100
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def get_stats(self) -> Dict:
+        """
+        Get the current state of the histogram.
+
+        :return: Dictionary with count, sum and cumulative bucket counts (keyed by upper bound).
+        """
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class LogHistogram:
+    """
+    Histogram of non-negative integers with log-linear buckets (like HdrHistogram).
+    Each bucket covers a range of at most 1 / 2**precision_bits of its value,
+    so percentiles stay accurate while memory is fixed no matter how many values are recorded.
+    """
+
+    def __init__(self, precision_bits: int = 7, max_bits: int = 64):
+        """
+        Initialize variables
+
+        :param precision_bits: Number of bits of each value that are kept exactly (7 -> below 1 percent error).
+        :param max_bits: Number of bits of the largest value that can be recorded.
+        """
+        self.precision_bits = precision_bits
+        self.sub_buckets = 2**precision_bits
+        self.counts = np.zeros(
+            self.sub_buckets * (max_bits - precision_bits + 1), dtype=np.int64
+        )
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def _get_index(self, value: int) -> int:
+        """
+        Get index of the bucket that holds the given value.
+
+        :param value: Value to look up.
+        :return: Index of bucket.
+        """
+        if value < self.sub_buckets:
+            return value
+        exponent = value.bit_length() - self.precision_bits - 1
+        return (
+            self.sub_buckets * (exponent + 1) + (value >> exponent) - self.sub_buckets
+        )
+
+    def _get_value(self, index: int) -> int:
+        """
+        Get the lowest value that falls into the bucket with the given index.
+
+        :param index: Index of bucket.
+        :return: Lowest value of bucket.
+        """
+        if index < self.sub_buckets:
+            return index
+        exponent, mantissa = divmod(index - self.sub_buckets, self.sub_buckets)
+        return (mantissa + self.sub_buckets) << exponent
+
+    def record(self, value: int):
+        """
+        Add a new value to the histogram. Negative values are recorded as zero.
+
+        :param value: Value to add.
+        """
+        value = max(int(value), 0)
+        self.counts[self._get_index(value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def get_percentile(self, percentile: float) -> float:
+        """
+        Get a percentile of all recorded values.
+
+        :param percentile: Percentile to get (between 0 and 100).
+        :return: Lowest value of the bucket that holds the percentile. NaN if nothing was recorded.
+        """
+        if self.count == 0:
+            return float("nan")
+        if percentile >= 100:
+            return self.max
+
+        rank = max(int(np.ceil(self.count * percentile / 100)), 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(max(self._get_value(index), self.min), self.max)
+
+    def get_stats(self, percentiles: Sequence[float] = (50, 90, 99, 99.9)) -> Dict:
+        """
+        Get a summary of all recorded values.
+
+        :param percentiles: Percentiles to report.
+        :return: Dictionary with count, min, max, mean and the given percentiles.
+        """
+        stats = {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else float("nan"),
+        }
+        for percentile in percentiles:
+            stats[f"p{percentile:g}"] = self.get_percentile(percentile)
+        return stats
+
+
+class PipelineMetrics:
+    """
+    Counters and histograms of a single pipeline.
+
+    Note:
+    - The scheduler never runs the same pipeline twice at the same time,
+      so the counters are only written by one thread at a time and need no lock.
+    """
+
+    def __init__(self):
+        """
+        Initialize variables
+        """
+        self.messages = 0
+        self.bytes = 0
+        self.errors = 0
+        self.skipped_runs = 0
+        self.publish_latency = Histogram()
+        self.scheduler_lag = Histogram()
+
+    def record_publish(self, size: int, duration: float, count: int = 1):
+        """
+        Record a single call to publish.
+
+        :param size: Number of bytes that were published.
+        :param duration: Time (in seconds) the publish call took.
+        :param count: Number of messages that were published in this call.
+        """
+        self.messages += count
+        self.bytes += size
+        self.publish_latency.observe(duration)
+
+    def get_stats(self) -> Dict:
+        """
+        Get the current state of all counters and histograms.
+
+        :return: Dictionary of all metrics.
+        """
+        return {
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "skipped_runs": self.skipped_runs,
+            "publish_latency": self.publish_latency.get_stats(),
+            "scheduler_lag": self.scheduler_lag.get_stats(),
+        }
+
+
+class ConnectionMetrics:
+    """
+    Counters of a single connection.
+    """
+
+    def __init__(self):
+        """
+        Initialize variables
+        """
+        self.published = 0
+        self.completed = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.attempts = 0  # attempts to establish a lost connection again.
+        # messages that were waiting to be written when the connection was lost.
+        self.lost = 0
+        self.dropped = 0  # messages that were skipped because too many were waiting.
+        self.errors = 0  # messages the client refused (e.g. while disconnected).
+        self.bytes = 0  # size of all PUBLISH packets as they are sent.
+        self.plain_bytes = 0  # size of the same packets without topic aliases.
+        self.spooled = 0  # messages that were put into the spool.
+        self.evicted = 0  # spooled messages that were deleted to bound disk usage.
+        self.spool_depth = 0  # messages that wait in the spool.
+        self.handshakes = 0  # TLS handshakes (only with a TLSPool).
+        self.resumed = 0  # TLS handshakes that resumed an earlier session.
+        self.handshake_time = Histogram()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of messages that were handed to the client but not yet written to the network.
+        """
+        return max(self.published - self.completed - self.lost, 0)
+
+    @property
+    def reconnects(self) -> int:
+        """
+        Number of times the connection had to be established again.
+        """
+        return max(self.connects - 1, 0)
+
+    def get_stats(self) -> Dict:
+        """
+        Get the current state of all counters.
+
+        :return: Dictionary of all metrics.
+        """
+        return {
+            "queue_depth": self.queue_depth,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "reconnects": self.reconnects,
+            "attempts": self.attempts,
+            "lost": self.lost,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "plain_bytes": self.plain_bytes,
+            "spooled": self.spooled,
+            "evicted": self.evicted,
+            "spool_depth": self.spool_depth,
+            "handshakes": self.handshakes,
+            "resumed": self.resumed,
+            "handshake_time": self.handshake_time.get_stats(),
+        }
+
+    def get_bytes_per_message(self) -> Dict:
+        """
+        Get the average size of a PUBLISH packet, before (same protocol version without aliases) and after topic aliases.
+
+        :return: Dictionary with bytes per message before and after.
+        """
+        messages = max(self.published, 1)
+        return {
+            "before": self.plain_bytes / messages,
+            "after": self.bytes / messages,
+        }
+
+
+def _format_labels(labels: Dict) -> str:
+    """
+    Format labels in prometheus text format.
+
+    :param labels: Dictionary of label names and values.
+    :return: Labels as string (e.g. '{pipeline="0",topic="foo"}').
+    """
+    escaped = [
+        '%s="%s"'
+        % (
+            key,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for key, value in labels.items()
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    """
+    Format the upper bound of a histogram bucket.
+
+    :param bound: Upper bound to format.
+    :return: Bound as string.
+    """
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _format_histogram(name: str, labels: Dict, histogram: Dict) -> List[str]:
+    """
+    Format a histogram in prometheus text format.
+
+    :param name: Name of the histogram.
+    :param labels: Dictionary of label names and values.
+    :param histogram: Output of Histogram.get_stats.
+    :return: One line per bucket, followed by sum and count.
+    """
+    lines = [
+        f"{name}_bucket{_format_labels({**labels, 'le': _format_bound(bound)})} {count}"
+        for bound, count in histogram["buckets"].items()
+    ]
+    lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+    lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return lines
+
+
+def to_prometheus(stats: Dict) -> str:
+    """
+    Convert the output of Manager.stats into the prometheus text format.
+
+    :param stats: Dictionary of metrics per pipeline id.
+    :return: Metrics in prometheus text format.
+    """
+    samples = {}
+    kinds = {}
+
+    for pid, pipeline in stats.items():
+        labels = {"pipeline": pid, "name": pipeline["name"], "topic": pipeline["topic"]}
+
+        for key, value in pipeline["metrics"].items():
+            if isinstance(value, dict):
+                name = f"forger_{key}_seconds"
+                kinds[name] = "histogram"
+                samples.setdefault(name, []).extend(
+                    _format_histogram(name=name, labels=labels, histogram=value)
+                )
+            else:
+                name = f"forger_{key}_total"
+                kinds[name] = "counter"
+                samples.setdefault(name, []).append(
+                    f"{name}{_format_labels(labels)} {value}"
+                )
+
+        targets = pipeline.get("targets") or {None: pipeline["connection"]}
+        for target, connection in targets.items():
+            target_labels = labels
+            if target is not None:
+                target_labels = {
+                    **labels,
+                    "target": target,
+                    "address": connection.get("address", ""),
+                }
+            for key, value in connection.items():
+                if key == "address":
+                    continue
+                if key == "state":
+                    # one sample per connection. the state is a label, so it can be used to filter.
+                    name = "forger_connection_state"
+                    kinds[name] = "gauge"
+                    samples.setdefault(name, []).append(
+                        f"{name}{_format_labels({**target_labels, 'state': value})} 1"
+                    )
+                    continue
+                if isinstance(value, dict):
+                    name = f"forger_connection_{key}_seconds"
+                    kinds[name] = "histogram"
+                    samples.setdefault(name, []).extend(
+                        _format_histogram(
+                            name=name, labels=target_labels, histogram=value
+                        )
+                    )
+                    continue
+                if key in ("queue_depth", "connected", "spool_depth"):
+                    name = f"forger_connection_{key}"
+                    kinds[name] = "gauge"
+                else:
+                    name = f"forger_connection_{key}_total"
+                    kinds[name] = "counter"
+                samples.setdefault(name, []).append(
+                    f"{name}{_format_labels(target_labels)} {int(value)}"
+                )
+
+    text = []
+    for name, lines in samples.items():
+        text.append(f"# TYPE {name} {kinds[name]}")
+        text += lines
+
+    return "\n".join(text) + "\n"
+
+
+class MetricsServer:
+    """
+    Serve metrics in prometheus text format on a local http port.
+    """
+
+    def __init__(
+        self,
+        get_stats: Callable[[], Dict],
+        host: str = METRICS_HOST,
+        port: int = METRICS_PORT,
+    ):
+        """
+        Start serving metrics right away in a background thread.
+
+        :param get_stats: Function that returns the current metrics (e.g. Manager.stats).
+        :param host: Host to bind to.
+        :param port: Port to bind to. Pass 0 to use any free port.
+        """
+        self.get_stats = get_stats
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = to_prometheus(server.get_stats()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.host, self.port = self.httpd.server_address[:2]
+        self.thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop serving metrics.
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
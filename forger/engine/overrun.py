@@ -0,0 +1,145 @@
+"""Use this module to find pipelines that can not keep up with their frequency."""
+
+__all__ = [
+    "OverrunDetector",
+]
+
+from collections import deque
+from time import perf_counter, time
+from typing import Dict, Optional
+
+from forger.auxiliary.constants import (
+    OVERRUN_HISTORY,
+    OVERRUN_INTERVALS,
+    OVERRUN_PATIENCE,
+    OVERRUN_THRESHOLD,
+    OVERRUN_WINDOW,
+)
+from forger.auxiliary.enums import OverrunPolicies
+from forger.auxiliary.exceptions import InvalidInputValueError
+
+
+class OverrunDetector:
+    """
+    Measures the rate a pipeline achieves (published ticks per second) and compares it with its frequency.
+
+    Note:
+    - The rate is measured over windows of at least window seconds and intervals ticks.
+    - A single slow window is not an overrun. Only patience windows in a row below threshold
+      are, so the policy of the pipeline is applied to sustained overruns only.
+    - Every decision is kept in events, so it can be read through the api (see Pipeline.get_stats).
+    """
+
+    def __init__(
+        self,
+        policy: str = OverrunPolicies.WARN.value,
+        window: float = OVERRUN_WINDOW,
+        intervals: int = OVERRUN_INTERVALS,
+        threshold: float = OVERRUN_THRESHOLD,
+        patience: int = OVERRUN_PATIENCE,
+    ):
+        """
+        Initialize variables
+
+        :param policy: What to do about a sustained overrun (warn, throttle, batch or shed).
+        :param window: Minimum time (in seconds) the rate is measured over.
+        :param intervals: Minimum number of intervals (of the frequency) the rate is measured over.
+        :param threshold: Share of the frequency that has to be achieved.
+        :param patience: Number of windows in a row below threshold that make a sustained overrun.
+        """
+        policies = [member.value for member in OverrunPolicies]
+        if policy not in policies:
+            raise InvalidInputValueError(
+                f"Given overrun policy ({policy}) is not one of {policies}."
+            )
+
+        self.policy = policy
+        self.window = window
+        self.intervals = intervals
+        self.threshold = threshold
+        self.patience = patience
+
+        self.target_rate = None
+        self.achieved_rate = None
+        self.overrunning = False
+        self.events = deque(maxlen=OVERRUN_HISTORY)
+        self.reset()
+
+    def reset(self):
+        """
+        Start measuring again (e.g. after the pipeline was paused or its frequency changed).
+        """
+        self.start = None
+        self.ticks = 0
+        self.streak = 0
+
+    def record(self, ticks: int, frequency: float, now: Optional[float] = None) -> bool:
+        """
+        Count the ticks of a single run of the pipeline.
+
+        :param ticks: Number of ticks that were published in this run.
+        :param frequency: Frequency (in Hz) the pipeline should achieve.
+        :param now: Time of the run (perf_counter). Now by default.
+        :return: True if a sustained overrun was detected and the policy should be applied.
+        """
+        if now is None:
+            now = perf_counter()
+        if self.start is None:
+            # the first run only starts the window.
+            self.start = now
+            return False
+
+        self.ticks += ticks
+        elapsed = now - self.start
+        if elapsed < max(self.window, self.intervals / frequency):
+            return False
+
+        self.target_rate = frequency
+        self.achieved_rate = self.ticks / elapsed
+        self.start = now
+        self.ticks = 0
+
+        if self.achieved_rate >= self.threshold * frequency:
+            self.streak = 0
+            if self.overrunning:
+                self.overrunning = False
+                self.add_event(action="recovered")
+            return False
+
+        self.streak += 1
+        if self.streak < self.patience:
+            return False
+        self.streak = 0
+        self.overrunning = True
+        return True
+
+    def add_event(self, action: str, detail: str = ""):
+        """
+        Remember a decision.
+
+        :param action: What was done (e.g. the policy that was applied).
+        :param detail: Description of the decision.
+        """
+        self.events.append(
+            {
+                "time": time(),
+                "action": action,
+                "target_rate": self.target_rate,
+                "achieved_rate": self.achieved_rate,
+                "detail": detail,
+            }
+        )
+
+    def get_stats(self) -> Dict:
+        """
+        Get the latest measurement and all decisions.
+
+        :return: Dictionary with policy, target and achieved rate (in Hz), overrun state and decisions.
+        """
+        return {
+            "policy": self.policy,
+            "target_rate": self.target_rate,
+            "achieved_rate": self.achieved_rate,
+            "overrunning": self.overrunning,
+            "events": list(self.events),
+        }
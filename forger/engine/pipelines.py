@@ -4,13 +4,32 @@ __all__ = [
     "Pipeline",
 ]
 
-from typing import List, Optional
+import json
+import warnings
+from datetime import datetime
+from time import perf_counter, time, time_ns
+from typing import Dict, List, Optional, Tuple, Union
 
 import apscheduler.schedulers.background
 
-from forger.auxiliary.constants import DEFAULT_PIPELINE_SETTINGS
+from forger.auxiliary.constants import (
+    DEFAULT_PIPELINE_SETTINGS,
+    OVERRUN_MAX_BATCH,
+    SENT_KEY,
+    SEQUENCE_KEY,
+    TARGET_QUEUE_LIMIT,
+)
+from forger.auxiliary.enums import OverrunPolicies
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.engine.arrivals import ArrivalProcess, ArrivalTrigger
 from forger.engine.channels import Channel, Channels
 from forger.engine.connections import Connection
+from forger.engine.metrics import PipelineMetrics
+from forger.engine.overrun import OverrunDetector
+from forger.engine.profiler import TRACER
+from forger.engine.replay import Replay
+from forger.engine.spool import Spool
+from forger.engine.tls import TLSPool
 
 defaults = DEFAULT_PIPELINE_SETTINGS
 
@@ -29,6 +48,16 @@ class Pipeline:
         frequency: float,
         scheduler: apscheduler.schedulers.background.BackgroundScheduler,
         name: str = "",
+        measure: bool = False,
+        queue_limit: int = TARGET_QUEUE_LIMIT,
+        per_channel: bool = False,
+        mqtt5: bool = False,
+        message_expiry: Optional[int] = None,
+        spool: Optional[Spool] = None,
+        tls: Optional[TLSPool] = None,
+        fast_batches: bool = False,
+        overrun_policy: str = OverrunPolicies.WARN.value,
+        arrivals: Optional[ArrivalProcess] = None,
     ):
         """
         Adding a new entry in the pipeline dictionary.
@@ -40,25 +69,224 @@ class Pipeline:
         :param frequency: Frequency in that data will be published.
         :param scheduler: Scheduler that times the data publishing.
         :param name: Name of the new pipeline.
+        :param measure: Add a sequence number and send time (in ns since epoch) to each payload.
+        :param queue_limit: Number of messages that may wait to be written to a single target.
+            Further messages to that target are dropped until it catches up.
+        :param per_channel: Publish one message per channel name on topic/name instead of a single
+            message with all channels on topic.
+        :param mqtt5: Connect with mqtt 5 and use topic aliases for the most published topics.
+        :param message_expiry: Seconds the broker keeps a message for subscribers that are offline (mqtt 5 only).
+        :param spool: Spool that keeps messages on disk while the broker is not available or does not keep up.
+        :param tls: Pool to connect via TLS with. Share it between pipelines, so they share context and sessions.
+        :param fast_batches: Hand all messages of a tick to the mqtt client as a single prebuilt write
+            (see Connection). This relies on internals of paho-mqtt.
+        :param overrun_policy: What to do if the pipeline can not keep up with its frequency for a while:
+            warn (only report it), throttle (lower the frequency to the achieved rate),
+            batch (publish several ticks per run) or shed (stop publishing half of the channels).
+        :param arrivals: Publish at the times of this arrival process (e.g. Poisson, Bursts or OnOff)
+            instead of every 1 / frequency seconds. frequency is its mean rate.
 
         Note:
         - name can also be None or an empty string.
+        - use a LatencyListener to measure latency and loss of a pipeline with measure=True.
+        - use add_target to publish the same data to further brokers.
+        - with per_channel=True, each message looks like {"timestamp": ..., "value": ...}.
+          All messages of a tick are handed to the mqtt client in a single batch.
+        - the achieved rate and all overrun decisions are reported by get_stats.
+          A policy that can not degrade the pipeline any further falls back to warn.
+        - with arrivals, each message is published with the time of its arrival as tick, so dead periods
+          of the channels still apply. Arrivals that are late are published with the next run.
+          The rate of such a pipeline varies on purpose, so it is not checked for overruns.
         """
 
+        self._check_frequency(frequency=frequency)
+        self.overrun = OverrunDetector(policy=overrun_policy)
+
         self.pid = pid
         self.channels = Channels()
-        self.connection = Connection(ip=ip, port=port)
+        self.connection = Connection(
+            ip=ip,
+            port=port,
+            mqtt5=mqtt5,
+            message_expiry=message_expiry,
+            spool=spool,
+            tls=tls,
+            fast_batches=fast_batches,
+        )
+        # target id -> connection. ids are not reused, so the stats of a removed target are not mixed up.
+        self._targets = {0: self.connection}
+        self._next_target = 1
+        self.queue_limit = queue_limit
+        self.metrics = PipelineMetrics()
 
         self.topic = topic
         self.frequency = frequency
         self.name = name
         self.active = True
+        self.measure = measure
+        self.per_channel = per_channel
+        self.sequence = 0
+        self.arrivals = arrivals
+        # trigger of the job if arrivals is set. it is kept here, so publish never depends on the job.
+        self.arrival_trigger = None
+        # ticks that are published per run and channels that are not published (see overrun_policy).
+        self.batch = 1
+        self.shed = set()
+        # channel name -> topic of its messages (if per_channel is set).
+        self._topics = {}
+        self._pending_topic = None
         self.job = scheduler.add_job(
-            func=self.publish,
-            trigger="interval",
-            seconds=(1 / frequency),
-            id=str(pid),
+            func=self.publish, id=str(pid), **self._get_trigger()
+        )
+
+    @staticmethod
+    def _check_frequency(frequency: float):
+        """
+        Make sure that the given publishing frequency can be used by the scheduler.
+
+        :param frequency: Frequency (in Hz) to check.
+        """
+        if frequency <= 0:
+            raise InvalidInputValueError(
+                f"Given frequency ({frequency}) must be greater than zero."
+            )
+
+    @staticmethod
+    def _get_start_date(frequency: float) -> datetime:
+        """
+        Get the next multiple of the publishing interval (since epoch).
+        Pipelines that start there publish at the same ticks as all other pipelines with the same
+        (or a multiple of the) frequency, so they can share generators.
+
+        :param frequency: Frequency (in Hz) of the pipeline.
+        :return: Start date of the scheduler job.
+        """
+        interval = 1 / frequency
+        return datetime.fromtimestamp((time() // interval + 1) * interval)
+
+    def _get_tick(self) -> int:
+        """
+        Get the tick (the closest multiple of the publishing interval) that is published right now.
+
+        :return: Time of the tick (in nanoseconds since epoch).
+        """
+        interval = round(1e9 / self.frequency)
+        return round(time_ns() / interval) * interval
+
+    def update(self, frequency: Optional[float] = None, topic: Optional[str] = None):
+        """
+        Change the settings of this pipeline while it is running.
+        The scheduler job is rescheduled in place and the connection is kept.
+        A new topic is used starting with the next published payload.
+
+        :param frequency: New frequency (in Hz) in that data will be published.
+        :param topic: New topic to publish data onto.
+        """
+        if frequency is not None:
+            self._check_frequency(frequency=frequency)
+            self.frequency = frequency
+            self._reschedule()
+
+        if topic is not None:
+            self._pending_topic = topic
+
+    def _get_trigger(self) -> Dict:
+        """
+        Get the trigger of the scheduler job.
+        With arrivals, a new ArrivalTrigger is created and kept in arrival_trigger before it is handed to the job.
+
+        :return: Keyword arguments of add_job (or reschedule) that set the trigger.
+        """
+        if self.arrivals is not None:
+            self.arrival_trigger = ArrivalTrigger(
+                process=self.arrivals, frequency=self.frequency
+            )
+            return {"trigger": self.arrival_trigger}
+
+        frequency = self.frequency / self.batch
+        return {
+            "trigger": "interval",
+            "seconds": 1 / frequency,
+            "start_date": self._get_start_date(frequency=frequency),
+        }
+
+    def _reschedule(self):
+        """
+        Reschedule the job after the frequency or the number of ticks per run changed.
+        """
+        self.job.reschedule(**self._get_trigger())
+
+        # rescheduling computes a new run time, which would resume a paused job.
+        if not self.active:
+            self.job.pause()
+        self.overrun.reset()
+
+    @property
+    def targets(self) -> List[Connection]:
+        """
+        Get the connections of all targets, the first target first.
+
+        :return: List of Connection instances.
+        """
+        return list(self._targets.values())
+
+    def add_target(
+        self,
+        ip: str,
+        port: int,
+        mqtt5: bool = False,
+        message_expiry: Optional[int] = None,
+        spool: Optional[Spool] = None,
+        tls: Optional[TLSPool] = None,
+        fast_batches: bool = False,
+    ) -> Connection:
+        """
+        Publish the data of this pipeline to another broker as well.
+        The payload is only encoded once per tick and the same bytes are sent to all targets.
+
+        :param ip: IP of host that will receive data.
+        :param port: Port of host that will receive data.
+        :param mqtt5: Connect with mqtt 5 and use topic aliases for the most published topics.
+        :param message_expiry: Seconds the broker keeps a message for subscribers that are offline (mqtt 5 only).
+        :param spool: Spool that keeps messages on disk while this broker is not available or does not keep up.
+            Each target needs a spool of its own.
+        :param tls: Pool to connect via TLS with (see Pipeline).
+        :param fast_batches: Hand all messages of a tick to the mqtt client as a single prebuilt write (see Pipeline).
+        :return: Connection to the new target.
+        """
+        connection = Connection(
+            ip=ip,
+            port=port,
+            mqtt5=mqtt5,
+            message_expiry=message_expiry,
+            spool=spool,
+            tls=tls,
+            fast_batches=fast_batches,
         )
+        self._targets[self._next_target] = connection
+        self._next_target += 1
+        return connection
+
+    def remove_target(self, connection: Connection):
+        """
+        Stop publishing to a target that was added with add_target and close its connection.
+
+        :param connection: Connection as returned by add_target.
+        """
+        if connection is self.connection:
+            raise InvalidInputValueError(
+                "The first target of a pipeline can not be removed."
+            )
+        for tid, target in self._targets.items():
+            if target is connection:
+                break
+        else:
+            raise InvalidInputValueError(
+                f"Given connection ({connection.ip}:{connection.port}) is not a target of this pipeline."
+            )
+
+        del self._targets[tid]
+        connection.close()
 
     def add_channel(
         self,
@@ -68,8 +296,9 @@ class Pipeline:
         channel_type: Optional[str] = defaults["channel_type"],
         dead_frequency: Optional[float] = defaults["dead_frequency"],
         dead_period: Optional[float] = defaults["dead_period"],
-        replay_data: Optional[List] = defaults["replay_data"],
+        replay_data: Optional[Union[List, Replay]] = defaults["replay_data"],
         seed: Optional[int] = defaults["seed"],
+        replay_offset: int = defaults["replay_offset"],
     ) -> Channel:
         """
         Call Channels class to create a new Channel class instance.
@@ -80,8 +309,9 @@ class Pipeline:
         :param channel_type: Type of channel (e.g. sin, cos, ...).
         :param dead_frequency: Frequency in that the dead period will be applied again.
         :param dead_period: Time in seconds that the channel will not produce any data.
-        :param replay_data: List of data points that will be replayed.
+        :param replay_data: List of data points that will be replayed. Pass a Replay to replay by time.
         :param seed: Integer to set as seed so random values are reproducible.
+        :param replay_offset: Position in the replay data to start at (e.g. to shift channels that share data).
         :return: Instance of Channel class that has just been added.
         """
         channel = self.channels.add(
@@ -93,10 +323,22 @@ class Pipeline:
             dead_period=dead_period,
             replay_data=replay_data,
             seed=seed,
+            replay_offset=replay_offset,
         )
 
         return channel
 
+    def share_channel(self, channel: Channel) -> Channel:
+        """
+        Publish a channel of another pipeline on this pipeline as well.
+        The channel (and its generator) is shared, so it is only evaluated once per tick,
+        no matter how many pipelines publish it.
+
+        :param channel: Instance of Channel class (e.g. as returned by add_channel of another pipeline).
+        :return: The given Channel instance.
+        """
+        return self.channels.attach(channel=channel)
+
     def remove_channel(self, channel: Channel):
         """
         Removes a given Channel instance.
@@ -137,6 +379,8 @@ class Pipeline:
             self.active = not self.active
 
         if self.active:
+            # the pause must not count as overrun.
+            self.overrun.reset()
             self.job.resume()
         else:
             self.job.pause()
@@ -145,6 +389,232 @@ class Pipeline:
         """
         Publish data via mqtt client of this handler on topic that was set upon init of this class.
         """
-        self.connection.mqtt_client.publish(
-            topic=self.topic, payload=self.channels.get_payload()
+        if self._pending_topic is not None:
+            self.topic, self._pending_topic = self._pending_topic, None
+            self._topics = {}
+
+        ticks = self._get_ticks()
+        if not ticks:
+            return
+
+        if TRACER.enabled:
+            self._publish_traced(ticks=ticks)
+        else:
+            topics = []
+            payloads = []
+            for tick in ticks:
+                data = self.channels.get_data(tick=tick, skip=self.shed)
+                if self.measure:
+                    self._stamp(data)
+                tick_topics, tick_payloads = self._encode(data)
+                topics += tick_topics
+                payloads += tick_payloads
+
+            start = perf_counter()
+            self._send(topics=topics, payloads=payloads)
+            self.metrics.record_publish(
+                size=sum(map(len, payloads)),
+                duration=perf_counter() - start,
+                count=len(payloads),
+            )
+
+        if self.arrivals is None and self.overrun.record(
+            ticks=self.batch, frequency=self.frequency
+        ):
+            self._handle_overrun()
+
+    def _get_ticks(self) -> List[int]:
+        """
+        Get the ticks that are published in this run.
+        That is the current tick and (if batch > 1) the ones since the previous run.
+        With arrivals, these are all arrivals that are due.
+
+        :return: Times of the ticks (in nanoseconds since epoch), oldest first.
+        """
+        if self.arrivals is not None:
+            return self.arrival_trigger.pop_due(now=time())
+
+        tick = self._get_tick()
+        if self.batch == 1:
+            return [tick]
+        interval = round(1e9 / self.frequency)
+        return [tick - index * interval for index in range(self.batch - 1, -1, -1)]
+
+    def _handle_overrun(self):
+        """
+        Apply the overrun policy after the pipeline could not keep up with its frequency for a while.
+        """
+        policy = self.overrun.policy
+        achieved_rate = self.overrun.achieved_rate
+        names = [
+            name
+            for name in dict.fromkeys(
+                channel.name for channel in self.channels.channels.values()
+            )
+            if name not in self.shed
+        ]
+
+        if policy == OverrunPolicies.THROTTLE.value:
+            frequency = self.frequency
+            self.update(frequency=achieved_rate)
+            detail = f"Lowered frequency from {frequency:g} Hz to {achieved_rate:g} Hz."
+        elif policy == OverrunPolicies.BATCH.value and self.batch < OVERRUN_MAX_BATCH:
+            self.batch *= 2
+            self._reschedule()
+            detail = f"Publishing {self.batch} ticks per run."
+        elif policy == OverrunPolicies.SHED.value and len(names) > 1:
+            # the channels that were added last are shed first.
+            shed = names[(len(names) + 1) // 2 :]
+            self.shed.update(shed)
+            self.overrun.reset()
+            detail = f"Stopped publishing channels {', '.join(shed)}."
+        else:
+            # warn once per overrun (and whenever the policy can not do anything else).
+            events = self.overrun.events
+            if events and events[-1]["action"] == OverrunPolicies.WARN.value:
+                return
+            policy = OverrunPolicies.WARN.value
+            detail = (
+                f"Pipeline {self.pid} ({self.name}) achieves {achieved_rate:g} "
+                f"of {self.frequency:g} Hz."
+            )
+            warnings.warn(detail, RuntimeWarning)
+
+        self.overrun.add_event(action=policy, detail=detail)
+
+    def undo_overrun(self):
+        """
+        Publish all channels and a single tick per run again (e.g. after the load went down).
+        A frequency that was lowered is not raised again, use update for that.
+        """
+        self.shed.clear()
+        if self.batch > 1:
+            self.batch = 1
+            self._reschedule()
+        self.overrun.reset()
+
+    def _encode(self, data: Dict) -> Tuple[List[str], List[bytes]]:
+        """
+        Encode the data of the current tick.
+
+        :param data: Data of the current tick.
+        :return: Topic and encoded payload of each message (one per channel name if per_channel is set).
+        """
+        if not self.per_channel:
+            return [self.topic], [self.channels.encode(data).encode()]
+
+        # everything but the value is the same for all channels, so it is only encoded once.
+        timestamp = data.pop("timestamp")
+        stamp = {key: data.pop(key) for key in (SEQUENCE_KEY, SENT_KEY) if key in data}
+        head = '{"timestamp": "%s", "value": ' % timestamp
+        tail = ", " + json.dumps(stamp)[1:] if stamp else "}"
+        topics = self._topics
+
+        payloads = []
+        for name, value in data.items():
+            if name not in topics:
+                topics[name] = f"{self.topic}/{name}"
+            value = float(value)
+            payloads.append(
+                (
+                    head
+                    + (repr(value) if abs(value) < float("inf") else json.dumps(value))
+                    + tail
+                ).encode()
+            )
+        return [topics[name] for name in data], payloads
+
+    def _send(self, topics: List[str], payloads: List[bytes]):
+        """
+        Hand the encoded payloads to the mqtt client of every target.
+        Targets with too many messages waiting (e.g. a slow or unreachable broker) are skipped,
+        so they never hold back the others. Their messages are spooled (if they have a spool) or dropped.
+
+        :param topics: Topic of each message.
+        :param payloads: Encoded payload of each message.
+        """
+        for connection in self._targets.values():
+            if connection.metrics.queue_depth >= self.queue_limit:
+                if connection.spool is not None:
+                    connection.spill(topics=topics, payloads=payloads)
+                else:
+                    connection.metrics.dropped += len(payloads)
+                continue
+            if self.per_channel or len(payloads) > 1:
+                connection.publish_batch(topics=topics, payloads=payloads)
+            else:
+                connection.publish(topic=topics[0], payload=payloads[0])
+
+    def _stamp(self, data: Dict):
+        """
+        Add sequence number and send time to the given data.
+
+        :param data: Data of the current tick.
+        """
+        data[SEQUENCE_KEY] = self.sequence
+        data[SENT_KEY] = time_ns()
+        self.sequence += 1
+
+    def _publish_traced(self, ticks: List[int]):
+        """
+        Same as publish but also record how long each stage takes.
+
+        :param ticks: Times of the ticks (in nanoseconds since epoch) that are published.
+        """
+        with TRACER.profiling():
+            start = perf_counter()
+            samples = [
+                self.channels.get_data(tick=tick, skip=self.shed) for tick in ticks
+            ]
+            if self.measure:
+                for data in samples:
+                    self._stamp(data)
+            encode_start = perf_counter()
+            topics = []
+            payloads = []
+            for data in samples:
+                tick_topics, tick_payloads = self._encode(data)
+                topics += tick_topics
+                payloads += tick_payloads
+            publish_start = perf_counter()
+            self._send(topics=topics, payloads=payloads)
+            end = perf_counter()
+
+        TRACER.record(stage="payload", duration=encode_start - start)
+        TRACER.record(stage="encode", duration=publish_start - encode_start)
+        TRACER.record(stage="publish", duration=end - publish_start)
+        TRACER.record(stage="tick", duration=end - start)
+        self.metrics.record_publish(
+            size=sum(map(len, payloads)),
+            duration=end - publish_start,
+            count=len(payloads),
         )
+
+    def get_stats(self) -> Dict:
+        """
+        Get the current metrics of this pipeline and its connections.
+
+        :return: Dictionary with name, topic and all metrics. The metrics of each target are keyed by its id
+            (0 is the first target, further ids are given by add_target) and hold its ip:port as address.
+        """
+        return {
+            "name": self.name,
+            "topic": self.topic,
+            "metrics": self.metrics.get_stats(),
+            "connection": self.connection.metrics.get_stats(),
+            "targets": {
+                tid: {
+                    **connection.metrics.get_stats(),
+                    "address": "%s:%i" % connection.get_address(),
+                    "connected": connection.is_connected(),
+                    "state": connection.state.value,
+                }
+                for tid, connection in self._targets.items()
+            },
+            "overrun": {
+                **self.overrun.get_stats(),
+                "frequency": self.frequency,
+                "batch": self.batch,
+                "shed": sorted(self.shed),
+            },
+        }
@@ -4,15 +4,26 @@ __all__ = [
     "Plotter",
 ]
 
-import json
 import time
+from collections import deque
+from typing import Optional, Tuple
 
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import numpy as np
 
-from forger.auxiliary.constants import DISPLAY_DATE_FORMAT, MEMORY
-from forger.auxiliary.misc import datestr2num
+from forger.auxiliary.constants import (
+    BUFFER_SIZE,
+    DISPLAY_DATE_FORMAT,
+    FPS,
+    MEMORY,
+    SENT_KEY,
+    SEQUENCE_KEY,
+    X_HEADROOM,
+    Y_MARGIN,
+)
+from forger.auxiliary.misc import datestrs2num, decode_payloads
+from forger.engine.buffers import MinMaxBuffer
 from forger.engine.connections import Listener
 
 
@@ -21,19 +32,45 @@ class Plotter:
     Class to listen to an mqtt connection and draw all the data.
     """
 
-    def __init__(self, ip: str, port: int, topic: str, memory: int = MEMORY):
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        topic: str,
+        memory: int = MEMORY,
+        buffer_size: int = BUFFER_SIZE,
+        fps: float = FPS,
+    ):
         """
         Initialize painter.
         :param ip: IP to scan for data.
         :param port: Port to scan for data.
         :param topic: Topic to listen to.
         :param memory: Number of data points to show at the same time.
+            Long windows are reduced to the lowest and highest value per pixel before drawing.
+        :param buffer_size: Maximum number of received payloads that wait to be drawn.
+            If drawing falls behind, the oldest payloads are dropped.
+        :param fps: Number of frames per second to draw. Data is received independent of this.
         """
         self.memory = memory
+        self.fps = fps
 
         self.running = True
         self.plots = dict()
-        self.buffer = []
+        self.data = dict()
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+
+        # drawing state
+        self.background = None
+        self.redraw = True
+
+        # measured rates
+        self.frame_rate = 0.0
+        self.ingest_rate = 0.0
+        self._frames = 0
+        self._ingested = 0
+        self._rates_since = time.perf_counter()
 
         self.listener = Listener(
             ip=ip, port=port, topic=topic, on_message=self._on_message
@@ -45,25 +82,40 @@ class Plotter:
     def _run(self):  # pragma: no cover
         """
         Define main running loop.
+        Received payloads are processed all the time, but frames are only drawn at the target rate.
         """
+        frame_interval = 1 / self.fps
+        next_frame = time.perf_counter()
+
         while self.running:
-            plt.pause(0.0001)
+            self._process_payload()
 
-            if len(self.buffer) > 0:
-                self._process_payload()
+            now = time.perf_counter()
+            if now >= next_frame:
+                self._draw_frame()
+                self.fig.canvas.flush_events()
+                next_frame = max(next_frame + frame_interval, now)
             else:
-                time.sleep(0.1)
+                time.sleep(min(next_frame - now, frame_interval / 4))
 
     def _process_payload(self):
         """
-        Take a payload from the buffer and pass it to the update method.
-        Remove said payload from buffer afterwards.
+        Take all raw payloads from the buffer, decode them at once
+        and add their data points to the buffers of each channel.
+        Nothing is drawn here.
         """
-        self.update(payload=self.buffer[0])
-        self.buffer = self.buffer[1:]
-        print(f"# payloads in buffer: {len(self.buffer)}")
+        if not self.buffer:
+            return
 
-    def _stop(self):
+        payloads = [self.buffer.popleft() for _ in range(len(self.buffer))]
+        rows = decode_payloads(payloads)
+        xs = datestrs2num([row.pop("timestamp", None) for row in rows])
+        for x, row in zip(xs, rows):
+            if x == x:
+                self._ingest(x=x, payload=row)
+        self._ingested += len(payloads)
+
+    def _stop(self, *args):
         """
         Define what to do when things should stop.
         """
@@ -81,90 +133,192 @@ class Plotter:
 
         plt.ion()
 
-        self.ax.set_autoscaley_on(True)
         formatter = mdates.DateFormatter(DISPLAY_DATE_FORMAT)
         self.ax.xaxis.set_major_formatter(formatter)
         # self.ax.xaxis.set_major_locator(mdates.SecondLocator())
         self.ax.grid()
+        self.readout = self.ax.text(
+            0.99,
+            0.01,
+            "",
+            transform=self.ax.transAxes,
+            ha="right",
+            va="bottom",
+            animated=True,
+        )
         self.fig.canvas.mpl_connect("close_event", self._stop)
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
 
         plt.show()
 
     def _on_message(self, client, userdata, msg):
         """
         Define what to do when message is received.
+        Only queue the raw payload. It is decoded later together with all other pending payloads.
         """
-        self.buffer.append(json.loads(msg.payload.decode()))
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(msg.payload)
 
-    def update(self, payload: dict):
+    def _ingest(self, x: float, payload: dict):
         """
-        Use the given payload to update all plots.
+        Add the data points of the given payload to the buffers of each channel.
+        Channels that are not known yet get a new plot.
+
+        :param x: Timestamp of the payload (as numeric value).
+        :param payload: Decoded payload without timestamp.
         """
-        x = datestr2num(payload.pop("timestamp"))
+        payload.pop(SEQUENCE_KEY, None)
+        payload.pop(SENT_KEY, None)
 
-        for channel in list(self.plots):
-            self._update_plot(channel=channel, x=x, y=payload.get(channel))
+        for channel, data in self.data.items():
+            data.append(x, payload.get(channel))
 
         for missing_plot in set(payload) - set(self.plots):
             self._add_plot(
                 channel=missing_plot, latest_x=x, latest_y=payload.get(missing_plot)
             )
 
+    def _refresh_plots(self):
+        """
+        Hand the buffers of each channel to its plot.
+        Remove plots that did not receive any data for too long.
+        """
+        for channel in list(self.plots):
+            data = self.data[channel]
+            if data.is_empty():
+                self._remove_plot(channel=channel)
+            else:
+                self.plots[channel].set_data(*data.get())
+
+    def _draw_frame(self):
+        """
+        Draw a single frame.
+        The axes are only redrawn if plots were added or removed or the data left the current limits.
+        Otherwise only the lines are drawn on top of the cached background (blitting).
+        """
+        self._refresh_plots()
+
+        limits = self._get_data_limits()
+        if limits is not None and self._rescale(limits=limits):
+            self.redraw = True
+
+        self._update_rates()
+        self.readout.set_text(
+            f"{self.frame_rate:.1f} frames/s | {self.ingest_rate:.0f} payloads/s"
+        )
         self._update_canvas()
 
-    def _update_plot(self, channel: str, x: float, y: float):
+    def _get_data_limits(self) -> Optional[Tuple[float, float, float, float]]:
         """
-        Update visualization of each plot.
-        :param channel: Name of plot/channel to update.
-        :param x: Timestamp of latest data point.
-        :param y: Latest data point of the given channel.
+        Get the limits of the data of all plots.
+
+        :return: lowest x, highest x, lowest y and highest y. None if there is no data.
         """
-        x_data = self._add_data_point(data=self.plots[channel].get_xdata(), new_value=x)
-        y_data = self._add_data_point(data=self.plots[channel].get_ydata(), new_value=y)
+        if not self.plots:
+            return None
 
-        if np.isnan(y_data).all():
-            self._remove_plot(channel=channel)
-        else:
-            self.plots[channel].set_data(x_data, y_data)
+        data = [self.data[channel].get() for channel in self.plots]
+        x_min = min(x[0] for x, _ in data)
+        x_max = max(x[-1] for x, _ in data)
+        y_min = min(np.nanmin(y) for _, y in data)
+        y_max = max(np.nanmax(y) for _, y in data)
+        return x_min, x_max, y_min, y_max
+
+    def _rescale(self, limits: Tuple[float, float, float, float]) -> bool:
+        """
+        Change the limits of the axes if the data left them.
+        Some headroom is left on the right, so the x axis does not have to move with every data point.
+
+        :param limits: lowest x, highest x, lowest y and highest y of the data.
+        :return: True if the limits were changed.
+        """
+        x_min, x_max, y_min, y_max = limits
+        (x_low, x_high), (y_low, y_high) = self.ax.get_xlim(), self.ax.get_ylim()
+        changed = False
+
+        if x_max > x_high or x_min < x_low:
+            span = (x_max - x_min) or 1 / 86400  # one second in matplotlib dates.
+            self.ax.set_xlim(x_min, x_max + span * X_HEADROOM)
+            changed = True
+
+        if y_max > y_high or y_min < y_low:
+            margin = (y_max - y_min) * Y_MARGIN or 1
+            self.ax.set_ylim(y_min - margin, y_max + margin)
+            changed = True
+
+        return changed
+
+    def _update_rates(self):
+        """
+        Count the drawn frame and update the measured rates about once per second.
+        """
+        self._frames += 1
+        now = time.perf_counter()
+        elapsed = now - self._rates_since
+        if elapsed >= 1:
+            self.frame_rate = self._frames / elapsed
+            self.ingest_rate = self._ingested / elapsed
+            self._frames = self._ingested = 0
+            self._rates_since = now
 
     def _add_plot(self, channel: str, latest_x: float, latest_y: float):
         """
         Create a new plot. Use latest x and y values to fill initial data arrays.
+        The data points are reduced to about two per pixel of the plot width.
         :param channel: Name of plot/channel to update.
         :param latest_x: Timestamp of latest data point.
         :param latest_y: Latest data point of the given channel.
         """
-        x = [latest_x] * self.memory
-        y = [latest_y] * self.memory
+        data = MinMaxBuffer(
+            size=self.memory,
+            buckets=int(self.ax.get_window_extent().width),
+            fill_x=latest_x,
+            fill_y=float("nan") if latest_y is None else latest_y,
+        )
+        self.data[channel] = data
 
-        self.plots[channel] = self.ax.plot(x, y, "-", label=channel)[0]
+        self.plots[channel] = self.ax.plot(
+            *data.get(), "-", label=channel, animated=True
+        )[0]
         self.ax.legend(loc=2)
+        self.redraw = True
 
     def _remove_plot(self, channel: str):
         """
         Removes a plot.
         :param channel: Name of plot/channel to remove.
         """
-        self.ax.lines.remove(self.plots[channel])
-        self.plots.pop(channel)
+        self.plots.pop(channel).remove()
+        self.data.pop(channel)
         self.ax.legend(loc=2)
+        self.redraw = True
 
-    @staticmethod
-    def _add_data_point(data: np.array, new_value: float) -> np.array:
+    def _on_draw(self, event=None):
         """
-        Add the new_value to the list of data without changing it size (oldest value will be removed).
-        :param data: numpy array of data points to update.
-        :param new_value: new value to insert into data.
-        :return: updated list of data.
+        Define what to do when the whole figure was drawn (e.g. after resizing the window).
+        Keep the drawn figure as background and draw all lines on top of it.
         """
-        return np.insert(data[1:], data.size - 1, new_value)
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
 
-    def _update_canvas(self):  # pragma: no cover
+    def _draw_artists(self):
         """
-        After plots were updated, the scaling or limits might be off.
-        Take care of that.
+        Draw all lines and the readout.
         """
-        self.ax.relim()
-        self.ax.autoscale_view()
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
+        for plot in self.plots.values():
+            self.ax.draw_artist(plot)
+        self.ax.draw_artist(self.readout)
+
+    def _update_canvas(self):
+        """
+        Draw the current frame.
+        Draw the whole figure if needed. Otherwise restore the background and draw only the lines.
+        """
+        if self.redraw or self.background is None:
+            self.redraw = False
+            self.fig.canvas.draw()
+        else:
+            self.fig.canvas.restore_region(self.background)
+            self._draw_artists()
+        self.fig.canvas.blit(self.fig.bbox)
@@ -0,0 +1,174 @@
+"""This module contains everything that is needed to find out where the engine spends its time."""
+
+__all__ = [
+    "Tracer",
+    "TRACER",
+]
+
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, List
+
+from forger.engine.metrics import Histogram
+
+PERCENTILES = (50, 90, 99)
+
+
+class Tracer:
+    """
+    Class to collect timings of the stages of the hot path (generate, payload, encode and publish).
+
+    Note:
+    - The hot path only checks the enabled flag, so tracing costs next to nothing while it is turned off.
+    """
+
+    def __init__(self):
+        """
+        Initialize variables
+        """
+        self.enabled = False
+        self.stages = {}
+        self.profile = None
+        self.tracing_memory = False
+        self._lock = Lock()
+        self._profile_lock = Lock()
+
+    def start(self, cprofile: bool = False, memory: bool = False):
+        """
+        Forget all previous timings and start tracing.
+
+        :param cprofile: Also collect a cProfile of the traced stages.
+        :param memory: Also take a tracemalloc snapshot when tracing stops.
+        """
+        with self._lock:
+            self.stages = {}
+
+        self.profile = cProfile.Profile() if cprofile else None
+        self.tracing_memory = memory and not tracemalloc.is_tracing()
+        if self.tracing_memory:
+            tracemalloc.start()
+
+        self.enabled = True
+
+    def stop(self, top: int = 20) -> Dict:
+        """
+        Stop tracing and create a report of everything that was collected.
+
+        :param top: Number of entries to keep of the cProfile and tracemalloc output.
+        :return: Dictionary with timings per stage and (optionally) cProfile and tracemalloc output.
+        """
+        self.enabled = False
+
+        report = {"stages": self.get_stages()}
+
+        if self.profile is not None:
+            with self._profile_lock:
+                report["cprofile"] = self._get_profile_report(top=top)
+            self.profile = None
+
+        if self.tracing_memory:
+            report["tracemalloc"] = self._get_memory_report(top=top)
+            tracemalloc.stop()
+            self.tracing_memory = False
+
+        return report
+
+    def record(self, stage: str, duration: float):
+        """
+        Record the duration of a single run of a stage.
+
+        :param stage: Name of the stage (e.g. generate, payload, encode or publish).
+        :param duration: Time (in seconds) the stage took.
+        """
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(duration)
+
+    @contextmanager
+    def profiling(self):
+        """
+        Run the enclosed code under cProfile if a profile is being collected.
+        Only one thread is profiled at a time. Other threads run unprofiled instead of waiting.
+        """
+        profile = self.profile
+        if profile is None or not self._profile_lock.acquire(blocking=False):
+            yield
+            return
+
+        try:
+            profile.enable()
+            yield
+        finally:
+            profile.disable()
+            self._profile_lock.release()
+
+    def get_stages(self) -> Dict:
+        """
+        Get a summary of the timings of each stage.
+
+        :return: Dictionary with count, total, mean and percentiles (in seconds) per stage.
+        """
+        with self._lock:
+            stages = dict(self.stages)
+
+        summary = {}
+        for stage, histogram in sorted(stages.items()):
+            summary[stage] = {
+                "count": histogram.count,
+                "total": histogram.sum,
+                "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+            }
+            for percentile in PERCENTILES:
+                summary[stage][f"p{percentile}"] = histogram.get_percentile(percentile)
+
+        return summary
+
+    def _get_profile_report(self, top: int) -> List[Dict]:
+        """
+        Get the functions that took the most time while profiling.
+
+        :param top: Number of functions to report.
+        :return: List of functions sorted by cumulative time.
+        """
+        try:
+            stats = pstats.Stats(self.profile)
+        except TypeError:
+            # nothing was profiled at all.
+            return []
+
+        rows = []
+        for (filename, line, function), values in stats.stats.items():
+            _, calls, total_time, cumulative_time, _ = values
+            rows.append(
+                {
+                    "function": f"{filename}:{line}({function})",
+                    "calls": calls,
+                    "total_time": total_time,
+                    "cumulative_time": cumulative_time,
+                }
+            )
+
+        rows.sort(key=lambda row: row["cumulative_time"], reverse=True)
+        return rows[:top]
+
+    @staticmethod
+    def _get_memory_report(top: int) -> List[Dict]:
+        """
+        Get the source lines that allocated the most memory while tracing.
+
+        :param top: Number of source lines to report.
+        :return: List of source lines sorted by allocated size.
+        """
+        snapshot = tracemalloc.take_snapshot()
+        return [
+            {"location": str(stat.traceback), "size": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:top]
+        ]
+
+
+TRACER = Tracer()
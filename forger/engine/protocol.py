@@ -0,0 +1,50 @@
+"""This module contains the parts of the mqtt wire format that clients and the broker have in common."""
+
+__all__ = [
+    "MESSAGE_EXPIRY",
+    "TOPIC_ALIAS",
+    "TOPIC_ALIAS_MAXIMUM_PROPERTY",
+    "encode_remaining_length",
+    "decode_variable_integer",
+]
+
+from typing import Tuple
+
+# identifiers of the mqtt 5 properties that are written or read by forger.
+MESSAGE_EXPIRY = 0x02
+TOPIC_ALIAS = 0x23
+TOPIC_ALIAS_MAXIMUM_PROPERTY = 0x22
+
+
+def encode_remaining_length(length: int) -> bytes:
+    """
+    Encode the remaining length of a mqtt packet.
+
+    :param length: Number of bytes that follow the fixed header.
+    :return: Encoded length (1 to 4 bytes).
+    """
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def decode_variable_integer(data: bytes, position: int) -> Tuple[int, int]:
+    """
+    Decode a variable byte integer (e.g. the remaining length of a mqtt packet).
+
+    :param data: Data that contains the integer.
+    :param position: Position of the first byte of the integer.
+    :return: Value and the position right after the integer.
+    """
+    value = 0
+    multiplier = 1
+    while True:
+        byte = data[position]
+        value += (byte & 0x7F) * multiplier
+        multiplier *= 128
+        position += 1
+        if not byte & 0x80:
+            return value, position
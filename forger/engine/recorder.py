@@ -0,0 +1,334 @@
+"""Use this module to record the data that pipelines publish to disk and read it back."""
+
+__all__ = [
+    "Recorder",
+    "Recording",
+]
+
+import json
+import logging
+import os
+from collections import deque
+from threading import Event, Lock, Thread
+from typing import Dict, Iterator, List, Union
+from urllib.parse import quote
+
+import numpy as np
+
+from forger.auxiliary.constants import RECORD_INTERVAL, SEGMENT_SIZE
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.auxiliary.misc import decode_payloads, to_datetime64
+from forger.engine.connections import Connection
+
+INDEX_FILE = "index.json"
+TIMESTAMP = "timestamp"
+
+logger = logging.getLogger(__name__)
+
+
+class Recorder:
+    """
+    Class to record the payloads of one or more topics into a columnar log on disk.
+
+    Note:
+    - The network thread only queues raw payloads. They are decoded and written in batches by a worker thread.
+    - Each topic is written into segment files (.npy) with one column per channel.
+      A new segment is started when the current one is full or a new channel shows up.
+    - index.json lists all segments and how many rows are valid. It is rewritten after each batch.
+    - A batch that can not be written (e.g. the disk is full) is logged and counted as dropped.
+      The worker thread keeps going, so the queue does not grow without bound.
+    - If the index can not be written, that is logged as well and it is written again after the next batch.
+    """
+
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        topics: Union[str, List[str]],
+        path: str,
+        segment_size: int = SEGMENT_SIZE,
+        interval: float = RECORD_INTERVAL,
+    ):
+        """
+        Initialize new recorder and start recording right away.
+
+        :param ip: IP of target host.
+        :param port: Port of target host.
+        :param topics: Topic or list of topics to record. Wildcards (+ and #) are allowed.
+        :param path: Directory to write the recording to. Existing recordings in it are continued.
+        :param segment_size: Number of rows per segment file.
+        :param interval: Seconds between two writes to disk.
+        """
+        self.path = path
+        self.segment_size = segment_size
+        self.interval = interval
+        os.makedirs(path, exist_ok=True)
+
+        self.index = Recording(path).index
+        self.segments = {}  # topic -> currently open segment (memmap).
+        self.rows = 0
+        self.dropped = 0
+
+        self.queue = deque()
+        self._lock = Lock()
+        self._wake = Event()
+        self.running = True
+        self._worker = Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+        self.connection = Connection(ip=ip, port=port)
+        self.connection.mqtt_client.on_message = self._on_message
+        for topic in [topics] if isinstance(topics, str) else topics:
+            self.connection.subscribe(topic)
+
+    def __enter__(self) -> "Recorder":
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _on_message(self, client, userdata, msg):
+        """
+        Define what to do when message is received.
+        Only queue the raw payload, so the network thread is never blocked.
+        """
+        self.queue.append((msg.topic, msg.payload))
+
+    def _run(self):
+        """
+        Write queued payloads to disk until the recorder is stopped.
+        """
+        while self.running:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Decode all queued payloads and write them to disk.
+        """
+        with self._lock:
+            batches = {}
+            queue = self.queue
+            for _ in range(len(queue)):
+                topic, payload = queue.popleft()
+                batches.setdefault(topic, []).append(payload)
+
+            if not batches:
+                return
+
+            for topic, payloads in batches.items():
+                try:
+                    self._write(topic=topic, rows=self._decode(payloads))
+                except Exception:
+                    self.dropped += len(payloads)
+                    logger.exception(
+                        "Dropped %i payloads of topic %s that could not be written to a segment.",
+                        len(payloads),
+                        topic,
+                    )
+            try:
+                self._write_index()
+            except OSError:
+                # the segments are written already. the index is written again with the next batch.
+                logger.exception(
+                    "Could not write the index of recording %s.", self.path
+                )
+
+    def _decode(self, payloads: List[bytes]) -> List[Dict]:
+        """
+        Decode a batch of payloads. Payloads that are not valid json objects with a timestamp are dropped.
+
+        :param payloads: Raw payloads.
+        :return: List of decoded payloads.
+        """
+        rows = [row for row in decode_payloads(payloads) if TIMESTAMP in row]
+        self.dropped += len(payloads) - len(rows)
+        return rows
+
+    def _write(self, topic: str, rows: List[Dict]):
+        """
+        Append rows to the current segment of a topic. Start new segments if needed.
+
+        :param topic: Topic the rows were received on.
+        :param rows: Decoded payloads.
+        """
+        if not rows:
+            return
+
+        columns = sorted({key for row in rows for key in row} - {TIMESTAMP})
+        segment = self.segments.get(topic)
+        if segment is not None and not set(columns) <= set(segment.dtype.names):
+            segment = None
+        if segment is not None:
+            columns = list(segment.dtype.names[1:])
+
+        timestamps = to_datetime64([row[TIMESTAMP] for row in rows])
+        valid = ~np.isnat(timestamps)
+        if not valid.all():
+            self.dropped += int(np.count_nonzero(~valid))
+            rows = [row for row, keep in zip(rows, valid) if keep]
+            timestamps = timestamps[valid]
+
+        batch = np.empty(len(rows), dtype=_get_dtype(columns))
+        batch[TIMESTAMP] = timestamps
+        for column in columns:
+            batch[column] = _to_float([row.get(column) for row in rows])
+
+        written = 0
+        while written < len(batch):
+            if segment is None:
+                segment = self._open_segment(topic=topic, columns=columns)
+            entry = self.index[topic][-1]
+            count = min(len(batch) - written, self.segment_size - entry["rows"])
+            segment[entry["rows"] : entry["rows"] + count] = batch[
+                written : written + count
+            ]
+            segment.flush()
+            entry["rows"] += count
+            written += count
+            if entry["rows"] >= self.segment_size:
+                segment = None
+
+        self.segments[topic] = segment
+        self.rows += len(batch)
+
+    def _open_segment(self, topic: str, columns: List[str]) -> np.memmap:
+        """
+        Create a new segment file for a topic and add it to the index.
+
+        :param topic: Topic of the segment.
+        :param columns: Names of the channels (without timestamp).
+        :return: Writable memmap of the segment.
+        """
+        entries = self.index.setdefault(topic, [])
+        file = "%s-%06i.npy" % (quote(topic, safe=""), len(entries))
+        segment = np.lib.format.open_memmap(
+            os.path.join(self.path, file),
+            mode="w+",
+            dtype=_get_dtype(columns),
+            shape=(self.segment_size,),
+        )
+        entries.append({"file": file, "rows": 0, "columns": columns})
+        return segment
+
+    def _write_index(self):
+        """
+        Write the index file. The old index is replaced atomically.
+        """
+        path = os.path.join(self.path, INDEX_FILE)
+        with open(path + ".tmp", "w") as file:
+            json.dump({"topics": self.index}, file, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def stop(self):
+        """
+        Stop recording and write everything that was received to disk.
+        """
+        self.connection.close()
+        self.running = False
+        self._wake.set()
+        self._worker.join()
+        self.flush()
+        self.segments = {}
+
+
+class Recording:
+    """
+    Class to read a recording that was written by the Recorder class.
+    All segments are memory mapped, so nothing is parsed or copied until it is used.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize variables
+
+        :param path: Directory of the recording.
+        """
+        self.path = path
+        try:
+            with open(os.path.join(path, INDEX_FILE)) as file:
+                self.index = json.load(file)["topics"]
+        except FileNotFoundError:
+            self.index = {}
+
+    def get_topics(self) -> List[str]:
+        """
+        Get all recorded topics.
+
+        :return: List of topics.
+        """
+        return list(self.index)
+
+    def get_segments(self, topic: str) -> Iterator[np.ndarray]:
+        """
+        Iterate over all segments of a topic.
+
+        :param topic: Recorded topic.
+        :return: Read-only structured arrays (timestamp and one field per channel).
+        """
+        if topic not in self.index:
+            raise InvalidInputValueError(
+                f"Given topic ({topic}) was not recorded. Recorded topics are {self.get_topics()}."
+            )
+        for entry in self.index[topic]:
+            segment = np.load(os.path.join(self.path, entry["file"]), mmap_mode="r")
+            yield segment[: entry["rows"]]
+
+    def read(self, topic: str) -> Dict[str, np.ndarray]:
+        """
+        Read all data of a topic.
+        Channels that are missing in some segments are filled with NaN there.
+
+        :param topic: Recorded topic.
+        :return: Dictionary with one array per channel and the timestamps (datetime64).
+            Only (empty) timestamps if nothing was written yet.
+        """
+        segments = list(self.get_segments(topic))
+        if not segments:
+            return {TIMESTAMP: np.empty(0, dtype="datetime64[us]")}
+        columns = sorted(
+            {name for segment in segments for name in segment.dtype.names[1:]}
+        )
+
+        data = {TIMESTAMP: np.concatenate([segment[TIMESTAMP] for segment in segments])}
+        for column in columns:
+            data[column] = np.concatenate(
+                [
+                    (
+                        segment[column]
+                        if column in segment.dtype.names
+                        else np.full(len(segment), np.nan)
+                    )
+                    for segment in segments
+                ]
+            )
+        return data
+
+
+def _get_dtype(columns: List[str]) -> np.dtype:
+    """
+    Get the dtype of a segment.
+
+    :param columns: Names of the channels (without timestamp).
+    :return: Structured dtype with the timestamp as first field.
+    """
+    return np.dtype(
+        [(TIMESTAMP, "datetime64[us]")] + [(column, "f8") for column in columns]
+    )
+
+
+def _to_float(values: List) -> np.ndarray:
+    """
+    Convert values to floats. None and values that are not numbers become NaN.
+
+    :param values: Values of a channel.
+    :return: Array of floats.
+    """
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return np.array(
+            [value if isinstance(value, (int, float)) else np.nan for value in values],
+            dtype=float,
+        )
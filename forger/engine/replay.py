@@ -0,0 +1,379 @@
+"""Use this module to replay data by time instead of by publish count."""
+
+__all__ = [
+    "Replay",
+    "intern",
+    "get_trace_limits",
+]
+
+import hashlib
+import json
+import os
+import weakref
+from datetime import datetime
+from itertools import islice
+from threading import Lock
+from typing import List, Optional, Union
+from weakref import WeakValueDictionary
+
+import numpy as np
+
+from forger.auxiliary.constants import REPLAY_WINDOW
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.auxiliary.misc import to_datetime64
+
+
+class Replay:
+    """
+    Data to replay that carries its own timestamps (or sample rate).
+    Values are looked up by time, so the replay speed does not depend on the publish frequency of a pipeline.
+    When the end is reached, the replay starts over.
+
+    Note:
+    - The same instance can be used by many channels. Lookups do not change what is replayed,
+      so all channels that use it stay in sync.
+    - Data may be a memmap (see from_file). Then only a window of window data points around
+      the current position is copied into memory, no matter how long the recording is.
+    """
+
+    def __init__(
+        self,
+        data: Union[List, np.ndarray],
+        timestamps: Optional[Union[List, np.ndarray]] = None,
+        rate: Optional[float] = None,
+        speed: float = 1.0,
+        interpolate: bool = False,
+        start: Optional[datetime] = None,
+        limits: Optional[List[float]] = None,
+        window: int = REPLAY_WINDOW,
+    ):
+        """
+        Initialize variables
+
+        :param data: Data points to replay.
+        :param timestamps: Time of each data point. Either seconds or ISO 8601 strings/datetime64.
+        :param rate: Number of data points per second. Only used if no timestamps are given (default: 1).
+        :param speed: Factor to replay faster (e.g. 10) or slower (e.g. 0.5) than recorded.
+        :param interpolate: Interpolate linearly between data points instead of holding the last one.
+        :param start: Time the replay started. By default when this instance is created.
+        :param limits: Lowest and highest data point. Computed if not given.
+        :param window: Number of data points to keep in memory if data is a memmap.
+        """
+        if isinstance(data, np.memmap):
+            self.data = data
+        else:
+            self.data = intern(data)
+
+        if not len(self.data):
+            raise InvalidInputValueError("Replay data must not be empty.")
+        if timestamps is not None and rate is not None:
+            raise InvalidInputValueError("Give either timestamps or rate, not both.")
+        if speed <= 0:
+            raise InvalidInputValueError(f"Speed ({speed}) must be positive.")
+
+        self.rate = None
+        self.timestamps = None
+        self.offset = 0.0
+        if timestamps is None:
+            self._set_rate(1.0 if rate is None else rate)
+        else:
+            self._set_timestamps(timestamps)
+
+        self.speed = speed
+        self.interpolate = interpolate
+        self.start = start or datetime.now()
+        self.limits = limits or get_trace_limits(self.data, chunk=window)
+
+        self.window = window
+        self._window = None  # first position and copy of the data points in memory.
+        if isinstance(self.data, np.memmap):
+            self._window = (0, np.array(self.data[:window], dtype=float))
+
+    @classmethod
+    def from_file(
+        cls,
+        path: str,
+        timestamps: Optional[Union[str, np.ndarray]] = None,
+        column: int = 0,
+        skiprows: int = 0,
+        **kwargs,
+    ) -> "Replay":
+        """
+        Replay a recording that is stored in a file without loading it into memory.
+
+        Note:
+        - .npy files are memory mapped.
+        - .csv files are converted once into a .npy file next to them (in chunks) that is memory mapped afterwards.
+        - Lowest and highest data point are stored in a .limits.json file next to the .npy file,
+          so they are only computed once.
+
+        :param path: Path to a .npy or .csv file.
+        :param timestamps: Path to a .npy file with the timestamps (in seconds) of each data point.
+        :param column: Column of a .csv file to replay.
+        :param skiprows: Number of rows to skip at the beginning of a .csv file (e.g. header).
+        :param kwargs: Further arguments of Replay (e.g. rate, speed, interpolate).
+        :return: New Replay instance.
+        """
+        if path.endswith(".csv"):
+            path = convert_csv(path, column=column, skiprows=skiprows)
+        elif not path.endswith(".npy"):
+            raise InvalidInputValueError(f"Can not replay {path}. Use .npy or .csv.")
+
+        data = np.load(path, mmap_mode="r")
+        if isinstance(timestamps, str):
+            timestamps = np.load(timestamps, mmap_mode="r")
+
+        kwargs.setdefault("limits", get_file_limits(path, data))
+        return cls(data=data, timestamps=timestamps, **kwargs)
+
+    def _set_rate(self, rate: float):
+        """
+        Replay data points with a fixed rate.
+
+        :param rate: Number of data points per second.
+        """
+        if rate <= 0:
+            raise InvalidInputValueError(f"Rate ({rate}) must be positive.")
+        self.rate = rate
+        self.period = len(self.data) / rate
+
+    def _set_timestamps(self, timestamps: Union[List, np.ndarray]):
+        """
+        Replay data points at their timestamps.
+
+        :param timestamps: Time of each data point.
+        """
+        if not isinstance(timestamps, np.ndarray) or timestamps.dtype.kind not in "iuf":
+            timestamps = np.asarray(timestamps)
+            if timestamps.dtype.kind not in "iuf":
+                timestamps = to_datetime64(timestamps).astype("int64") / 1e6
+
+        length = len(self.data)
+        if len(timestamps) != length:
+            raise InvalidInputValueError(
+                f"Got {len(timestamps)} timestamps for {length} data points."
+            )
+        for begin in range(0, length, REPLAY_WINDOW):
+            chunk = np.asarray(timestamps[begin : begin + REPLAY_WINDOW + 1])
+            if np.any(np.diff(chunk) <= 0):
+                raise InvalidInputValueError("Timestamps must be strictly increasing.")
+
+        self.timestamps = timestamps
+        self.offset = float(timestamps[0])
+        duration = float(timestamps[-1]) - self.offset
+        # the last data point is held as long as the average distance between two data points.
+        self.period = duration + (duration / (length - 1) if length > 1 else 1.0)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, seconds: float) -> float:
+        """
+        Get the value at the given time.
+
+        :param seconds: Seconds since the start of the replay.
+        :return: Replayed value.
+        """
+        return float(self.get_block(np.asarray([seconds], dtype=float))[0])
+
+    def get_at(self, moment: datetime) -> float:
+        """
+        Get the value at the given point in time.
+
+        :param moment: Point in time.
+        :return: Replayed value.
+        """
+        return self.get((moment - self.start).total_seconds())
+
+    def get_block(self, seconds: np.ndarray) -> np.ndarray:
+        """
+        Get the values at many points in time at once.
+
+        :param seconds: Seconds since the start of the replay.
+        :return: Replayed values.
+        """
+        length = len(self.data)
+        position = (np.asarray(seconds, dtype=float) * self.speed) % self.period
+        if self.rate is not None:
+            index = np.minimum((position * self.rate).astype(np.int64), length - 1)
+        else:
+            index = np.searchsorted(self.timestamps, position + self.offset, "right")
+            index = np.maximum(index - 1, 0)
+
+        values = self._take(index)
+        if not self.interpolate:
+            return values
+
+        # the last data point is interpolated towards the first one.
+        last = index == length - 1
+        following = np.where(last, 0, index + 1)
+        if self.rate is not None:
+            begin = index / self.rate
+            end = (index + 1) / self.rate
+        else:
+            begin = np.asarray(self.timestamps[index], dtype=float) - self.offset
+            end = np.where(
+                last,
+                self.period,
+                np.asarray(self.timestamps[np.minimum(index + 1, length - 1)])
+                - self.offset,
+            )
+        weight = (position - begin) / (end - begin)
+        return values + weight * (self._take(following) - values)
+
+    def _take(self, index: np.ndarray) -> np.ndarray:
+        """
+        Get the data points at the given positions.
+        If data is a memmap, they are taken from the window in memory. The window is moved if needed.
+
+        :param index: Positions of the data points.
+        :return: Data points as floats.
+        """
+        if self._window is None:
+            return self.data[index].astype(float, copy=False)
+
+        first, window = self._window
+        low, high = int(index.min()), int(index.max())
+        if low < first or high >= first + len(window):
+            if high - low >= self.window:
+                # too far apart to fit into one window.
+                return np.asarray(self.data[index], dtype=float)
+            first = low
+            window = np.array(self.data[first : first + self.window], dtype=float)
+            self._window = (first, window)
+        return window[index - first]
+
+
+_TRACES = WeakValueDictionary()
+_LIMITS = {}  # id of an interned array -> lowest and highest data point.
+_TRACES_LOCK = Lock()
+
+
+def intern(data: Union[List, np.ndarray]) -> np.ndarray:
+    """
+    Get a read-only array of the given data points. Equal data points are only stored once,
+    no matter how many channels replay them.
+
+    Note:
+    - Arrays are looked up by a hash of their content. They are released once no channel uses them anymore.
+    - Arrays keep their type (e.g. np.float32 to save memory). Lists are stored as float64.
+    - Lowest and highest data point are computed once per array (see get_trace_limits).
+
+    :param data: Data points (list or array).
+    :return: Read-only array.
+    """
+    if isinstance(data, np.ndarray) and data.dtype.kind in "iuf":
+        array = np.ascontiguousarray(data)
+    else:
+        array = np.ascontiguousarray(data, dtype=float)
+
+    key = (
+        array.dtype.str,
+        array.shape,
+        hashlib.blake2b(array.view(np.uint8), digest_size=16).digest(),
+    )
+    with _TRACES_LOCK:
+        existing = _TRACES.get(key)
+        if existing is not None:
+            return existing
+        if array.flags.writeable:
+            # never share (or freeze) an array that the caller may still change.
+            array = array.copy() if array is data else array
+            array.flags.writeable = False
+        _TRACES[key] = array
+        if len(array):
+            _LIMITS[id(array)] = get_limits(array)
+            weakref.finalize(array, _LIMITS.pop, id(array), None)
+        return array
+
+
+def get_trace_limits(trace: np.ndarray, chunk: int = REPLAY_WINDOW) -> List[float]:
+    """
+    Get the lowest and highest data point of an array. They are only computed once for interned arrays.
+
+    :param trace: Data points (e.g. as returned by intern).
+    :param chunk: Number of data points to read at once if they have to be computed.
+    :return: Lowest and highest data point.
+    """
+    limits = _LIMITS.get(id(trace))
+    if limits is None:
+        return get_limits(trace, chunk=chunk)
+    return list(limits)
+
+
+def get_limits(data: np.ndarray, chunk: int = REPLAY_WINDOW) -> List[float]:
+    """
+    Get the lowest and highest data point. Long data is read in chunks.
+
+    :param data: Data points.
+    :param chunk: Number of data points to read at once.
+    :return: Lowest and highest data point.
+    """
+    lows, highs = [], []
+    for begin in range(0, len(data), chunk):
+        part = np.asarray(data[begin : begin + chunk])
+        lows.append(np.nanmin(part))
+        highs.append(np.nanmax(part))
+    return [float(min(lows)), float(max(highs))]
+
+
+def get_file_limits(path: str, data: np.ndarray) -> List[float]:
+    """
+    Get the lowest and highest data point of a file.
+    They are stored in a .limits.json file next to it and only computed again if the file changed.
+
+    :param path: Path of the .npy file.
+    :param data: Data points of the file.
+    :return: Lowest and highest data point.
+    """
+    sidecar = path + ".limits.json"
+    status = os.stat(path)
+    version = {"size": status.st_size, "mtime": status.st_mtime}
+
+    try:
+        with open(sidecar) as file:
+            stored = json.load(file)
+        if stored["version"] == version:
+            return stored["limits"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    limits = get_limits(data)
+    with open(sidecar, "w") as file:
+        json.dump({"version": version, "limits": limits}, file)
+    return limits
+
+
+def convert_csv(path: str, column: int = 0, skiprows: int = 0) -> str:
+    """
+    Convert a column of a .csv file into a .npy file next to it. It is only converted again if the .csv file changed.
+    The file is read in chunks, so it never has to fit into memory.
+
+    :param path: Path of the .csv file.
+    :param column: Column to convert.
+    :param skiprows: Number of rows to skip at the beginning (e.g. header).
+    :return: Path of the .npy file.
+    """
+    target = "%s.%i.npy" % (path, column)
+    if os.path.exists(target) and os.stat(target).st_mtime >= os.stat(path).st_mtime:
+        return target
+
+    with open(path) as file:
+        rows = sum(1 for line in islice(file, skiprows, None) if line.strip())
+
+    data = np.lib.format.open_memmap(
+        target + ".tmp", mode="w+", dtype=float, shape=(rows,)
+    )
+    with open(path) as file:
+        lines = (line for line in islice(file, skiprows, None) if line.strip())
+        position = 0
+        while position < rows:
+            chunk = np.loadtxt(
+                islice(lines, REPLAY_WINDOW), delimiter=",", usecols=column, ndmin=1
+            )
+            data[position : position + len(chunk)] = chunk
+            position += len(chunk)
+    data.flush()
+    del data
+    os.replace(target + ".tmp", target)
+    return target
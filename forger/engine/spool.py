@@ -0,0 +1,341 @@
+"""Use this module to buffer encoded messages on disk while a broker is not available."""
+
+__all__ = [
+    "Spool",
+]
+
+import mmap
+import os
+import re
+import struct
+from collections import deque
+from threading import Lock
+from typing import Dict, List, Tuple
+
+from forger.auxiliary.constants import (
+    SPOOL_MAX_BYTES,
+    SPOOL_RATE,
+    SPOOL_SEGMENT_SIZE,
+)
+from forger.auxiliary.exceptions import InvalidInputValueError
+
+# message record: state (M = waiting, D = delivered), length of topic, length of payload.
+# the rest of a segment is zero.
+RECORD = struct.Struct("<cHI")
+WAITING = b"M"
+DELIVERED = b"D"
+SEGMENT_NAME = "spool-%08i.bin"
+SEGMENT_PATTERN = re.compile(r"spool-(\d{8})\.bin")
+
+
+class _Segment:
+    """
+    Single preallocated file of a spool that is memory mapped.
+    """
+
+    def __init__(self, path: str, size: int):
+        """
+        Open an existing segment or create a new one.
+
+        :param path: Path of the segment file.
+        :param size: Size (in bytes) of a new segment.
+        """
+        self.path = path
+        exists = os.path.exists(path)
+        with open(path, "a+b") as file:
+            if not exists:
+                file.truncate(size)
+            self.size = os.path.getsize(path)
+            self.map = mmap.mmap(file.fileno(), self.size)
+
+        self.write_offset = 0
+        # first message that was not read and first message that was not delivered.
+        self.read_offset = 0
+        self.commit_offset = 0
+        # messages that were not delivered and messages that were not read.
+        self.pending = 0
+        self.unread = 0
+        if exists:
+            self._scan()
+
+    def _scan(self):
+        """
+        Find the waiting messages and the end of an existing segment.
+        """
+        position = 0
+        while position + RECORD.size <= self.size:
+            state, topic_length, payload_length = RECORD.unpack_from(self.map, position)
+            if state not in (WAITING, DELIVERED):
+                break
+            if state == DELIVERED:
+                self.read_offset = (
+                    position + RECORD.size + topic_length + payload_length
+                )
+            else:
+                self.pending += 1
+            position += RECORD.size + topic_length + payload_length
+        self.write_offset = position
+        self.commit_offset = self.read_offset
+        self.unread = self.pending
+
+    def append(self, topic: bytes, payload: bytes) -> bool:
+        """
+        Add a message to the end of the segment.
+
+        :param topic: Encoded topic of the message.
+        :param payload: Encoded payload of the message.
+        :return: False if the segment is full.
+        """
+        position = self.write_offset + RECORD.size
+        end = position + len(topic) + len(payload)
+        if end > self.size:
+            return False
+
+        self.map[position : position + len(topic)] = topic
+        self.map[position + len(topic) : end] = payload
+        # the state is written last, so a message is never seen half written.
+        RECORD.pack_into(self.map, self.write_offset, WAITING, len(topic), len(payload))
+        self.write_offset = end
+        self.pending += 1
+        self.unread += 1
+        return True
+
+    def read(self, count: int, topics: List[str], payloads: List[bytes]):
+        """
+        Read the oldest messages that were not read yet. They are not marked as delivered (see commit).
+
+        :param count: Maximum number of messages to read.
+        :param topics: List the topics are appended to.
+        :param payloads: List the payloads are appended to.
+        """
+        for _ in range(min(count, self.unread)):
+            _, topic_length, payload_length = RECORD.unpack_from(
+                self.map, self.read_offset
+            )
+            position = self.read_offset + RECORD.size
+            topics.append(self.map[position : position + topic_length].decode())
+            position += topic_length
+            payloads.append(self.map[position : position + payload_length])
+            self.read_offset = position + payload_length
+            self.unread -= 1
+
+    def commit(self, count: int) -> int:
+        """
+        Mark the oldest messages that were read as delivered.
+
+        :param count: Maximum number of messages to mark.
+        :return: Number of messages that were marked.
+        """
+        count = min(count, self.pending - self.unread)
+        for _ in range(count):
+            _, topic_length, payload_length = RECORD.unpack_from(
+                self.map, self.commit_offset
+            )
+            self.map[self.commit_offset : self.commit_offset + 1] = DELIVERED
+            self.commit_offset += RECORD.size + topic_length + payload_length
+        self.pending -= count
+        return count
+
+    def rewind(self):
+        """
+        Read all messages that were not delivered again.
+        """
+        self.read_offset = self.commit_offset
+        self.unread = self.pending
+
+    def close(self):
+        """
+        Write all changes to disk and close the segment.
+        """
+        self.map.flush()
+        self.map.close()
+
+    def remove(self):
+        """
+        Close and delete the segment.
+        """
+        self.map.close()
+        os.remove(self.path)
+
+
+class Spool:
+    """
+    Segmented, append-only buffer of encoded messages on disk (e.g. while a broker is down).
+    Messages are read in the order they were added.
+
+    Note:
+    - Segments are preallocated files that are memory mapped. A segment is deleted as soon as all of its messages were read.
+    - Disk usage is bounded by max_bytes. If it would be exceeded, the oldest segment is deleted
+      together with the messages it still holds. They are counted as evicted.
+    - Messages are only marked as delivered once they were sent (see commit). Messages that were read but not
+      sent are read again after rewind. Opening a spool again (e.g. after a restart) continues with all messages
+      that were not delivered, so a message may be sent twice but is never lost.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        segment_size: int = SPOOL_SEGMENT_SIZE,
+        max_bytes: int = SPOOL_MAX_BYTES,
+        rate: float = SPOOL_RATE,
+    ):
+        """
+        Open the spool in the given directory. Messages that are left from an earlier run are kept.
+
+        :param path: Directory of the segment files. It is created if it does not exist.
+        :param segment_size: Size (in bytes) of each segment file.
+        :param max_bytes: Maximum size (in bytes) of all segment files together.
+        :param rate: Messages per second that are sent once the broker is available again.
+        """
+        if max_bytes < segment_size:
+            raise InvalidInputValueError(
+                f"Given max_bytes ({max_bytes}) must not be smaller than segment_size ({segment_size})."
+            )
+        if rate <= 0:
+            raise InvalidInputValueError(
+                f"Given rate ({rate}) must be greater than zero."
+            )
+
+        self.path = path
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.rate = rate
+        self.spooled = 0
+        self.evicted = 0
+        # messages that were read but evicted before they were committed.
+        self._evicted_read = 0
+        self._lock = Lock()
+
+        os.makedirs(path, exist_ok=True)
+        indices = sorted(
+            int(match.group(1))
+            for match in map(SEGMENT_PATTERN.fullmatch, os.listdir(path))
+            if match
+        )
+        self.segments = deque(
+            _Segment(path=os.path.join(path, SEGMENT_NAME % index), size=segment_size)
+            for index in indices
+        )
+        self.next_index = indices[-1] + 1 if indices else 0
+        self.depth = sum(segment.pending for segment in self.segments)
+
+    def __len__(self) -> int:
+        return self.depth
+
+    def extend(self, topics: List[str], payloads: List[bytes]):
+        """
+        Add messages to the end of the spool.
+
+        :param topics: Topic of each message.
+        :param payloads: Encoded payload of each message.
+        """
+        with self._lock:
+            for topic, payload in zip(topics, payloads):
+                topic = topic.encode()
+                if not self.segments or not self.segments[-1].append(topic, payload):
+                    size = max(
+                        self.segment_size, RECORD.size + len(topic) + len(payload)
+                    )
+                    self._make_room(size=size)
+                    segment = _Segment(
+                        path=os.path.join(self.path, SEGMENT_NAME % self.next_index),
+                        size=size,
+                    )
+                    self.next_index += 1
+                    self.segments.append(segment)
+                    segment.append(topic, payload)
+            self.spooled += len(payloads)
+            self.depth += len(payloads)
+
+    def _make_room(self, size: int):
+        """
+        Delete the oldest segments until a new segment of the given size fits into max_bytes.
+
+        :param size: Size (in bytes) of the new segment.
+        """
+        while self.segments and self.get_disk_usage() + size > self.max_bytes:
+            segment = self.segments.popleft()
+            self.evicted += segment.pending
+            self.depth -= segment.pending
+            self._evicted_read += segment.pending - segment.unread
+            segment.remove()
+
+    def read(self, count: int) -> Tuple[List[str], List[bytes]]:
+        """
+        Read the oldest messages that were not read yet.
+        They stay in the spool until they are committed (or are read again after rewind).
+
+        :param count: Maximum number of messages to read.
+        :return: Topic and payload of each message.
+        """
+        topics = []
+        payloads = []
+        with self._lock:
+            for segment in self.segments:
+                segment.read(count - len(payloads), topics, payloads)
+                if len(payloads) >= count:
+                    break
+        return topics, payloads
+
+    def commit(self, count: int):
+        """
+        Mark the oldest messages that were read as delivered (e.g. once they were sent).
+        Segments are deleted as soon as all of their messages were delivered.
+
+        :param count: Number of messages to mark.
+        """
+        with self._lock:
+            # messages that were evicted meanwhile are gone already.
+            skipped = min(count, self._evicted_read)
+            self._evicted_read -= skipped
+            count -= skipped
+            while self.segments:
+                committed = self.segments[0].commit(count)
+                count -= committed
+                self.depth -= committed
+                if self.segments[0].pending:
+                    break
+                # all messages of the segment were delivered. the next message starts a new segment.
+                self.segments.popleft().remove()
+
+    def rewind(self):
+        """
+        Forget which messages were read but not committed (e.g. because the connection was lost).
+        They are read again.
+        """
+        with self._lock:
+            self._evicted_read = 0
+            for segment in self.segments:
+                segment.rewind()
+
+    def get_disk_usage(self) -> int:
+        """
+        Get the size of all segment files.
+
+        :return: Size in bytes.
+        """
+        return sum(segment.size for segment in self.segments)
+
+    def get_stats(self) -> Dict:
+        """
+        Get the current state of the spool.
+
+        :return: Dictionary with waiting, spooled and evicted messages, number of segments and disk usage.
+        """
+        with self._lock:
+            return {
+                "depth": self.depth,
+                "spooled": self.spooled,
+                "evicted": self.evicted,
+                "segments": len(self.segments),
+                "bytes": self.get_disk_usage(),
+            }
+
+    def close(self):
+        """
+        Write everything to disk and close all segments. Waiting messages are kept for the next run.
+        """
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+            self.segments.clear()
@@ -0,0 +1,166 @@
+"""Use this module to connect to brokers via TLS."""
+
+__all__ = [
+    "TLSPool",
+]
+
+import ssl
+import time
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from forger.engine.metrics import ConnectionMetrics, Histogram
+
+
+class TLSPool:
+    """
+    Shares a single SSLContext and the TLS sessions of each broker between many connections.
+
+    Note:
+    - Once a connection to a broker was established, the session is kept and offered by every
+      further connection to that broker (e.g. all pipelines at startup or after a failover).
+      If the broker accepts it, the handshake is resumed and skips certificate exchange and key agreement.
+    - With TLS 1.3 the broker sends the session after the handshake,
+      so it is kept once the broker accepted the mqtt connection (see Connection).
+    """
+
+    def __init__(
+        self,
+        ca_certs: Optional[str] = None,
+        certfile: Optional[str] = None,
+        keyfile: Optional[str] = None,
+        verify: bool = True,
+        context: Optional[ssl.SSLContext] = None,
+    ):
+        """
+        Create the context that is shared by all connections of this pool.
+
+        :param ca_certs: File with the certificates of trusted authorities. By default the system ones are trusted.
+        :param certfile: File with the client certificate (if the broker asks for one).
+        :param keyfile: File with the private key of the client certificate.
+        :param verify: Verify the certificate and host name of the broker. Only disable this for testing.
+        :param context: Use this context instead of creating one (all other parameters are ignored).
+        """
+        if context is None:
+            context = ssl.create_default_context(cafile=ca_certs)
+            if certfile is not None:
+                context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+            if not verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+
+        self.context = context
+        self.sessions = {}  # (host, port) -> latest session of that broker.
+        self.handshakes = 0
+        self.resumed = 0
+        self.handshake_time = Histogram()
+        self._lock = Lock()
+
+    def get_context(
+        self, host: str, port: int, metrics: Optional[ConnectionMetrics] = None
+    ) -> "_PooledContext":
+        """
+        Get the context a single connection hands to its mqtt client (see tls_set_context).
+
+        :param host: Host of the broker.
+        :param port: Port of the broker.
+        :param metrics: Metrics of the connection. Its handshakes are counted there as well.
+        :return: Context that wraps sockets with the shared context and resumes sessions.
+        """
+        return _PooledContext(pool=self, address=(host, port), metrics=metrics)
+
+    def save_session(self, host: str, port: int, sock: Optional[ssl.SSLSocket]):
+        """
+        Keep the session of an established connection, so further connections can resume it.
+
+        :param host: Host of the broker.
+        :param port: Port of the broker.
+        :param sock: Socket of the established connection.
+        """
+        session = getattr(sock, "session", None)
+        # a TLS 1.3 session is only worth keeping once the broker sent a ticket for it.
+        if session is not None and (session.has_ticket or sock.version() != "TLSv1.3"):
+            with self._lock:
+                self.sessions[(host, port)] = session
+
+    def _record(self, duration: float, resumed: bool):
+        """
+        Count a handshake.
+
+        :param duration: Time (in seconds) the handshake took.
+        :param resumed: True if a session was resumed.
+        """
+        with self._lock:
+            self.handshakes += 1
+            self.resumed += resumed
+            self.handshake_time.observe(duration)
+
+    def get_stats(self) -> Dict:
+        """
+        Get the handshakes of all connections of this pool.
+
+        :return: Dictionary with number of (resumed) handshakes, kept sessions and the handshake times.
+        """
+        with self._lock:
+            return {
+                "handshakes": self.handshakes,
+                "resumed": self.resumed,
+                "sessions": len(self.sessions),
+                "handshake_time": self.handshake_time.get_stats(),
+            }
+
+
+class _PooledContext:
+    """
+    Context of a single connection that is handed to its mqtt client.
+    The client only needs wrap_socket (and check_hostname), which uses the shared context of the pool.
+    """
+
+    def __init__(
+        self,
+        pool: TLSPool,
+        address: Tuple[str, int],
+        metrics: Optional[ConnectionMetrics],
+    ):
+        """
+        Initialize variables
+
+        :param pool: Pool that holds the shared context and sessions.
+        :param address: Host and port of the broker.
+        :param metrics: Metrics of the connection.
+        """
+        self.pool = pool
+        self.address = address
+        self.metrics = metrics
+
+    @property
+    def check_hostname(self) -> bool:
+        return self.pool.context.check_hostname
+
+    def wrap_socket(self, sock, server_hostname: Optional[str] = None, **kwargs):
+        """
+        Wrap the socket of a new connection and do the handshake. Offers the latest session of the broker.
+
+        :param sock: Connected tcp socket.
+        :param server_hostname: Host name of the broker.
+        :return: Socket after the handshake.
+        """
+        kwargs["do_handshake_on_connect"] = False
+        session = self.pool.sessions.get(self.address)
+        ssl_sock = self.pool.context.wrap_socket(
+            sock, server_hostname=server_hostname, session=session, **kwargs
+        )
+
+        # the client does the handshake right after wrapping. doing it here measures it.
+        # its own call does nothing once the handshake is done.
+        start = time.perf_counter()
+        ssl_sock.do_handshake()
+        duration = time.perf_counter() - start
+
+        resumed = ssl_sock.session_reused
+        self.pool._record(duration=duration, resumed=resumed)
+        if self.metrics is not None:
+            self.metrics.handshakes += 1
+            self.metrics.resumed += resumed
+            self.metrics.handshake_time.observe(duration)
+        return ssl_sock
@@ -0,0 +1,323 @@
+"""Use this module to capture live mqtt traffic into a binary log and replay it later."""
+
+__all__ = [
+    "Capture",
+    "TrafficLog",
+    "Playback",
+]
+
+import mmap
+import os
+import struct
+import time
+from collections import deque
+from threading import Event, Thread
+from typing import Dict, Iterator, List, Tuple, Union
+
+from forger.auxiliary.constants import RECORD_INTERVAL
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.engine.connections import Connection, Listener
+
+# every capture session starts with this marker. topic ids are only valid within a session.
+SESSION = b"FLOG\x02"
+# topic record: type, topic id, length of topic.
+TOPIC = struct.Struct("<cIH")
+# message record: type, arrival time (ns), topic id, length of payload.
+MESSAGE = struct.Struct("<cqII")
+
+
+class Capture:
+    """
+    Class to capture messages of one or more topics into an append-only binary log.
+
+    Note:
+    - Each message is stored with its arrival time, topic and payload (as received).
+    - Each topic is only written once per session. Messages refer to it by a 4 byte id.
+    - The network thread only queues messages. They are written in batches by a worker thread.
+    """
+
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        topics: Union[str, List[str]],
+        path: str,
+        interval: float = RECORD_INTERVAL,
+    ):
+        """
+        Initialize new capture and start capturing right away.
+
+        :param ip: IP of target host.
+        :param port: Port of target host.
+        :param topics: Topic or list of topics to capture. Wildcards (+ and #) are allowed.
+        :param path: File to append the messages to.
+        :param interval: Seconds between two writes to disk.
+        """
+        self.path = path
+        self.interval = interval
+        self.messages = 0
+        self.topics = {}
+
+        self.queue = deque()
+        self._file = open(path, "ab")
+        self._file.write(SESSION)
+        self._wake = Event()
+        self.running = True
+        self._worker = Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+        topics = [topics] if isinstance(topics, str) else topics
+        self.listener = Listener(
+            ip=ip, port=port, topic=topics[0], on_message=self._on_message
+        )
+        for topic in topics[1:]:
+            self.listener.connection.subscribe(topic)
+
+    def __enter__(self) -> "Capture":
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _on_message(self, client, userdata, msg):
+        """
+        Define what to do when message is received.
+        """
+        self.queue.append((time.time_ns(), msg.topic, msg.payload))
+
+    def _run(self):
+        """
+        Write queued messages to disk until the capture is stopped.
+        """
+        while self.running:
+            self._wake.wait(self.interval)
+            self.flush()
+
+    def flush(self):
+        """
+        Write all queued messages to disk at once.
+        """
+        queue = self.queue
+        chunks = []
+        for _ in range(len(queue)):
+            arrival, topic, payload = queue.popleft()
+            topic_id = self.topics.get(topic)
+            if topic_id is None:
+                topic_id = self.topics[topic] = len(self.topics)
+                encoded = topic.encode()
+                chunks.append(TOPIC.pack(b"T", topic_id, len(encoded)) + encoded)
+            chunks.append(MESSAGE.pack(b"M", arrival, topic_id, len(payload)))
+            chunks.append(payload)
+            self.messages += 1
+
+        if chunks:
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+
+    def stop(self):
+        """
+        Stop capturing and write everything that was received to disk.
+        """
+        if not self.running:
+            return
+        self.listener.disconnect()
+        self.running = False
+        self._wake.set()
+        self._worker.join()
+        self.flush()
+        self._file.close()
+
+
+class TrafficLog:
+    """
+    Class to read a binary log that was written by the Capture class.
+    The file is memory mapped, so payloads are not copied until they are used.
+    A record that was only partially written (e.g. the capture was killed) ends the log.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize variables
+
+        :param path: File to read.
+        """
+        self.path = path
+
+    def __iter__(self) -> Iterator[Tuple[int, str, memoryview]]:
+        """
+        Iterate over all messages in the order they arrived.
+
+        :return: Arrival time (in nanoseconds since epoch), topic and payload of each message.
+            The payload is a view into the file that is only valid until the next message.
+        """
+        if not os.path.getsize(self.path):
+            return
+
+        with open(self.path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            view = memoryview(data)
+            try:
+                yield from self._parse(data, view)
+            finally:
+                view.release()
+
+    def _parse(
+        self, data: mmap.mmap, view: memoryview
+    ) -> Iterator[Tuple[int, str, memoryview]]:
+        """
+        Parse all records of the log.
+
+        :param data: Memory mapped log.
+        :param view: View of the log to take payloads from without copying.
+        :return: Arrival time, topic and payload of each message.
+        """
+        topics = {}
+        position = 0
+        size = len(data)
+        while position < size:
+            kind = data[position : position + 1]
+            if kind == b"M":
+                if position + MESSAGE.size > size:
+                    return
+                _, arrival, topic_id, length = MESSAGE.unpack_from(data, position)
+                position += MESSAGE.size
+                if position + length > size:
+                    return
+                payload = view[position : position + length]
+                position += length
+                try:
+                    yield arrival, topics[topic_id], payload
+                finally:
+                    payload.release()
+            elif kind == b"T":
+                if position + TOPIC.size > size:
+                    return
+                _, topic_id, length = TOPIC.unpack_from(data, position)
+                position += TOPIC.size
+                if position + length > size:
+                    return
+                topics[topic_id] = data[position : position + length].decode()
+                position += length
+            elif data[position : position + len(SESSION)] == SESSION:
+                topics = {}
+                position += len(SESSION)
+            elif SESSION.startswith(data[position:]):
+                # session marker that was only partially written.
+                return
+            else:
+                raise InvalidInputValueError(
+                    f"{self.path} is not a valid traffic log (at byte {position})."
+                )
+
+    def get_stats(self) -> Dict:
+        """
+        Get number of messages, payload bytes and duration of the log.
+
+        :return: Dictionary with messages, bytes, duration (in seconds) and topics.
+        """
+        messages = size = 0
+        first = last = None
+        topics = set()
+        for arrival, topic, payload in self:
+            messages += 1
+            size += len(payload)
+            first = arrival if first is None else first
+            last = arrival
+            topics.add(topic)
+
+        return {
+            "messages": messages,
+            "bytes": size,
+            "duration": (last - first) / 1e9 if messages else 0.0,
+            "topics": sorted(topics),
+        }
+
+
+class Playback:
+    """
+    Class to publish the messages of a binary log again, with the same timing as they were captured.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ip: str,
+        port: int,
+        speed: float = 1.0,
+        prefix: str = "",
+    ):
+        """
+        Initialize variables and connect to the target host.
+
+        :param path: Binary log written by the Capture class.
+        :param ip: IP of target host.
+        :param port: Port of target host.
+        :param speed: Factor to replay faster (e.g. 10) or slower (e.g. 0.5) than captured.
+            Use 0 to publish as fast as possible.
+        :param prefix: Prefix to add to each topic (e.g. 'staging/').
+        """
+        if speed < 0:
+            raise InvalidInputValueError(f"Speed ({speed}) must not be negative.")
+
+        self.log = TrafficLog(path)
+        self.speed = speed
+        self.prefix = prefix
+        self.messages = 0
+        # highest delay (in seconds) of a message compared to its schedule.
+        self.max_lag = 0.0
+
+        self.running = False
+        self._thread = None
+        self.connection = Connection(ip=ip, port=port)
+
+    def run(self):
+        """
+        Publish all messages of the log. Blocks until all messages are published or stop is called.
+        """
+        self.running = True
+        first = None
+        start = time.perf_counter()
+        for arrival, topic, payload in self.log:
+            if not self.running:
+                break
+
+            if self.speed:
+                first = arrival if first is None else first
+                due = start + (arrival - first) / 1e9 / self.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.max_lag = max(self.max_lag, -delay)
+
+            self.connection.publish(self.prefix + topic, bytes(payload))
+            self.messages += 1
+        self.running = False
+
+    def start(self) -> "Playback":
+        """
+        Publish all messages of the log in a background thread.
+
+        :return: This Playback instance.
+        """
+        self._thread = Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: float = None):
+        """
+        Wait until all messages are published.
+
+        :param timeout: Maximum seconds to wait.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self):
+        """
+        Stop publishing and close the connection.
+        """
+        self.running = False
+        self.wait()
+        self.connection.close()
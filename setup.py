@@ -35,7 +35,15 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/frank690/mqtt-forger",
     packages=setuptools.find_packages(
-        exclude=["tests", "tests.*", "*.tests.*", "*.tests", "docs"]
+        exclude=[
+            "tests",
+            "tests.*",
+            "*.tests.*",
+            "*.tests",
+            "docs",
+            "benchmarks",
+            "benchmarks.*",
+        ]
     ),
     include_package_data=True,
     setup_requires=["cython"],
@@ -1,6 +1,10 @@
 """This module holds information, data and more that is shared among tests."""
 
+import shutil
+import subprocess
+
 import numpy as np
+import pytest
 from apscheduler.schedulers.background import BackgroundScheduler
 
 sample_replay_data = [5 * np.tanh(x) for x in np.linspace(-2, 2, 10)]
@@ -54,3 +58,38 @@ pipeline_samples = [
 ]
 
 pipeline_samples_names = ["Foobar", "Barfoo", ""]
+
+
+@pytest.fixture(scope="session")
+def certificate(tmp_path_factory):
+    """
+    Self-signed certificate (and key) for 127.0.0.1 and localhost.
+    """
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is needed to create a certificate")
+
+    path = tmp_path_factory.mktemp("tls")
+    certfile, keyfile = str(path / "cert.pem"), str(path / "key.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1,DNS:localhost",
+            "-keyout",
+            keyfile,
+            "-out",
+            certfile,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return certfile, keyfile
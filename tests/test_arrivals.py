@@ -0,0 +1,152 @@
+"""This module is used to test the classes in forger.engine.arrivals"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.engine.arrivals import (
+    ArrivalProcess,
+    ArrivalTrigger,
+    Bursts,
+    OnOff,
+    Poisson,
+)
+
+START = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+def arrivals(process, frequency, count):
+    trigger = ArrivalTrigger(process=process, frequency=frequency, start_date=START)
+    times = []
+    fire_time = trigger.get_next_fire_time(None, START)
+    for _ in range(count):
+        times.append(fire_time.timestamp() - START.timestamp())
+        fire_time = trigger.get_next_fire_time(fire_time, START)
+    return np.array(times)
+
+
+class TestArrivalProcess:
+    @pytest.mark.parametrize(
+        "process",
+        [
+            Poisson(seed=1),
+            Bursts(size=5, spacing=0.01),
+            OnOff(on_time=0.5, off_time=0.5, seed=2),
+        ],
+    )
+    def test_rate(self, process):
+        """
+        Test that the mean rate of each arrival process is its frequency.
+        """
+        times = arrivals(process=process, frequency=50, count=20000)
+        assert np.all(np.diff(times) > 0)
+        assert len(times) / times[-1] == pytest.approx(50, rel=0.05)
+
+    @pytest.mark.parametrize(
+        "factory",
+        [
+            lambda seed: Poisson(seed=seed),
+            lambda seed: OnOff(on_time=1, off_time=2, seed=seed),
+        ],
+    )
+    def test_seed(self, factory):
+        """
+        Test that the same seed draws the same arrival times.
+        """
+        first = arrivals(process=factory(seed=7), frequency=100, count=5000)
+        second = arrivals(process=factory(seed=7), frequency=100, count=5000)
+        other = arrivals(process=factory(seed=8), frequency=100, count=5000)
+
+        assert np.array_equal(first, second)
+        assert not np.array_equal(first, other)
+
+    def test_bursts(self):
+        """
+        Test that the Bursts class publishes size arrivals that are spacing seconds apart once per period.
+        """
+        times = arrivals(process=Bursts(size=3, spacing=0.1), frequency=6, count=9)
+        assert times == pytest.approx([0, 0.1, 0.2, 0.5, 0.6, 0.7, 1.0, 1.1, 1.2])
+
+    def test_bursts_without_spacing(self):
+        """
+        Test that the Bursts class gives each arrival of a burst a time of its own, even without spacing.
+        """
+        trigger = ArrivalTrigger(process=Bursts(size=4), frequency=4, start_date=START)
+        due = trigger.pop_due(now=START.timestamp() + 1.5)
+        start = round(START.timestamp() * 1e6) * 1000
+        assert due == [start + index * 1000 for index in range(4)] + [
+            start + 10**9 + index * 1000 for index in range(4)
+        ]
+
+    def test_abstract(self):
+        """
+        Test that the ArrivalProcess class can not be used without draw.
+        """
+        with pytest.raises(TypeError):
+            ArrivalProcess()
+
+    def test_on_off(self):
+        """
+        Test that the OnOff class has long gaps (off periods) and a higher rate in between.
+        """
+        times = arrivals(
+            process=OnOff(on_time=1, off_time=4, seed=3), frequency=10, count=20000
+        )
+        gaps = np.diff(times)
+        # while on, arrivals are 1 / 50 seconds apart on average.
+        assert np.median(gaps) < 1 / 25
+        assert np.sum(gaps > 1) > 100
+
+    @pytest.mark.parametrize(
+        "factory",
+        [
+            lambda: Bursts(size=0),
+            lambda: Bursts(size=2, spacing=-1),
+            lambda: OnOff(on_time=0, off_time=1),
+            lambda: OnOff(on_time=1, off_time=-1),
+            lambda: ArrivalTrigger(process=Bursts(size=5, spacing=1), frequency=2),
+        ],
+    )
+    def test_invalid(self, factory):
+        """
+        Test that invalid arrival processes are rejected.
+        """
+        with pytest.raises(InvalidInputValueError):
+            factory()
+
+
+class TestArrivalTrigger:
+    def test_get_next_fire_time(self):
+        """
+        Test the get_next_fire_time method of the ArrivalTrigger class.
+        """
+        trigger = ArrivalTrigger(
+            process=Bursts(size=2, spacing=0.25), frequency=2, start_date=START
+        )
+        fire_time = trigger.get_next_fire_time(None, START)
+        assert fire_time == START
+        fire_time = trigger.get_next_fire_time(fire_time, START)
+        assert (fire_time - START).total_seconds() == 0.25
+
+        # after a pause, missed arrivals are skipped.
+        later = datetime.fromtimestamp(START.timestamp() + 100.1, timezone.utc)
+        fire_time = trigger.get_next_fire_time(None, later)
+        assert (fire_time - START).total_seconds() == 100.25
+        assert "Bursts(size=2, spacing=0.25)" in str(trigger)
+
+    def test_pop_due(self):
+        """
+        Test the pop_due method of the ArrivalTrigger class.
+        """
+        trigger = ArrivalTrigger(
+            process=Bursts(size=2, spacing=0.25), frequency=2, start_date=START
+        )
+        trigger.get_next_fire_time(None, START)
+        start = round(START.timestamp() * 1e9)
+
+        due = trigger.pop_due(now=START.timestamp() + 1.3)
+        assert [tick - start for tick in due] == [0, 250000000, 1000000000, 1250000000]
+        assert trigger.pop_due(now=START.timestamp() + 1.3) == []
+        assert len(trigger.pop_due(now=START.timestamp() + 2)) == 1
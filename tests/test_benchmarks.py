@@ -0,0 +1,64 @@
+"""This module is used to test the functions in benchmarks.suite"""
+
+import pytest
+
+from benchmarks.suite import compare, run
+
+
+def results(value, higher_is_better=False):
+    return {
+        "results": {
+            "foo": {"value": value, "unit": "ns", "higher_is_better": higher_is_better}
+        }
+    }
+
+
+@pytest.mark.parametrize(
+    "value,baseline,higher_is_better,expected",
+    [
+        (100, 100, False, "ok"),
+        (110, 100, False, "ok"),
+        (130, 100, False, "regression"),
+        (70, 100, False, "improvement"),
+        (70, 100, True, "regression"),
+        (130, 100, True, "improvement"),
+    ],
+)
+def test_compare(value, baseline, higher_is_better, expected):
+    """
+    Test the compare function
+    """
+    comparison = compare(
+        results(value, higher_is_better),
+        results(baseline, higher_is_better),
+        tolerance=0.2,
+    )
+    assert comparison["foo"]["verdict"] == expected
+    assert comparison["foo"]["ratio"] == value / baseline
+
+
+def test_compare_skips_unknown():
+    """
+    Test that the compare function ignores results that are missing in the baseline.
+    """
+    assert compare(results(1), {"results": {}}) == {}
+
+
+def test_run():
+    """
+    Test the run function
+    """
+    output = run(scenarios=["generator", "encode"], quick=True)
+    assert output["meta"]["quick"]
+    assert "generator.sin" in output["results"]
+    assert "encode.1000" in output["results"]
+    assert all(result["value"] > 0 for result in output["results"].values())
+
+
+def test_run_channels():
+    """
+    Test the channels scenario of the run function
+    """
+    output = run(scenarios=["channels"], quick=True)
+    assert output["results"]["channels.1000"]["value"] > 0
+    assert output["results"]["channels.1000"]["dropped"] == 0
@@ -0,0 +1,156 @@
+"""This module is used to test the classes in forger.engine.broker"""
+
+import time
+
+import paho.mqtt.client as mqtt
+import pytest
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from forger.engine.broker import (
+    Broker,
+    decode_properties,
+    encode_publish,
+)
+
+
+@pytest.fixture()
+def broker():
+    with Broker() as broker:
+        yield broker
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def client(broker, on_message=None, protocol=mqtt.MQTTv311):
+    mqtt_client = mqtt.Client(protocol=protocol)
+    mqtt_client.on_message = on_message
+    mqtt_client.connect(*broker.get_address())
+    mqtt_client.loop_start()
+    return mqtt_client
+
+
+def stop(mqtt_client):
+    mqtt_client.disconnect()
+    mqtt_client.loop_stop()
+
+
+def test_encode_publish():
+    """
+    Test the encode_publish function
+    """
+    assert encode_publish(topic=b"a/b", payload=b"xy") == b"\x30\x07\x00\x03a/bxy"
+    assert (
+        encode_publish(topic=b"a/b", payload=b"xy", version=5)
+        == b"\x30\x08\x00\x03a/b\x00xy"
+    )
+
+
+def test_decode_properties():
+    """
+    Test the decode_properties function
+    """
+    data = b"\xff\x0e\x02\x00\x00\x00\x3c\x23\x00\x07\x03\x00\x02ab\x0b\x81\x01"
+    assert decode_properties(data, 1) == ({0x02: 60, 0x23: 7, 0x0B: 129}, 16)
+
+
+class TestBroker:
+    def test_start_and_stop(self):
+        """
+        Test the start and stop methods of the Broker class.
+        """
+        broker = Broker().start()
+        assert broker.port != 0
+        broker.stop()
+        broker.stop()
+
+    def test_start_on_used_port(self, broker):
+        """
+        Test that the start method of the Broker class fails on a port that is in use.
+        """
+        with pytest.raises(OSError):
+            Broker(port=broker.port).start()
+
+    @pytest.mark.parametrize("qos", [0, 1, 2])
+    def test_publish(self, broker, qos):
+        """
+        Test that the Broker class counts published messages and bytes.
+        """
+        publisher = client(broker)
+        for _ in range(10):
+            publisher.publish("foo", b"12345", qos=qos)
+
+        assert wait_for(lambda: broker.messages == 10)
+        assert broker.get_stats()["bytes"] == 50
+        stop(publisher)
+
+    @pytest.mark.parametrize(
+        "topic_filter,topic,expected",
+        [
+            ("foo", "foo", True),
+            ("foo/+", "foo/bar", True),
+            ("foo/#", "foo/bar/baz", True),
+            ("#", "foo", True),
+            ("foo/+", "bar/foo", False),
+        ],
+    )
+    def test_subscribe(self, broker, topic_filter, topic, expected):
+        """
+        Test that the Broker class forwards messages to matching subscribers.
+        """
+        received = []
+        subscriber = client(broker, lambda c, u, msg: received.append(msg.payload))
+        subscriber.subscribe(topic_filter)
+        assert wait_for(lambda: len(broker.subscriptions) == 1)
+
+        publisher = client(broker)
+        publisher.publish(topic, b"bar")
+        assert wait_for(lambda: broker.messages == 1)
+
+        assert wait_for(lambda: b"bar" in received, timeout=1) == expected
+        subscriber.unsubscribe(topic_filter)
+        assert wait_for(lambda: len(broker.subscriptions) == 0)
+        stop(subscriber)
+        stop(publisher)
+
+    @pytest.mark.parametrize("qos", [0, 1])
+    def test_mqtt5(self, broker, qos):
+        """
+        Test that the Broker class resolves topic aliases of mqtt 5 clients and forwards to both protocol versions.
+        """
+        received = []
+        subscribers = [
+            client(broker, lambda c, u, msg: received.append(msg.topic), protocol)
+            for protocol in (mqtt.MQTTv311, mqtt.MQTTv5)
+        ]
+        for subscriber in subscribers:
+            subscriber.subscribe("foo/#")
+        assert wait_for(
+            lambda: len(broker.subscriptions.get("foo/#", (None, ()))[1]) == 2
+        )
+
+        publisher = client(broker, protocol=mqtt.MQTTv5)
+        properties = Properties(PacketTypes.PUBLISH)
+        properties.TopicAlias = 3
+        properties.MessageExpiryInterval = 60
+        publisher.publish("foo/bar", b"1", qos=qos, properties=properties)
+        publisher.publish("", b"2", qos=qos, properties=properties)
+        assert wait_for(lambda: len(received) == 4)
+        assert received == ["foo/bar"] * 4
+
+        # alias above the topic alias maximum.
+        properties.TopicAlias = broker.topic_alias_maximum + 1
+        publisher.publish("", b"3", properties=properties)
+        assert wait_for(lambda: broker.get_stats()["sessions"] == 2)
+        assert broker.messages == 2
+
+        for subscriber in subscribers:
+            subscriber.unsubscribe("foo/#")
+        assert wait_for(lambda: len(broker.subscriptions) == 0)
+        for mqtt_client in subscribers + [publisher]:
+            stop(mqtt_client)
@@ -0,0 +1,135 @@
+"""This module is used to test the classes in forger.engine.buffers"""
+
+import numpy as np
+import pytest
+
+from forger.engine.buffers import ChannelStore, MinMaxBuffer, RingBuffer
+
+
+class TestRingBuffer:
+    @pytest.mark.parametrize(
+        "size,fill_value,values,expected",
+        [
+            (4, 0, [], [0, 0, 0, 0]),
+            (4, 1, [5], [1, 1, 1, 5]),
+            (4, 0, [1, 2, 3, 4, 5], [2, 3, 4, 5]),
+            (3, 0, range(100), [97, 98, 99]),
+            (3, np.nan, [1, None], [np.nan, 1, np.nan]),
+        ],
+    )
+    def test_append(self, size, fill_value, values, expected):
+        """
+        Test the append and get methods of the RingBuffer class.
+        """
+        buffer = RingBuffer(size=size, fill_value=fill_value)
+        for value in values:
+            buffer.append(value)
+
+        data = buffer.get()
+        assert np.array_equal(data, expected, equal_nan=True)
+        assert not data.flags.writeable
+
+    def test_get_does_not_copy(self):
+        """
+        Test that the get method of the RingBuffer class returns a view.
+        """
+        buffer = RingBuffer(size=5, fill_value=0)
+        buffer.append(1)
+        assert np.shares_memory(buffer.get(), buffer.data)
+
+    @pytest.mark.parametrize(
+        "fill_value,values,expected",
+        [
+            (np.nan, [], True),
+            (0, [], False),
+            (0, [np.nan] * 2, False),
+            (0, [np.nan] * 3, True),
+            (np.nan, [np.nan, 1, np.nan], False),
+            (np.nan, [1, None, None, None], True),
+        ],
+    )
+    def test_is_empty(self, fill_value, values, expected):
+        """
+        Test the is_empty method of the RingBuffer class.
+        """
+        buffer = RingBuffer(size=3, fill_value=fill_value)
+        for value in values:
+            buffer.append(value)
+        assert buffer.is_empty() == expected
+
+
+class TestMinMaxBuffer:
+    @pytest.mark.parametrize(
+        "size,buckets,values,expected_x,expected_y",
+        [
+            (4, 4, [1, 2, 3, 4, 5], [1, 2, 3, 4], [2, 3, 4, 5]),
+            (6, 2, [5, 1, 3, 2, 8, 4], [0, 1, 3, 4], [5, 1, 2, 8]),
+            (6, 2, [5, 1, 3, 2, 8, 4, 7], [3, 4, 6, 6], [2, 8, 7, 7]),
+            (4, 2, [1, 2, None, None], [0, 1, 3, 3], [1, 2, np.nan, np.nan]),
+            (4, 2, [1, 2, None, 3], [0, 1, 3, 3], [1, 2, 3, 3]),
+        ],
+    )
+    def test_append(self, size, buckets, values, expected_x, expected_y):
+        """
+        Test the append and get methods of the MinMaxBuffer class.
+        """
+        buffer = MinMaxBuffer(size=size, buckets=buckets, fill_x=0, fill_y=0)
+        for x, y in enumerate(values):
+            buffer.append(x, y)
+
+        x, y = buffer.get()
+        assert np.array_equal(x, expected_x)
+        assert np.array_equal(y, expected_y, equal_nan=True)
+        assert not x.flags.writeable and not y.flags.writeable
+
+    def test_envelope(self):
+        """
+        Test that the MinMaxBuffer class keeps the lowest and highest values of a long window.
+        """
+        values = np.sin(np.linspace(0, 100, 100000)) * np.linspace(1, 2, 100000)
+        buffer = MinMaxBuffer(size=len(values), buckets=100)
+        for x, y in enumerate(values):
+            buffer.append(x, y)
+
+        x, y = buffer.get()
+        assert len(x) == len(y) == 200
+        assert np.all(np.diff(x) >= 0)
+        assert y.max() == values.max()
+        assert y.min() == values.min()
+
+    @pytest.mark.parametrize(
+        "fill_y,values,expected",
+        [
+            (np.nan, [], True),
+            (0, [], False),
+            (0, [None] * 3, False),
+            (0, [None] * 4, True),
+            (np.nan, [None, 1, None], False),
+        ],
+    )
+    def test_is_empty(self, fill_y, values, expected):
+        """
+        Test the is_empty method of the MinMaxBuffer class.
+        """
+        buffer = MinMaxBuffer(size=4, buckets=2, fill_y=fill_y)
+        for x, y in enumerate(values):
+            buffer.append(x, y)
+        assert buffer.is_empty() == expected
+
+
+class TestChannelStore:
+    def test_append(self):
+        """
+        Test the append and get methods of the ChannelStore class.
+        """
+        store = ChannelStore(size=3)
+        store.append(x=0, payload={"a": 1})
+        store.append(x=1, payload={"a": 2, "b": 3})
+        store.append(x=2, payload={"b": "bad"})
+
+        assert store.count == 3
+        assert sorted(store.get_channels()) == ["a", "b"]
+        timestamps, values = store.get("a")
+        assert list(timestamps) == [0, 1, 2]
+        assert np.array_equal(values, [1, 2, np.nan], equal_nan=True)
+        assert np.array_equal(store.get("b")[1], [np.nan, 3, np.nan], equal_nan=True)
@@ -1,15 +1,15 @@
 """This module is used to test the classes in forger.engine.channels"""
 
 import json
-from datetime import datetime
+from unittest.mock import patch
 
 import pytest
 
 from forger.engine.channels import Channel, Channels
 from forger.engine.generator import Generator
+from forger.engine.profiler import TRACER
 from tests.conftest import (
     generator_samples,
-    generator_samples_names,
     valid_generator_samples,
     valid_generator_samples_names,
 )
@@ -127,52 +127,27 @@ class TestChannels:
         assert isinstance(channels.channels.get(0), type(None))
         assert len(channels.channels) == 1
 
-    def test__get_unique_channels(self, channels):
+    def test_get_data(self, channels):
         """
-        Test the _get_unique_channels method of Channels class.
+        Test that the get_data method of the Channels class sums up all channels of the same name.
         """
-        names = []
-        for generator_sample in generator_samples:
-            names.append(generator_sample[0])
-            channels.add(
-                name=generator_sample[0],
-                frequency=generator_sample[1],
-                channel_type=generator_sample[2],
-                dead_frequency=generator_sample[3],
-                dead_period=generator_sample[4],
-                scale=generator_sample[5],
-                replay_data=generator_sample[6],
-                seed=generator_sample[7],
-            )
-
-        assert set(generator_samples_names) == set(channels._get_unique_channels())
+        settings = dict(
+            scale=None,
+            frequency=1,
+            channel_type="replay",
+            dead_frequency=0,
+            dead_period=0,
+            seed=None,
+        )
+        channels.add(name="Foo", replay_data=[1.0, 1.0], **settings)
+        channels.add(name="Foo", replay_data=[2.0, 2.0], **settings)
+        channels.add(name="Bar", replay_data=[5.0, 5.0], **settings)
 
-    @pytest.mark.parametrize(
-        "name,dt",
-        [
-            ("Foo", None),
-            ("Foo", datetime.now()),
-            ("Bar", None),
-            (
-                "Bar",
-                datetime(
-                    year=2003,
-                    month=11,
-                    day=4,
-                    hour=8,
-                    minute=44,
-                    second=1,
-                    microsecond=432,
-                ),
-            ),
-        ],
-    )
-    def test__get_overall_output(self, valid_channels, name, dt):
-        """
-        Test the _get_overall_output method of Channels class.
-        """
-        foo_output = valid_channels._get_overall_output(name=name, time=dt)
-        assert isinstance(foo_output, float)
+        data = channels.get_data()
+        assert set(data) == {"timestamp", "Foo", "Bar"}
+        assert data["Foo"] == 3.0
+        assert data["Bar"] == 5.0
+        assert set(channels.get_data(skip={"Bar"})) == {"timestamp", "Foo"}
 
     def test_get_payload(self, valid_channels):
         """
@@ -184,3 +159,52 @@ class TestChannels:
         assert isinstance(payload, str)
         for valid_generator_samples_name in valid_generator_samples_names:
             assert valid_generator_samples_name in payload_dict
+
+    def test_get_data_while_tracing_starts(self, valid_channels):
+        """
+        Test that the get_data method of the Channels class copes with tracing being started while it runs.
+        """
+        channel = valid_channels.channels[0]
+
+        def get_sample(**kwargs):
+            TRACER.start()
+            return 1.0
+
+        try:
+            with patch.object(channel.generator, "get_sample", side_effect=get_sample):
+                data = valid_channels.get_data()
+        finally:
+            report = TRACER.stop()
+
+        assert channel.name in data
+        assert report["stages"] == {}
+
+    def test_update(self, valid_channels):
+        """
+        Test the update and apply_pending methods of the Channel class.
+        """
+        channel = valid_channels.channels[0]
+        channel.update(scale=[5, 10], frequency=2, dead_frequency=0.5, dead_period=0.1)
+
+        assert channel.frequency != 2
+        assert channel.generator.frequency != 2
+
+        valid_channels.get_payload()
+
+        for channel_or_generator in [channel, channel.generator]:
+            assert channel_or_generator.scale == [5, 10]
+            assert channel_or_generator.frequency == 2
+            assert channel_or_generator.dead_frequency == 0.5
+            assert channel_or_generator.dead_period == 0.1
+
+    def test_update_keeps_unchanged_values(self, valid_channels):
+        """
+        Test that the update method of the Channel class only changes the given values.
+        """
+        channel = valid_channels.channels[0]
+        frequency = channel.frequency
+        channel.update(scale=[])
+        channel.apply_pending()
+
+        assert channel.generator.scale == []
+        assert channel.generator.frequency == frequency
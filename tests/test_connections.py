@@ -1,9 +1,24 @@
 """This module is used to test the classes in forger.engine.connections"""
 
+import json
+import time
+from unittest.mock import patch
+
+import paho.mqtt.client as mqtt
 import pytest
 
-from forger.auxiliary.exceptions import OnConnectError
-from forger.engine.connections import Connection
+from forger.auxiliary.enums import ConnectionStates
+from forger.auxiliary.exceptions import InvalidInputValueError, OnConnectError
+from forger.engine.broker import Broker
+from forger.engine.connections import (
+    Backoff,
+    Connection,
+    Listener,
+    MultiListener,
+    TopicAliases,
+    _PacketQueue,
+)
+from forger.engine.spool import Spool
 
 
 class TestConnection:
@@ -37,3 +52,523 @@ class TestConnection:
         """
         con = Connection(ip=ip, port=port)
         assert con.get_address() == (ip, port)
+
+    @pytest.mark.parametrize(
+        "ip,port",
+        [
+            ("127.0.0.1", 1234),
+        ],
+    )
+    def test_publish(self, ip, port):
+        """
+        Test the publish method
+        """
+        con = Connection(ip=ip, port=port)
+        con.publish(topic="foo", payload=b"bar").wait_for_publish(timeout=5)
+        assert con.metrics.published == 1
+        assert con.metrics.completed == 1
+        assert con.metrics.queue_depth == 0
+        assert con.metrics.errors == 0
+        assert con.is_connected()
+        con.close()
+
+    def test_publish_error(self):
+        """
+        Test that the publish method counts messages the client refuses instead of letting them wait.
+        """
+        with Broker() as broker:
+            con = Connection(ip=broker.host, port=broker.port)
+            deadline = time.monotonic() + 5
+            while not con.is_connected() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            con.close()
+            con.publish(topic="foo", payload=b"bar")
+
+        assert not con.is_connected()
+        assert con.metrics.errors == 1
+        assert con.metrics.queue_depth == 0
+
+    @pytest.mark.parametrize("fast_batches", [False, True])
+    def test_publish_batch(self, fast_batches):
+        """
+        Test that the publish_batch method hands several messages to the broker in one go.
+        """
+        with Broker() as broker:
+            con = Connection(
+                ip=broker.host, port=broker.port, fast_batches=fast_batches
+            )
+            assert (con._packets is not None) is fast_batches
+            info = con.publish_batch(topics=["foo/a", "foo/b"], payloads=[b"1", b"22"])
+            info.wait_for_publish(timeout=5)
+            assert con.metrics.published == 2
+            assert con.metrics.completed == 2
+            assert con.metrics.bytes == con.metrics.plain_bytes == 21
+
+            deadline = time.monotonic() + 5
+            while broker.messages < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert broker.get_stats()["bytes"] == 3
+            assert broker.get_stats()["packet_bytes"] == 21
+
+            con.close()
+            assert con.publish_batch(topics=["foo/a"], payloads=[b"1"]).rc != 0
+            assert con.metrics.errors == 1
+
+    @pytest.mark.parametrize("mqtt5", [False, True])
+    def test_publish_batch_without_packet_queue(self, mqtt5):
+        """
+        Test that the publish_batch method publishes one by one if the client can not queue prebuilt packets.
+        """
+        assert not _PacketQueue(client=object()).available
+
+        with Broker() as broker:
+            con = Connection(
+                ip=broker.host,
+                port=broker.port,
+                mqtt5=mqtt5,
+                message_expiry=60 if mqtt5 else None,
+                fast_batches=True,
+            )
+            assert con._packets.available
+            con._packets.available = False
+
+            deadline = time.monotonic() + 5
+            while not con.is_connected() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            info = con.publish_batch(topics=["foo/a", "foo/b"], payloads=[b"1", b"22"])
+            info.wait_for_publish(timeout=5)
+            while broker.messages < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            con.close()
+
+        assert broker.messages == 2
+        assert broker.get_stats()["bytes"] == 3
+        assert con.metrics.published == con.metrics.completed == 2
+
+    @pytest.mark.parametrize("fast_batches", [False, True])
+    def test_mqtt5(self, fast_batches):
+        """
+        Test that mqtt 5 connections replace topics by aliases and report the bytes they save.
+        """
+        received = []
+        topics = [f"some/rather/long/topic/{index}" for index in range(4)]
+        with Broker(topic_alias_maximum=2) as broker:
+            listener = Listener(
+                ip=broker.host,
+                port=broker.port,
+                topic="some/#",
+                on_message=lambda c, u, msg: received.append(msg.topic),
+            )
+            con = Connection(
+                ip=broker.host,
+                port=broker.port,
+                mqtt5=True,
+                message_expiry=60,
+                fast_batches=fast_batches,
+            )
+            deadline = time.monotonic() + 5
+            while (
+                not (con.is_connected() and "some/#" in broker.subscriptions)
+                and time.monotonic() < deadline
+            ):
+                time.sleep(0.01)
+            assert con.aliases.maximum == 2
+
+            for _ in range(10):
+                con.publish_batch(topics=topics, payloads=[b"1"] * 4)
+            con.publish(topic=topics[0], payload=b"1").wait_for_publish(timeout=5)
+
+            while len(received) < 41 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            con.close()
+            listener.disconnect()
+
+        assert sorted(set(received)) == topics
+        assert len(received) == 41
+        assert broker.packet_bytes == con.metrics.bytes
+        bytes_per_message = con.metrics.get_bytes_per_message()
+        assert bytes_per_message["after"] < bytes_per_message["before"]
+
+    def test_mqtt5_short_topics(self):
+        """
+        Test that mqtt 5 connections do not use aliases for topics that are not longer than an alias.
+        """
+        with Broker(topic_alias_maximum=4) as broker:
+            con = Connection(ip=broker.host, port=broker.port, mqtt5=True)
+            deadline = time.monotonic() + 5
+            while not con.is_connected() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            con.publish_batch(topics=["abc", "abcd"], payloads=[b"1", b"1"])
+            while broker.messages < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            con.close()
+
+        assert broker.messages == 2
+        assert con.aliases.aliases == {"abcd": 1}
+        assert con.metrics.bytes == broker.packet_bytes
+
+    @pytest.mark.parametrize("fast_batches", [False, True])
+    @pytest.mark.parametrize("message_expiry", [None, 0, 60])
+    def test_mqtt5_aliases_on_the_wire(self, message_expiry, fast_batches):
+        """
+        Test that mqtt 5 connections with topic aliases send fewer bytes than without them.
+        """
+        topics = [f"some/rather/long/topic/{index}" for index in range(4)]
+        packet_bytes = []
+        for topic_alias_maximum in [0, 4]:
+            with Broker(topic_alias_maximum=topic_alias_maximum) as broker:
+                con = Connection(
+                    ip=broker.host,
+                    port=broker.port,
+                    mqtt5=True,
+                    message_expiry=message_expiry,
+                    fast_batches=fast_batches,
+                )
+                deadline = time.monotonic() + 5
+                while not con.is_connected() and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                for _ in range(10):
+                    con.publish_batch(topics=topics, payloads=[b"1"] * 4)
+                while broker.messages < 40 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                con.close()
+
+            assert broker.messages == 40
+            assert broker.packet_bytes == con.metrics.bytes
+            packet_bytes.append(broker.packet_bytes)
+            if not topic_alias_maximum:
+                # without aliases, plain bytes are what is sent.
+                assert con.metrics.plain_bytes == con.metrics.bytes
+        plain, aliased = packet_bytes
+        assert aliased < plain
+        # the expiry property (5 bytes) is only sent if it was set.
+        # fixed header (2), topic (2 + 24), property length (1) and payload (1).
+        assert plain == 40 * (30 + (5 if message_expiry else 0))
+
+    def test_spool(self, tmp_path):
+        """
+        Test that a Connection with a spool keeps messages while the broker is down and sends them afterwards.
+        """
+        broker = Broker().start()
+        port = broker.port
+        spool = Spool(path=str(tmp_path), rate=10000)
+        con = Connection(
+            ip=broker.host, port=port, spool=spool, min_delay=0.1, max_delay=0.1
+        )
+        deadline = time.monotonic() + 5
+        while not con.is_connected() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        for index in range(5):
+            con.publish(topic="foo", payload=b"%i" % index)
+        deadline = time.monotonic() + 5
+        while broker.messages < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        broker.stop()
+        while con.is_connected() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for index in range(5, 100):
+            assert con.publish(topic="foo", payload=b"%i" % index) is None
+        assert con.metrics.spooled == 95
+        assert con.metrics.spool_depth == 95
+
+        with Broker(port=port) as restarted:
+            deadline = time.monotonic() + 10
+            while restarted.messages < 95 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            con.publish(topic="foo", payload=b"100")
+            while restarted.messages < 96 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            con.close()
+
+        assert broker.messages + restarted.messages == 101
+        assert con.metrics.spool_depth == 0
+        assert con.metrics.evicted == 0
+
+    def test_spool_refused(self, tmp_path):
+        """
+        Test that a Connection keeps spooled messages that could not be sent and sends them again.
+        """
+        with Broker() as broker:
+            spool = Spool(path=str(tmp_path), rate=10000)
+            con = Connection(ip=broker.host, port=broker.port, spool=spool)
+            deadline = time.monotonic() + 5
+            while not con.is_connected() and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            queue_batch = con._queue_batch
+            calls = []
+
+            def refuse_twice(topics, payloads):
+                calls.append(len(payloads))
+                if len(calls) > 2:
+                    return queue_batch(topics=topics, payloads=payloads)
+                info = mqtt.MQTTMessageInfo(0)
+                info.rc = mqtt.MQTT_ERR_NO_CONN
+                return info
+
+            with patch.object(con, "_queue_batch", side_effect=refuse_twice):
+                con.spill(topics=["foo"] * 3, payloads=[b"1", b"2", b"3"])
+                while broker.messages < 3 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            con.close()
+
+        assert calls[:3] == [3, 3, 3]
+        assert broker.messages == 3
+        assert con.metrics.spool_depth == 0
+
+    def test_reconnect(self):
+        """
+        Test that a Connection refuses messages right away while the broker is down and reconnects in the background.
+        """
+        transitions = []
+        broker = Broker().start()
+        port = broker.port
+        con = Connection(
+            ip=broker.host,
+            port=port,
+            min_delay=0.05,
+            max_delay=0.2,
+            on_state_change=lambda connection, state: transitions.append(state),
+        )
+        deadline = time.monotonic() + 5
+        while (
+            con.state is not ConnectionStates.CONNECTED and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+
+        broker.stop()
+        while con.metrics.attempts < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        start = time.perf_counter()
+        info = con.publish(topic="foo", payload=b"bar")
+        assert time.perf_counter() - start < 0.05
+        assert info.rc == mqtt.MQTT_ERR_NO_CONN
+        assert not con.is_connected()
+
+        with Broker(port=port) as restarted:
+            deadline = time.monotonic() + 5
+            while not con.is_connected() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            con.publish(topic="foo", payload=b"bar").wait_for_publish(timeout=5)
+            con.close()
+
+        assert restarted.messages == 1
+        assert con.metrics.reconnects == 1
+        assert con.metrics.errors == 1
+        assert con.metrics.queue_depth == 0
+        assert transitions[:3] == [
+            ConnectionStates.CONNECTED,
+            ConnectionStates.DISCONNECTED,
+            ConnectionStates.RECONNECTING,
+        ]
+        assert transitions[-3:] == [
+            ConnectionStates.CONNECTING,
+            ConnectionStates.CONNECTED,
+            ConnectionStates.CLOSED,
+        ]
+        assert [state for _, state in con.transitions][1:] == transitions
+        assert con.backoff.attempts == 0
+
+    def test_close_while_reconnecting(self):
+        """
+        Test that the close method of a Connection does not wait for the broker to come back.
+        """
+        broker = Broker().start()
+        con = Connection(ip=broker.host, port=broker.port, min_delay=10, max_delay=10)
+        deadline = time.monotonic() + 5
+        while not con.is_connected() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        broker.stop()
+        while (
+            con.state is not ConnectionStates.DISCONNECTED
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+
+        start = time.monotonic()
+        con.close()
+        assert time.monotonic() - start < 1
+        assert con.state is ConnectionStates.CLOSED
+
+    def test_message_expiry_without_mqtt5(self):
+        """
+        Test that message expiry is refused for mqtt 3.1.1 connections.
+        """
+        with pytest.raises(InvalidInputValueError):
+            Connection(ip="127.0.0.1", port=1234, message_expiry=60)
+
+
+class TestBackoff:
+    def test_get_delay(self):
+        """
+        Test that the get_delay method of the Backoff class doubles its bound up to max_delay.
+        """
+        backoff = Backoff(min_delay=1, max_delay=8, seed=0)
+        bounds = [1, 2, 4, 8, 8, 8]
+        delays = [backoff.get_delay() for _ in bounds]
+        assert all(bound / 2 <= delay <= bound for delay, bound in zip(delays, bounds))
+        assert len(set(delays)) == len(delays)
+        assert backoff.attempts == len(bounds)
+
+        backoff.reset()
+        assert backoff.get_delay() <= 1
+
+    def test_jitter(self):
+        """
+        Test that the Backoff class spreads the delays of connections that were lost at the same time.
+        """
+        delays = [Backoff(min_delay=1, max_delay=1).get_delay() for _ in range(100)]
+        assert max(delays) - min(delays) > 0.25
+
+    @pytest.mark.parametrize(
+        "min_delay,max_delay",
+        [
+            (0, 1),
+            (2, 1),
+        ],
+    )
+    def test_invalid(self, min_delay, max_delay):
+        """
+        Test that the Backoff class rejects invalid delays.
+        """
+        with pytest.raises(InvalidInputValueError):
+            Backoff(min_delay=min_delay, max_delay=max_delay)
+
+
+class TestTopicAliases:
+    def test_get(self):
+        """
+        Test that the get method of the TopicAliases class hands out free aliases and announces them once.
+        """
+        aliases = TopicAliases(maximum=2)
+        assert aliases.get("a") == (1, True)
+        assert aliases.get("a") == (1, False)
+        assert aliases.get("b") == (2, True)
+        assert aliases.get("c") == (0, True)
+        assert aliases.get("b") == (2, False)
+
+    def test_review(self):
+        """
+        Test that the TopicAliases class moves aliases to busier topics but not between equally busy ones.
+        """
+        aliases = TopicAliases(maximum=1, interval=10)
+        aliases.get("cold")
+        for _ in range(3):
+            for topic in ("even", "odd"):
+                aliases.get(topic)
+        assert aliases.aliases == {"cold": 1}
+
+        for _ in range(20):
+            alias, announce = aliases.get("hot")
+        assert aliases.aliases == {"hot": 1}
+        assert (alias, announce) == (1, False)
+        assert aliases.get("cold") == (0, True)
+
+        for _ in range(40):
+            aliases.get("hot")
+            aliases.get("other")
+        assert aliases.aliases == {"hot": 1}
+
+
+class TestListener:
+    def test_listen(self):
+        """
+        Test that the Listener class receives what a Connection publishes.
+        """
+        received = []
+        with Broker() as broker:
+            listener = Listener(
+                ip=broker.host,
+                port=broker.port,
+                topic="foo/#",
+                on_message=lambda c, u, msg: received.append(msg.payload),
+            )
+            connection = Connection(ip=broker.host, port=broker.port)
+
+            deadline = time.monotonic() + 5
+            while not received and time.monotonic() < deadline:
+                connection.publish(topic="foo/bar", payload=b"baz")
+                time.sleep(0.05)
+
+            connection.close()
+            listener.disconnect()
+
+        assert received[0] == b"baz"
+
+
+class TestMultiListener:
+    def test_process(self):
+        """
+        Test the process method of the MultiListener class.
+        """
+
+        class Message:
+            def __init__(self, topic, payload):
+                self.topic = topic
+                self.payload = payload
+
+        with patch("forger.engine.connections.Connection"):
+            listener = MultiListener(
+                ip="127.0.0.1", port=1234, topics=["fleet/+/data", "foo"], interval=60
+            )
+
+        for topic in ["fleet/0/data", "fleet/1/data", "foo", "bar"]:
+            listener._on_message(
+                None,
+                None,
+                Message(topic, b'{"timestamp": "2021-08-07T00:00:00", "a": 1}'),
+            )
+        listener._on_message(None, None, Message("foo", b"nope"))
+        listener._on_message(None, None, Message("foo", b'{"timestamp": "bad"}'))
+        listener.disconnect()
+
+        assert sorted(listener.get_topics()) == ["fleet/0/data", "fleet/1/data", "foo"]
+        assert listener._routes["bar"] is None
+        assert listener.get_stats()["dropped"] == 3
+        assert listener.get_store("foo").get("a")[1][-1] == 1
+
+    def test_listen(self):
+        """
+        Test that the MultiListener class receives many topics on a single connection.
+        """
+        topics = [f"fleet/{number}/data" for number in range(50)]
+        with Broker() as broker:
+            listener = MultiListener(
+                ip=broker.host, port=broker.port, topics="fleet/#", interval=0.01
+            )
+            connection = Connection(ip=broker.host, port=broker.port)
+
+            # wait until the subscription is active.
+            deadline = time.monotonic() + 5
+            while not listener.get_topics() and time.monotonic() < deadline:
+                connection.publish("fleet/sentinel", json.dumps({"timestamp": 0}))
+                time.sleep(0.05)
+
+            for value in range(10):
+                for topic in topics:
+                    payload = {"timestamp": value, "value": value}
+                    connection.publish(topic, json.dumps(payload))
+
+            while (
+                sum(
+                    listener.get_store(topic).count
+                    for topic in listener.get_topics()
+                    if topic in topics
+                )
+                < len(topics) * 10
+                and time.monotonic() < deadline
+            ):
+                time.sleep(0.01)
+
+            listener.disconnect()
+            connection.close()
+
+        stats = listener.get_stats()["topics"]
+        assert len(stats) == 51
+        for topic in topics:
+            assert stats[topic] == {"messages": 10, "channels": ["value"]}
+            assert list(listener.get_store(topic).get("value")[1][-10:]) == list(
+                range(10)
+            )
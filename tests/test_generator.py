@@ -1,12 +1,15 @@
 """This module is used to test the classes in forger.engine.generator"""
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
+import numpy as np
 import pytest
 
+from forger.auxiliary.constants import SAMPLE_CACHE_SIZE
 from forger.auxiliary.enums import ChannelTypes
 from forger.auxiliary.exceptions import InvalidInputTypeError, SeedReplantError
 from forger.engine.generator import Generator
+from forger.engine.replay import Replay
 from tests.conftest import generator_samples
 
 
@@ -166,3 +169,75 @@ def is_a_valid_channel_type(given_type: str) -> bool:
     if given_type in all_types:
         return True
     return False
+
+    def test_get_data_replay_by_time(self):
+        """
+        Test that the get_data method of the Generator class replays a Replay by time.
+        """
+        start = datetime(2021, 8, 7)
+        replay = Replay(data=[0, 10, 20, 30], rate=1, start=start)
+        generator = Generator(
+            name="foo",
+            frequency=1,
+            channel_type="replay",
+            dead_frequency=0,
+            dead_period=0,
+            scale=[0, 1],
+            replay_data=replay,
+        )
+
+        # asking more often than the rate does not speed up the replay.
+        values = [
+            generator.get_data(start + timedelta(seconds=second))
+            for second in [0, 0.5, 0.9, 1, 2.5, 3]
+        ]
+        assert np.allclose(values, [0, 0, 0, 1 / 3, 2 / 3, 1])
+        assert generator.replay_idx == 0
+
+    def test_shared_replay_data(self):
+        """
+        Test that generators with equal replay data share it and keep their own position.
+        """
+        generators = [
+            Generator(
+                name="foo",
+                frequency=1,
+                channel_type="replay",
+                dead_frequency=0,
+                dead_period=0,
+                scale=None,
+                replay_data=[0.0, 1.0, 2.0, 3.0],
+                replay_offset=offset,
+            )
+            for offset in range(3)
+        ]
+
+        assert all(g.replay_data is generators[0].replay_data for g in generators)
+        assert [g.get_data() for g in generators] == [0, 1, 2]
+        assert [g.get_data() for g in generators] == [1, 2, 3]
+        assert isinstance(generators[0].get_data(), float)
+
+    def test_get_sample(self):
+        """
+        Test that the get_sample method of the Generator class computes each tick only once.
+        """
+        generator = Generator(
+            name="foo",
+            frequency=1,
+            channel_type="replay",
+            dead_frequency=0,
+            dead_period=0,
+            scale=None,
+            replay_data=[0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+        )
+        now = datetime.now()
+
+        assert generator.get_sample(tick=100, current_datetime=now) == 0
+        assert generator.get_sample(tick=100, current_datetime=now) == 0
+        assert generator.get_sample(tick=200, current_datetime=now) == 1
+        assert generator.get_sample(tick=100, current_datetime=now) == 0
+
+        for tick in range(300, 1000, 100):
+            generator.get_sample(tick=tick, current_datetime=now)
+        assert len(generator._samples) == SAMPLE_CACHE_SIZE
+        assert min(generator._samples) == 600
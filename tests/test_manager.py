@@ -1,6 +1,18 @@
 """This module is used to test the classes in forger.engine.manager"""
 
+import json
+from datetime import datetime, timedelta
+from urllib.request import urlopen
+
 import pytest
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+    JobExecutionEvent,
+    JobSubmissionEvent,
+)
 
 from forger.engine.manager import Manager
 from forger.engine.pipelines import Pipeline
@@ -47,3 +59,79 @@ class TestManager:
         manager, _ = manager_with_pipelines
         names = manager.get_names()
         assert set(names) == set(pipeline_samples_names)
+
+    def test_stats(self, manager_with_pipelines):
+        """
+        Test the stats method of the Manager class.
+        """
+        manager, pipelines = manager_with_pipelines
+        pipelines[0].publish()
+
+        stats = manager.stats()
+        assert set(stats) == set(manager.pipelines)
+        assert stats[pipelines[0].pid]["metrics"]["messages"] == 1
+        assert stats[pipelines[1].pid]["metrics"]["messages"] == 0
+
+    def test_serve_metrics(self, manager_with_pipelines):
+        """
+        Test the serve_metrics method of the Manager class.
+        """
+        manager, _ = manager_with_pipelines
+        server = manager.serve_metrics(port=0)
+        try:
+            with urlopen(f"http://{server.host}:{server.port}/metrics") as response:
+                assert "forger_messages_total" in response.read().decode()
+        finally:
+            server.stop()
+
+    def test__on_job_event(self, manager_with_pipelines):
+        """
+        Test the _on_job_event method of the Manager class.
+        """
+        manager, pipelines = manager_with_pipelines
+        pipeline = pipelines[0]
+        job_id = str(pipeline.pid)
+        scheduled = datetime.now(manager.Scheduler.timezone) - timedelta(seconds=0.01)
+
+        manager._on_job_event(
+            JobSubmissionEvent(EVENT_JOB_SUBMITTED, job_id, "default", [scheduled])
+        )
+        manager._on_job_event(
+            JobSubmissionEvent(
+                EVENT_JOB_MAX_INSTANCES, job_id, "default", [scheduled, scheduled]
+            )
+        )
+        manager._on_job_event(
+            JobExecutionEvent(EVENT_JOB_MISSED, job_id, "default", scheduled)
+        )
+        manager._on_job_event(
+            JobExecutionEvent(EVENT_JOB_ERROR, job_id, "default", scheduled)
+        )
+        manager._on_job_event(
+            JobExecutionEvent(EVENT_JOB_ERROR, "1337", "default", scheduled)
+        )
+
+        metrics = pipeline.metrics.get_stats()
+        assert metrics["scheduler_lag"]["count"] == 1
+        assert metrics["scheduler_lag"]["sum"] >= 0.01
+        assert metrics["skipped_runs"] == 3
+        assert metrics["errors"] == 1
+
+    def test_profile(self, manager_with_pipelines, tmp_path):
+        """
+        Test the profile method of the Manager class.
+        """
+        manager, pipelines = manager_with_pipelines
+        pipelines[-1].add_channel(name="Foo")
+        manager.Scheduler.resume()
+
+        path = tmp_path / "report.json"
+        report = manager.profile(duration=0.2, cprofile=True, path=str(path))
+        manager.Scheduler.pause()
+
+        assert {"generate", "payload", "encode", "publish", "tick"} <= set(
+            report["stages"]
+        )
+        assert report["duration"] == 0.2
+        assert "cprofile" in report
+        assert set(json.loads(path.read_text())) == set(report)
@@ -0,0 +1,110 @@
+"""This module is used to test the classes in forger.engine.measurement"""
+
+import time
+
+import pytest
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from forger.engine.broker import Broker
+from forger.engine.measurement import LatencyListener, SequenceTracker
+from forger.engine.pipelines import Pipeline
+
+
+class TestSequenceTracker:
+    @pytest.mark.parametrize(
+        "sequences,expected",
+        [
+            ([], (0, 0, 0, 0, 0)),
+            ([0, 1, 2, 3], (4, 0, 0, 0, 0)),
+            ([5, 6, 7], (3, 0, 0, 0, 0)),
+            ([0, 1, 4, 5], (4, 2, 0, 0, 0)),
+            ([0, 1, 1, 2, 2, 2], (6, 0, 3, 0, 0)),
+            ([0, 2, 1, 3], (4, 0, 0, 1, 0)),
+            ([0, 3, 1, 2, 1], (5, 0, 1, 2, 0)),
+            ([0, 10, 1], (3, 8, 0, 1, 0)),
+            ([0, 20, 5], (3, 18, 0, 1, 0)),
+            ([0, 30, 5], (3, 29, 0, 0, 1)),
+        ],
+    )
+    def test_add(self, sequences, expected):
+        """
+        Test the add and get_stats methods of the SequenceTracker class.
+        """
+        tracker = SequenceTracker(window=16)
+        for sequence in sequences:
+            tracker.add(sequence)
+
+        stats = tracker.get_stats()
+        assert (
+            stats["received"],
+            stats["lost"],
+            stats["duplicates"],
+            stats["reordered"],
+            stats["late"],
+        ) == expected
+
+    def test_window(self):
+        """
+        Test that the SequenceTracker class only remembers the last window sequence numbers.
+        """
+        tracker = SequenceTracker(window=16)
+        for sequence in range(100000):
+            tracker.add(sequence)
+        assert tracker.seen.bit_length() <= 16
+
+
+class TestLatencyListener:
+    def test_measure(self):
+        """
+        Test that the LatencyListener class measures what a pipeline with measure=True publishes.
+        """
+        with Broker() as broker:
+            listener = LatencyListener(ip=broker.host, port=broker.port, topic="foo/#")
+            pipeline = Pipeline(
+                pid=0,
+                ip=broker.host,
+                port=broker.port,
+                topic="foo/bar",
+                frequency=1,
+                scheduler=BackgroundScheduler(),
+                measure=True,
+            )
+            pipeline.add_channel(name="baz")
+
+            # wait until the subscription is active.
+            deadline = time.monotonic() + 5
+            while not listener.topics and time.monotonic() < deadline:
+                pipeline.publish()
+                time.sleep(0.05)
+
+            received = listener.get_stats()["foo/bar"]["received"]
+            for _ in range(100):
+                pipeline.publish()
+
+            while (
+                listener.get_stats()["foo/bar"]["received"] < received + 100
+                and time.monotonic() < deadline
+            ):
+                time.sleep(0.01)
+
+            listener.disconnect()
+            pipeline.connection.close()
+
+        stats = listener.get_stats(topic="foo/bar")["foo/bar"]
+        assert stats["received"] == received + 100
+        assert stats["duplicates"] == stats["reordered"] == stats["late"] == 0
+        assert 0 <= stats["latency"]["p50"] <= stats["latency"]["max"] < 5
+
+    def test__on_message_ignores_unmeasured(self):
+        """
+        Test that the _on_message method of the LatencyListener class skips payloads without measurement.
+        """
+
+        class Message:
+            topic = "foo"
+            payload = b'{"timestamp": "2021-08-07T00:00:00.000000", "bar": 1}'
+
+        listener = LatencyListener.__new__(LatencyListener)
+        listener.topics = {}
+        listener._on_message(None, None, Message())
+        assert listener.topics == {}
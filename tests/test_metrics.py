@@ -0,0 +1,197 @@
+"""This module is used to test the classes in forger.engine.metrics"""
+
+from urllib.request import urlopen
+
+import numpy as np
+import pytest
+
+from forger.engine.metrics import (
+    ConnectionMetrics,
+    Histogram,
+    LogHistogram,
+    MetricsServer,
+    PipelineMetrics,
+    to_prometheus,
+)
+
+
+@pytest.fixture()
+def stats():
+    metrics = PipelineMetrics()
+    metrics.record_publish(size=42, duration=0.0002)
+    return {
+        0: {
+            "name": "Foo",
+            "topic": 'Bar"',
+            "metrics": metrics.get_stats(),
+            "connection": ConnectionMetrics().get_stats(),
+        }
+    }
+
+
+class TestHistogram:
+    @pytest.mark.parametrize(
+        "values,expected",
+        [
+            ([], [0, 0, 0, 0]),
+            ([0.5, 1, 1.5], [2, 3, 3, 3]),
+            ([0, 3, 10], [1, 1, 2, 3]),
+        ],
+    )
+    def test_observe(self, values, expected):
+        """
+        Test the observe and get_stats methods of the Histogram class.
+        """
+        histogram = Histogram(bounds=[1, 2, 5])
+        for value in values:
+            histogram.observe(value)
+
+        stats = histogram.get_stats()
+        assert list(stats["buckets"].values()) == expected
+        assert list(stats["buckets"])[-1] == float("inf")
+        assert stats["count"] == len(values)
+        assert stats["sum"] == sum(values)
+
+
+class TestLogHistogram:
+    @pytest.mark.parametrize(
+        "value", [0, 1, 127, 128, 129, 1000, 123456789, 2**40 + 17, 2**63 - 1]
+    )
+    def test__get_index(self, value):
+        """
+        Test the _get_index and _get_value methods of the LogHistogram class.
+        """
+        histogram = LogHistogram(precision_bits=7)
+        index = histogram._get_index(value)
+        lowest = histogram._get_value(index)
+        highest = histogram._get_value(index + 1)
+
+        assert lowest <= value < highest
+        assert (highest - lowest) <= max(1, lowest / 128)
+
+    def test_get_percentile(self):
+        """
+        Test the record and get_percentile methods of the LogHistogram class.
+        """
+        values = np.random.default_rng(42).lognormal(10, 2, 10000).astype(int)
+        histogram = LogHistogram(precision_bits=7)
+        for value in values:
+            histogram.record(value)
+
+        for percentile in [1, 50, 90, 99, 99.9]:
+            assert histogram.get_percentile(percentile) == pytest.approx(
+                np.percentile(values, percentile), rel=0.02
+            )
+        assert histogram.get_percentile(100) == values.max()
+        assert histogram.get_percentile(0) == values.min()
+
+    def test_get_stats(self):
+        """
+        Test the get_stats method of the LogHistogram class.
+        """
+        histogram = LogHistogram()
+        assert histogram.get_stats()["count"] == 0
+        assert np.isnan(histogram.get_stats()["p50"])
+
+        for value in [-5, 10, 20]:
+            histogram.record(value)
+
+        stats = histogram.get_stats(percentiles=[50])
+        assert stats == {"count": 3, "min": 0, "max": 20, "mean": 10, "p50": 10}
+
+
+class TestPipelineMetrics:
+    def test_record_publish(self):
+        """
+        Test the record_publish method of the PipelineMetrics class.
+        """
+        metrics = PipelineMetrics()
+        metrics.record_publish(size=10, duration=0.001)
+        metrics.record_publish(size=5, duration=0.002)
+
+        stats = metrics.get_stats()
+        assert stats["messages"] == 2
+        assert stats["bytes"] == 15
+        assert stats["publish_latency"]["count"] == 2
+
+
+class TestConnectionMetrics:
+    @pytest.mark.parametrize(
+        "published,completed,connects,queue_depth,reconnects",
+        [
+            (0, 0, 0, 0, 0),
+            (10, 4, 1, 6, 0),
+            (10, 10, 3, 0, 2),
+        ],
+    )
+    def test_get_stats(self, published, completed, connects, queue_depth, reconnects):
+        """
+        Test the get_stats method of the ConnectionMetrics class.
+        """
+        metrics = ConnectionMetrics()
+        metrics.published = published
+        metrics.completed = completed
+        metrics.connects = connects
+
+        stats = metrics.get_stats()
+        assert stats["queue_depth"] == queue_depth
+        assert stats["reconnects"] == reconnects
+
+
+def test_to_prometheus(stats):
+    """
+    Test the to_prometheus function
+    """
+    text = to_prometheus(stats)
+
+    assert "# TYPE forger_messages_total counter" in text
+    assert 'forger_messages_total{pipeline="0",name="Foo",topic="Bar\\""} 1' in text
+    assert "# TYPE forger_publish_latency_seconds histogram" in text
+    assert 'le="+Inf"} 1' in text
+    assert "# TYPE forger_connection_handshake_time_seconds histogram" in text
+    assert (
+        'forger_connection_handshake_time_seconds_count{pipeline="0",name="Foo",topic="Bar\\""} 0'
+        in text
+    )
+
+
+def test_to_prometheus_targets(stats):
+    """
+    Test that the to_prometheus function labels the connection metrics with their target.
+    """
+    connection = stats[0].pop("connection")
+    stats[0]["targets"] = {
+        0: {**connection, "address": "127.0.0.1:1883", "connected": True},
+        1: {
+            **connection,
+            "address": "127.0.0.1:1883",
+            "dropped": 3,
+            "connected": False,
+            "state": "reconnecting",
+        },
+    }
+    text = to_prometheus(stats)
+
+    assert "# TYPE forger_connection_connected gauge" in text
+    assert 'target="0",address="127.0.0.1:1883"} 1' in text
+    assert (
+        'forger_connection_dropped_total{pipeline="0",name="Foo",topic="Bar\\"",target="1",address="127.0.0.1:1883"} 3'
+        in text
+    )
+    assert "# TYPE forger_connection_queue_depth gauge" in text
+    assert "# TYPE forger_connection_reconnects_total counter" in text
+    assert "# TYPE forger_connection_state gauge" in text
+    assert 'target="1",address="127.0.0.1:1883",state="reconnecting"} 1' in text
+
+
+class TestMetricsServer:
+    def test_serve(self, stats):
+        """
+        Test that the MetricsServer class serves metrics via http.
+        """
+        server = MetricsServer(get_stats=lambda: stats, port=0)
+        try:
+            with urlopen(f"http://{server.host}:{server.port}/metrics") as response:
+                assert response.read().decode() == to_prometheus(stats)
+        finally:
+            server.stop()
@@ -1,8 +1,17 @@
 """This module is used to test the functions in forger.auxiliary.misc"""
 
+import numpy as np
 import pytest
 
-from forger.auxiliary.misc import count_up, datestr2num, get_new_id, get_unique_name
+from forger.auxiliary.misc import (
+    count_up,
+    datestr2num,
+    datestrs2num,
+    decode_payloads,
+    get_new_id,
+    get_unique_name,
+    to_datetime64,
+)
 
 
 @pytest.mark.parametrize(
@@ -65,3 +74,53 @@ def test_datestr2num(date_string, expected):
     Test the datestr2num function
     """
     assert expected == datestr2num(date_string=date_string)
+
+
+def test_datestrs2num():
+    """
+    Test the datestrs2num function
+    """
+    date_strings = ["2021-08-07T21:04:42.674929", "2021-08-07T21:04:43"]
+    expected = [datestr2num(date_string) for date_string in date_strings[:1]]
+    assert np.allclose(datestrs2num(date_strings)[:1], expected, rtol=0, atol=1e-10)
+    assert np.allclose(np.diff(datestrs2num(date_strings)) * 86400, 0.325071, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "timestamps,expected",
+    [
+        ([], []),
+        (["2021-08-07T00:00:00.5"], ["2021-08-07T00:00:00.500000"]),
+        ([1628294400.5], ["2021-08-07T00:00:00.500000"]),
+        ([1628294400, float("nan")], ["2021-08-07T00:00:00", "NaT"]),
+        (
+            ["2021-08-07T00:00:00", "bad", None, 0],
+            ["2021-08-07", "NaT", "NaT", "1970-01-01"],
+        ),
+    ],
+)
+def test_to_datetime64(timestamps, expected):
+    """
+    Test the to_datetime64 function
+    """
+    result = to_datetime64(timestamps)
+    assert result.dtype == np.dtype("datetime64[us]")
+    assert np.array_equal(
+        result, np.array(expected, dtype="datetime64[us]"), equal_nan=True
+    )
+
+
+@pytest.mark.parametrize(
+    "payloads,expected",
+    [
+        ([], []),
+        ([b'{"a": 1}', b'{"b": 2}'], [{"a": 1}, {"b": 2}]),
+        ([b'{"a": 1}', b"nope", b"[1]"], [{"a": 1}]),
+        ([b'{"a": 1}, {"b": 2}'], []),
+    ],
+)
+def test_decode_payloads(payloads, expected):
+    """
+    Test the decode_payloads function
+    """
+    assert decode_payloads(payloads) == expected
@@ -0,0 +1,75 @@
+"""This module is used to test the classes in forger.engine.overrun"""
+
+import pytest
+
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.engine.overrun import OverrunDetector
+
+
+def run(detector, frequency, rate, duration, start=0.0):
+    """
+    Record runs of a pipeline that achieves the given rate and return the results of all records.
+    """
+    results = []
+    count = int(duration * rate)
+    for index in range(count + 1):
+        results.append(
+            detector.record(ticks=1, frequency=frequency, now=start + index / rate)
+        )
+    return results
+
+
+class TestOverrunDetector:
+    def test_record(self):
+        """
+        Test that the record method of the OverrunDetector class measures the achieved rate.
+        """
+        detector = OverrunDetector()
+        assert not any(run(detector, frequency=100, rate=100, duration=10))
+        assert detector.achieved_rate == pytest.approx(100)
+        assert detector.target_rate == 100
+        assert not detector.overrunning
+        assert detector.get_stats()["events"] == []
+
+    def test_sustained(self):
+        """
+        Test that the OverrunDetector class only reports overruns that last for patience windows.
+        """
+        detector = OverrunDetector(window=1, patience=3)
+        results = run(detector, frequency=100, rate=50, duration=2.5)
+        assert not any(results)
+        assert detector.achieved_rate == pytest.approx(50)
+
+        results = run(detector, frequency=100, rate=50, duration=1, start=2.5)
+        assert results.count(True) == 1
+        assert detector.overrunning
+
+        run(detector, frequency=100, rate=100, duration=2, start=4)
+        assert not detector.overrunning
+        assert [event["action"] for event in detector.events] == ["recovered"]
+
+    def test_intervals(self):
+        """
+        Test that the OverrunDetector class measures low frequencies over several intervals.
+        """
+        detector = OverrunDetector(window=1, intervals=10, patience=1)
+        # one tick every two seconds. a window of one second would look like an overrun now and then.
+        assert not any(run(detector, frequency=0.5, rate=0.5, duration=100))
+        assert detector.achieved_rate == pytest.approx(0.5)
+
+    def test_reset(self):
+        """
+        Test that the reset method of the OverrunDetector class does not count a pause as overrun.
+        """
+        detector = OverrunDetector(window=1, patience=1)
+        run(detector, frequency=10, rate=10, duration=2)
+        detector.reset()
+        assert not any(run(detector, frequency=10, rate=10, duration=2, start=60))
+        assert detector.achieved_rate == pytest.approx(10)
+
+    def test_invalid_policy(self):
+        """
+        Test that the OverrunDetector class rejects unknown policies.
+        """
+        with pytest.raises(InvalidInputValueError):
+            OverrunDetector(policy="panic")
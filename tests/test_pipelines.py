@@ -1,9 +1,23 @@
 """This module is used to test the classes in forger.engine.pipelines"""
 
+import json
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
 import pytest
+from apscheduler.schedulers.background import BackgroundScheduler
 
+from forger.auxiliary.constants import SENT_KEY, SEQUENCE_KEY
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.engine.arrivals import ArrivalTrigger, Bursts
+from forger.engine.broker import Broker
 from forger.engine.channels import Channel
+from forger.engine.connections import Listener
 from forger.engine.pipelines import Pipeline
+from forger.engine.profiler import TRACER
+from forger.engine.spool import Spool
 from tests.conftest import generator_samples, generator_samples_names, pipeline_samples
 
 
@@ -22,6 +36,24 @@ def pipeline(request):
     )
 
 
+@pytest.fixture(
+    params=pipeline_samples,
+)
+def scheduled_pipeline(request):
+    """
+    Pipeline with a scheduler of its own, so its job can be looked up by id.
+    """
+    return Pipeline(
+        pid=request.param[0],
+        ip=request.param[1],
+        port=request.param[2],
+        topic=request.param[3],
+        frequency=request.param[4],
+        scheduler=BackgroundScheduler(),
+        name=request.param[6],
+    )
+
+
 @pytest.fixture()
 def pipeline_with_channels(pipeline):
     channels = []
@@ -141,3 +173,491 @@ class TestPipeline:
         Test the publish method of the Pipeline class.
         """
         pipeline.publish()
+
+    def test_publish_traced(self, pipeline):
+        """
+        Test the publish method of the Pipeline class while tracing is turned on.
+        """
+        pipeline.add_channel(name="Foo")
+        TRACER.start()
+        try:
+            pipeline.publish()
+        finally:
+            report = TRACER.stop()
+
+        assert set(report["stages"]) == {
+            "generate",
+            "payload",
+            "encode",
+            "publish",
+            "tick",
+        }
+
+    def test_get_stats(self, pipeline):
+        """
+        Test the get_stats method of the Pipeline class.
+        """
+        pipeline.add_channel(name="Foo")
+        messages = pipeline.metrics.messages
+        pipeline.publish()
+
+        stats = pipeline.get_stats()
+        assert stats["name"] == pipeline.name
+        assert stats["topic"] == pipeline.topic
+        assert stats["metrics"]["messages"] == messages + 1
+        assert stats["metrics"]["bytes"] > 0
+        assert stats["connection"]["queue_depth"] >= 0
+
+    def test_update(self, scheduled_pipeline):
+        """
+        Test the update method of the Pipeline class.
+        """
+        pipeline = scheduled_pipeline
+        connection = pipeline.connection
+        pipeline.update(frequency=pipeline.frequency * 2, topic="Updated")
+
+        assert pipeline.job.trigger.interval.total_seconds() == pytest.approx(
+            1 / pipeline.frequency
+        )
+        assert pipeline.topic != "Updated"
+
+        pipeline.publish()
+
+        assert pipeline.topic == "Updated"
+        assert pipeline.connection is connection
+
+    def test_update_paused(self, scheduled_pipeline):
+        """
+        Test that the update method of the Pipeline class does not resume a paused pipeline.
+        """
+        pipeline = scheduled_pipeline
+        pipeline.switch_state(state=False)
+        pipeline.update(frequency=5)
+        assert pipeline.job.next_run_time is None
+
+    @pytest.mark.parametrize("frequency", [0, -1])
+    def test_update_invalid_frequency(self, pipeline, frequency):
+        """
+        Test that the update method of the Pipeline class rejects invalid frequencies.
+        """
+        with pytest.raises(InvalidInputValueError):
+            pipeline.update(frequency=frequency)
+
+    def test__stamp(self, pipeline):
+        """
+        Test the _stamp method of the Pipeline class.
+        """
+        data = {}
+        pipeline._stamp(data)
+        pipeline._stamp(data)
+        assert data[SEQUENCE_KEY] == 1
+        assert data[SENT_KEY] > 0
+
+    def test_publish_measure(self, pipeline):
+        """
+        Test that the publish method of the Pipeline class adds sequence numbers if measure is turned on.
+        """
+        sent = []
+        pipeline.connection.publish = lambda topic, payload: sent.append(payload)
+        pipeline.publish()
+        pipeline.measure = True
+        pipeline.publish()
+        pipeline.publish()
+
+        payloads = [json.loads(payload) for payload in sent]
+        assert SEQUENCE_KEY not in payloads[0]
+        assert [payload[SEQUENCE_KEY] for payload in payloads[1:]] == [0, 1]
+
+    def test_share_channel(self, pipeline):
+        """
+        Test that the share_channel method of the Pipeline class evaluates shared channels once per tick.
+        """
+        other = Pipeline(
+            pid=pipeline.pid + 100,
+            ip=pipeline.connection.ip,
+            port=pipeline.connection.port,
+            topic="other",
+            frequency=pipeline.frequency,
+            scheduler=BackgroundScheduler(),
+        )
+        channel = pipeline.add_channel(name="foo", channel_type="random")
+        assert other.share_channel(channel) is channel
+        assert other.get_channels(name="foo") == [channel]
+
+        with patch.object(
+            channel.generator, "get_data", wraps=channel.generator.get_data
+        ) as get_data:
+            first = pipeline.channels.get_data(tick=1_000_000_000)
+            second = other.channels.get_data(tick=1_000_000_000)
+
+        get_data.assert_called_once()
+        assert first == second
+        assert first["timestamp"] == datetime.fromtimestamp(1).isoformat(
+            timespec="microseconds"
+        )
+        other.connection.close()
+
+    @pytest.mark.parametrize("frequency", [0.5, 1, 10, 30, 1000])
+    def test__get_tick(self, pipeline, frequency):
+        """
+        Test the _get_tick and _get_start_date methods of the Pipeline class.
+        """
+        pipeline.frequency = frequency
+        interval = round(1e9 / frequency)
+        assert pipeline._get_tick() % interval == 0
+
+        start = pipeline._get_start_date(frequency=frequency).timestamp()
+        assert start > datetime.now().timestamp() - 1e-3
+        assert round(start * frequency, 3) % 1 == 0
+
+    def test_add_target(self):
+        """
+        Test that the add_target method of the Pipeline class publishes the same payload to all targets.
+        """
+        with Broker() as primary, Broker() as mirror:
+            pipeline = Pipeline(
+                pid=0,
+                ip=primary.host,
+                port=primary.port,
+                topic="fan/out",
+                frequency=1,
+                scheduler=BackgroundScheduler(),
+            )
+            target = pipeline.add_target(ip=mirror.host, port=mirror.port)
+            assert pipeline.targets == [pipeline.connection, target]
+
+            for _ in range(5):
+                pipeline.publish()
+
+            deadline = time.time() + 5
+            while time.time() < deadline and (
+                primary.messages < 5 or mirror.messages < 5
+            ):
+                time.sleep(0.01)
+
+            assert primary.messages == mirror.messages == 5
+            assert primary.bytes == mirror.bytes
+            assert pipeline.metrics.messages == 5
+
+            stats = pipeline.get_stats()
+            assert set(stats["targets"]) == {0, 1}
+            assert stats["targets"][0]["address"] == f"{primary.host}:{primary.port}"
+            assert stats["targets"][1]["address"] == f"{mirror.host}:{mirror.port}"
+            assert stats["targets"][1]["connected"]
+
+            pipeline.remove_target(target)
+            pipeline.connection.close()
+
+    def test_add_target_backpressure(self, pipeline):
+        """
+        Test that the Pipeline class skips targets with too many waiting messages and keeps serving the others.
+        """
+        pipeline.queue_limit = 10
+        target = pipeline.add_target(
+            ip=pipeline.connection.ip, port=pipeline.connection.port
+        )
+        sent = []
+        target.publish = lambda topic, payload: sent.append(payload)
+        pipeline.connection.metrics.published = 10  # a slow broker that fell behind.
+
+        pipeline.publish()
+        pipeline.publish()
+
+        assert len(sent) == 2
+        assert pipeline.connection.metrics.dropped == 2
+        assert target.metrics.dropped == 0
+
+        pipeline.connection.metrics.completed = 10  # the broker caught up again.
+        pipeline.publish()
+        assert pipeline.connection.metrics.dropped == 2
+        assert len(sent) == 3
+        pipeline.remove_target(target)
+
+    def test_spool(self, pipeline, tmp_path):
+        """
+        Test that the Pipeline class spools messages for targets with too many waiting messages.
+        """
+        pipeline.queue_limit = 10
+        target = pipeline.add_target(
+            ip=pipeline.connection.ip,
+            port=pipeline.connection.port,
+            spool=Spool(path=str(tmp_path)),
+        )
+        target.metrics.published = 10  # a slow broker that fell behind.
+        pipeline.publish()
+        pipeline.publish()
+
+        assert target.metrics.dropped == 0
+        assert target.metrics.spooled == 2
+        pipeline.remove_target(target)
+
+    def test_remove_target(self, pipeline):
+        """
+        Test that the remove_target method of the Pipeline class rejects unknown targets and the first target.
+        """
+        target = pipeline.add_target(
+            ip=pipeline.connection.ip, port=pipeline.connection.port
+        )
+        with pytest.raises(InvalidInputValueError):
+            pipeline.remove_target(pipeline.connection)
+
+        pipeline.remove_target(target)
+        assert pipeline.targets == [pipeline.connection]
+        with pytest.raises(InvalidInputValueError):
+            pipeline.remove_target(target)
+
+    def test_targets_on_same_address(self, pipeline):
+        """
+        Test that the get_stats method of the Pipeline class keeps targets on the same address apart.
+        """
+        address = "%s:%i" % pipeline.connection.get_address()
+        first = pipeline.add_target(
+            ip=pipeline.connection.ip, port=pipeline.connection.port
+        )
+        second = pipeline.add_target(
+            ip=pipeline.connection.ip, port=pipeline.connection.port, mqtt5=True
+        )
+        first.metrics.dropped = 3
+
+        targets = pipeline.get_stats()["targets"]
+        assert set(targets) == {0, 1, 2}
+        assert {target["address"] for target in targets.values()} == {address}
+        assert [target["dropped"] for target in targets.values()] == [0, 3, 0]
+
+        # ids are not reused after a target was removed.
+        pipeline.remove_target(first)
+        third = pipeline.add_target(
+            ip=pipeline.connection.ip, port=pipeline.connection.port
+        )
+        assert set(pipeline.get_stats()["targets"]) == {0, 2, 3}
+        assert pipeline.targets == [pipeline.connection, second, third]
+        pipeline.remove_target(second)
+        pipeline.remove_target(third)
+
+    def test_per_channel(self):
+        """
+        Test that the Pipeline class publishes one message per channel name if per_channel is set.
+        """
+        received = {}
+        with Broker() as broker:
+            listener = Listener(
+                ip=broker.host,
+                port=broker.port,
+                topic="device/#",
+                on_message=lambda c, u, msg: received.setdefault(msg.topic, []).append(
+                    json.loads(msg.payload)
+                ),
+            )
+            pipeline = Pipeline(
+                pid=0,
+                ip=broker.host,
+                port=broker.port,
+                topic="device",
+                frequency=1,
+                scheduler=BackgroundScheduler(),
+                measure=True,
+                per_channel=True,
+            )
+            pipeline.add_channel(name="temp", channel_type="fixed", scale=[0, 5])
+            pipeline.add_channel(name="pressure", channel_type="random")
+            pipeline.add_channel(name="pressure", channel_type="random")
+            time.sleep(0.1)  # let the listener subscribe.
+
+            pipeline.publish()
+            pipeline.update(topic="plant")
+            pipeline.publish()
+
+            deadline = time.time() + 5
+            while time.time() < deadline and len(received) < 2:
+                time.sleep(0.01)
+
+            pipeline.connection.close()
+            listener.disconnect()
+
+        assert set(received) == {"device/temp", "device/pressure"}
+        temp = received["device/temp"][0]
+        assert set(temp) == {"timestamp", "value", SEQUENCE_KEY, SENT_KEY}
+        assert 0 <= temp["value"] <= 5
+        assert temp[SEQUENCE_KEY] == 0
+        assert pipeline.metrics.messages == 4
+        assert pipeline._topics == {
+            "temp": "plant/temp",
+            "pressure": "plant/pressure",
+        }
+
+    def test__encode(self, pipeline):
+        """
+        Test the _encode method of the Pipeline class in per_channel mode.
+        """
+        pipeline.per_channel = True
+        data = {"timestamp": "2021-01-01T00:00:00.000000", "foo": 1.5, "bar": np.nan}
+        topics, payloads = pipeline._encode(data)
+
+        assert topics == [f"{pipeline.topic}/foo", f"{pipeline.topic}/bar"]
+        assert payloads == [
+            b'{"timestamp": "2021-01-01T00:00:00.000000", "value": 1.5}',
+            b'{"timestamp": "2021-01-01T00:00:00.000000", "value": NaN}',
+        ]
+
+    @pytest.mark.parametrize(
+        "policy,frequency,batch",
+        [
+            ("throttle", 25, 1),
+            ("batch", 100, 2),
+        ],
+    )
+    def test_overrun(self, scheduled_pipeline, policy, frequency, batch):
+        """
+        Test that the Pipeline class lowers its frequency or publishes several ticks per run after an overrun.
+        """
+        pipeline = scheduled_pipeline
+        pipeline.update(frequency=100)
+        pipeline.overrun.policy = policy
+        pipeline.overrun.achieved_rate = 25
+        pipeline._handle_overrun()
+
+        assert pipeline.frequency == frequency
+        assert pipeline.batch == batch
+        assert pipeline.job.trigger.interval.total_seconds() == pytest.approx(
+            batch / frequency
+        )
+        stats = pipeline.get_stats()["overrun"]
+        assert [event["action"] for event in stats["events"]] == [policy]
+        assert stats["frequency"] == frequency
+        assert stats["batch"] == batch
+
+        messages = pipeline.metrics.messages
+        pipeline.publish()
+        assert pipeline.metrics.messages == messages + batch
+
+        pipeline.undo_overrun()
+        assert pipeline.batch == 1
+        assert pipeline.job.trigger.interval.total_seconds() == pytest.approx(
+            1 / frequency
+        )
+
+    def test_overrun_shed(self, pipeline):
+        """
+        Test that the Pipeline class stops publishing the channels that were added last after an overrun.
+        """
+        for name in ("a", "b", "c"):
+            pipeline.add_channel(name=name)
+        pipeline.overrun.policy = "shed"
+        pipeline.overrun.achieved_rate = 1
+
+        pipeline._handle_overrun()
+        assert pipeline.shed == {"c"}
+        pipeline._handle_overrun()
+        assert pipeline.shed == {"b", "c"}
+        with pytest.warns(RuntimeWarning):
+            pipeline._handle_overrun()
+        assert pipeline.shed == {"b", "c"}
+
+        data = pipeline.channels.get_data(skip=pipeline.shed)
+        assert set(data) == {"timestamp", "a"}
+        actions = [event["action"] for event in pipeline.overrun.events]
+        assert actions == ["shed", "shed", "warn"]
+
+        pipeline.undo_overrun()
+        assert pipeline.shed == set()
+
+    def test_overrun_warn(self, pipeline):
+        """
+        Test that the Pipeline class warns once per overrun.
+        """
+        pipeline.overrun.achieved_rate = 0.5
+        with pytest.warns(RuntimeWarning, match="achieves 0.5"):
+            pipeline._handle_overrun()
+        pipeline._handle_overrun()
+        assert len(pipeline.overrun.events) == 1
+
+        pipeline.overrun.add_event(action="recovered")
+        with pytest.warns(RuntimeWarning):
+            pipeline._handle_overrun()
+        assert len(pipeline.overrun.events) == 3
+
+    def test_overrun_invalid_policy(self):
+        """
+        Test that the Pipeline class rejects unknown overrun policies.
+        """
+        with pytest.raises(InvalidInputValueError):
+            Pipeline(
+                pid=0,
+                ip="127.0.0.1",
+                port=1234,
+                topic="foo",
+                frequency=1,
+                scheduler=BackgroundScheduler(),
+                overrun_policy="panic",
+            )
+
+    def test_arrivals(self):
+        """
+        Test that the Pipeline class publishes all due arrivals with their arrival time as tick.
+        """
+        pipeline = Pipeline(
+            pid=0,
+            ip="127.0.0.1",
+            port=1234,
+            topic="foo",
+            frequency=4,
+            scheduler=BackgroundScheduler(),
+            arrivals=Bursts(size=4),
+        )
+        pipeline.add_channel(name="foo", dead_frequency=1, dead_period=0.5)
+        trigger = pipeline.arrival_trigger
+        assert isinstance(trigger, ArrivalTrigger)
+        assert pipeline.job.trigger is trigger
+        start = trigger.start / 1e6
+
+        with patch.object(pipeline, "_send") as send, patch.object(
+            pipeline.channels, "get_data", wraps=pipeline.channels.get_data
+        ) as get_data, patch("forger.engine.pipelines.time", return_value=start + 1.5):
+            pipeline.publish()
+            assert send.call_count == 1
+            assert len(send.call_args[1]["payloads"]) == 8
+            ticks = [call[1]["tick"] for call in get_data.call_args_list]
+            # arrivals of a burst are 1 us apart, so each message has samples of its own.
+            assert ticks == [
+                (round(start * 1e6) + offset * 10**6 + index) * 1000
+                for offset in range(2)
+                for index in range(4)
+            ]
+
+            # nothing is due until the next burst.
+            pipeline.publish()
+            assert send.call_count == 1
+
+        pipeline.update(frequency=8)
+        assert pipeline.arrival_trigger is not trigger
+        assert pipeline.job.trigger is pipeline.arrival_trigger
+        assert pipeline.arrival_trigger.frequency == 8
+        assert pipeline.overrun.get_stats()["events"] == []
+
+    def test_arrivals_before_job(self):
+        """
+        Test that the Pipeline class publishes arrivals that are due before add_job returned.
+        """
+        scheduler = BackgroundScheduler()
+        add_job = scheduler.add_job
+
+        def add_job_and_run(func, **kwargs):
+            time.sleep(0.01)
+            func()
+            return add_job(func=func, **kwargs)
+
+        with patch.object(Pipeline, "_send") as send, patch.object(
+            scheduler, "add_job", side_effect=add_job_and_run
+        ):
+            pipeline = Pipeline(
+                pid=0,
+                ip="127.0.0.1",
+                port=1234,
+                topic="foo",
+                frequency=4,
+                scheduler=scheduler,
+                arrivals=Bursts(size=4),
+            )
+        assert send.call_count == 1
+        assert len(send.call_args[1]["payloads"]) == 4
+        pipeline.connection.close()
@@ -1,11 +1,14 @@
 """This module is used to test the classes in forger.engine.plotter"""
 
+import json
+from collections import deque
 from unittest.mock import patch
 
 import numpy as np
 import pytest
 from matplotlib.lines import Line2D
 
+from forger.auxiliary.misc import datestrs2num
 from forger.engine.plotter import Plotter
 
 
@@ -15,31 +18,92 @@ def plotter():
         return Plotter(ip="127.0.0.1", port=1234, topic="foo")
 
 
+def show(plotter, timestamp, **payload):
+    x = datestrs2num([timestamp])[0]
+    plotter._ingest(x=x, payload=payload)
+    plotter._draw_frame()
+
+
 class TestPlotter:
+    def test__process_payload(self, plotter):
+        """
+        Test the _process_payload method of the Plotter class.
+        """
+        for second in range(3):
+            plotter.buffer.append(
+                json.dumps(
+                    {
+                        "timestamp": f"2021-08-07T00:00:0{second}.000000",
+                        "foo": second,
+                        "_sequence": second,
+                    }
+                ).encode()
+            )
+        plotter.buffer.append(b"nope")
+        plotter.buffer.append(b'{"timestamp": "bad", "foo": 3}')
+
+        plotter._process_payload()
+
+        assert len(plotter.buffer) == 0
+        assert list(plotter.plots) == ["foo"]
+        assert list(plotter.data["foo"].get()[1][-3:]) == [0, 1, 2]
+
+    def test__draw_frame(self, plotter):
+        """
+        Test the _draw_frame method of the Plotter class.
+        """
+        show(plotter, "2021-08-07T00:00:00.000000", foo=1)
+        assert not plotter.redraw
+        assert plotter.background is not None
+        assert plotter.ax.get_ylim()[0] < 1 < plotter.ax.get_ylim()[1]
+
+        # data within limits only blits the lines.
+        show(plotter, "2021-08-07T00:00:00.000001", foo=1)
+        assert not plotter.redraw
+        assert plotter.plots["foo"].get_ydata()[-1] == 1
+
+        with patch.object(plotter.fig.canvas, "draw") as draw:
+            show(plotter, "2021-08-07T00:00:00.000002", foo=1)
+            draw.assert_not_called()
+            show(plotter, "2021-08-07T00:00:00.000003", foo=100)
+            draw.assert_called_once()
+
     @pytest.mark.parametrize(
-        "data,new_value,expected",
+        "limits,expected",
         [
-            (np.array([1, 2, 3, 4]), 5, np.array([2, 3, 4, 5])),
-            (
-                np.array([None, None, 1, 2, 3, None]),
-                None,
-                np.array([None, 1, 2, 3, None, None]),
-            ),
+            ((0.2, 0.8, 0.2, 0.8), False),
+            ((0.2, 1.2, 0.2, 0.8), True),
+            ((0.2, 0.8, -1, 0.8), True),
+            ((0.5, 0.5, 2, 2), True),
         ],
     )
-    def test__add_data_point(self, plotter, data, new_value, expected):
+    def test__rescale(self, plotter, limits, expected):
         """
-        Test the _add_data_point method of the Plotter class.
+        Test the _rescale method of the Plotter class.
         """
-        assert np.array_equal(
-            expected, plotter._add_data_point(data=data, new_value=new_value)
-        )
+        plotter.ax.set_xlim(0, 1)
+        plotter.ax.set_ylim(0, 1)
+        assert plotter._rescale(limits=limits) == expected
+
+        x_low, x_high = plotter.ax.get_xlim()
+        y_low, y_high = plotter.ax.get_ylim()
+        assert x_low <= limits[0] <= limits[1] < x_high
+        assert y_low < limits[2] <= limits[3] < y_high
 
-    def test__process_payload(self):
+    def test__on_message(self, plotter):
         """
-        Test the _process_payload method of the Plotter class.
+        Test the _on_message method of the Plotter class.
         """
-        pass
+
+        class Message:
+            payload = b'{"timestamp": "2021-08-07T00:00:00.000000", "foo": 1}'
+
+        plotter.buffer = deque(maxlen=2)
+        for _ in range(3):
+            plotter._on_message(None, None, Message())
+
+        assert len(plotter.buffer) == 2
+        assert plotter.dropped == 1
 
     @pytest.mark.parametrize(
         "channel,latest_x,latest_y",
@@ -70,12 +134,13 @@ class TestPlotter:
             ("nobar", 1, np.nan, 2, np.nan),
         ],
     )
-    def test__update_plot(self, plotter, channel, latest_x, latest_y, x, y):
+    def test__ingest(self, plotter, channel, latest_x, latest_y, x, y):
         """
-        Test the _update_plot method of the Plotter class.
+        Test the _ingest method of the Plotter class.
         """
         plotter._add_plot(channel=channel, latest_x=latest_x, latest_y=latest_y)
-        plotter._update_plot(channel=channel, x=x, y=y)
+        plotter._ingest(x=x, payload={channel: y, "_sequence": 1})
+        plotter._draw_frame()
         if channel in plotter.plots:
             x_data = plotter.plots[channel].get_xdata()
             y_data = plotter.plots[channel].get_ydata()
@@ -83,3 +148,4 @@ class TestPlotter:
             assert all([latest_x == xd for xd in x_data[:-1]])
             assert y_data[-1] == y
             assert all([latest_y == yd for yd in y_data[:-1]])
+        assert "_sequence" not in plotter.plots
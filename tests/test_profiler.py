@@ -0,0 +1,78 @@
+"""This module is used to test the classes in forger.engine.profiler"""
+
+import pytest
+
+from forger.engine.profiler import Tracer
+
+
+@pytest.fixture()
+def tracer():
+    return Tracer()
+
+
+def busy():
+    return sum(range(1000))
+
+
+class TestTracer:
+    def test_record(self, tracer):
+        """
+        Test the record and get_stages methods of the Tracer class.
+        """
+        tracer.record(stage="encode", duration=0.001)
+        tracer.record(stage="encode", duration=0.003)
+        tracer.record(stage="publish", duration=0.0001)
+
+        stages = tracer.get_stages()
+        assert list(stages) == ["encode", "publish"]
+        assert stages["encode"]["count"] == 2
+        assert stages["encode"]["mean"] == pytest.approx(0.002)
+        assert stages["encode"]["p50"] <= stages["encode"]["p99"]
+
+    @pytest.mark.parametrize(
+        "cprofile,memory",
+        [
+            (False, False),
+            (True, False),
+            (False, True),
+            (True, True),
+        ],
+    )
+    def test_start_and_stop(self, tracer, cprofile, memory):
+        """
+        Test the start and stop methods of the Tracer class.
+        """
+        tracer.record(stage="old", duration=1)
+        tracer.start(cprofile=cprofile, memory=memory)
+        assert tracer.enabled
+        assert tracer.stages == {}
+
+        with tracer.profiling():
+            busy()
+        tracer.record(stage="tick", duration=0.1)
+
+        report = tracer.stop(top=5)
+        assert not tracer.enabled
+        assert list(report["stages"]) == ["tick"]
+        assert ("cprofile" in report) == cprofile
+        assert ("tracemalloc" in report) == memory
+        if cprofile:
+            assert 0 < len(report["cprofile"]) <= 5
+            assert any("busy" in row["function"] for row in report["cprofile"])
+
+    def test_stop_without_profiled_code(self, tracer):
+        """
+        Test the stop method of the Tracer class when nothing was profiled.
+        """
+        tracer.start(cprofile=True)
+        assert tracer.stop()["cprofile"] == []
+
+    def test_profiling_is_exclusive(self, tracer):
+        """
+        Test that the profiling method of the Tracer class only profiles one caller at a time.
+        """
+        tracer.start(cprofile=True)
+        with tracer.profiling():
+            with tracer.profiling():
+                busy()
+        tracer.stop()
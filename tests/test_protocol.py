@@ -0,0 +1,31 @@
+"""This module is used to test the functions in forger.engine.protocol"""
+
+import pytest
+
+from forger.engine.protocol import decode_variable_integer, encode_remaining_length
+
+
+@pytest.mark.parametrize(
+    "length,expected",
+    [
+        (0, b"\x00"),
+        (127, b"\x7f"),
+        (128, b"\x80\x01"),
+        (16383, b"\xff\x7f"),
+        (2097152, b"\x80\x80\x80\x01"),
+    ],
+)
+def test_encode_remaining_length(length, expected):
+    """
+    Test the encode_remaining_length function
+    """
+    assert encode_remaining_length(length) == expected
+
+
+@pytest.mark.parametrize("value", [0, 127, 128, 16383, 2097152, 268435455])
+def test_decode_variable_integer(value):
+    """
+    Test the decode_variable_integer function
+    """
+    encoded = encode_remaining_length(value)
+    assert decode_variable_integer(b"\x00" + encoded, 1) == (value, 1 + len(encoded))
@@ -0,0 +1,211 @@
+"""This module is used to test the classes in forger.engine.recorder"""
+
+import json
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.engine.broker import Broker
+from forger.engine.connections import Connection
+from forger.engine.recorder import Recorder, Recording
+
+
+class Message:
+    def __init__(self, topic: str, payload: dict):
+        self.topic = topic
+        self.payload = json.dumps(payload).encode()
+
+
+def get_payload(second: int, **channels) -> dict:
+    return {"timestamp": f"2021-08-07T00:00:{second:02d}.000000", **channels}
+
+
+@pytest.fixture()
+def recorder(tmp_path):
+    with patch("forger.engine.recorder.Connection"):
+        recorder = Recorder(
+            ip="127.0.0.1",
+            port=1234,
+            topics="foo",
+            path=str(tmp_path),
+            segment_size=4,
+            interval=60,
+        )
+    yield recorder
+    recorder.stop()
+
+
+class TestRecorder:
+    def test_flush(self, recorder):
+        """
+        Test the flush method of the Recorder class.
+        """
+        for second in range(10):
+            recorder._on_message(
+                None, None, Message("foo", get_payload(second, a=second))
+            )
+        recorder.flush()
+
+        assert len(recorder.queue) == 0
+        assert recorder.rows == 10
+        assert [entry["rows"] for entry in recorder.index["foo"]] == [4, 4, 2]
+
+        data = Recording(recorder.path).read("foo")
+        assert list(data["a"]) == list(range(10))
+        assert data["timestamp"][3] == np.datetime64("2021-08-07T00:00:03")
+
+    def test_new_channel(self, recorder):
+        """
+        Test that the Recorder class starts a new segment when a new channel shows up.
+        """
+        recorder._on_message(None, None, Message("foo", get_payload(0, a=1)))
+        recorder.flush()
+        recorder._on_message(None, None, Message("foo", get_payload(1, a=2, b=3)))
+        recorder._on_message(None, None, Message("foo", get_payload(2, b=4)))
+        recorder._on_message(None, None, Message("bar", get_payload(2, c=None)))
+        recorder.flush()
+
+        recording = Recording(recorder.path)
+        assert sorted(recording.get_topics()) == ["bar", "foo"]
+        assert len(recording.index["foo"]) == 2
+
+        data = recording.read("foo")
+        assert np.array_equal(data["a"], [1, 2, np.nan], equal_nan=True)
+        assert np.array_equal(data["b"], [np.nan, 3, 4], equal_nan=True)
+        assert np.isnan(recording.read("bar")["c"]).all()
+
+    def test_invalid_payloads(self, recorder):
+        """
+        Test that the Recorder class drops payloads it can not record.
+        """
+
+        class Invalid:
+            topic = "foo"
+            payload = b"nope"
+
+        recorder._on_message(None, None, Invalid())
+        recorder._on_message(None, None, Message("foo", {"a": 1}))
+        recorder._on_message(None, None, Message("foo", {"timestamp": "bad", "a": 1}))
+        recorder._on_message(None, None, Message("foo", get_payload(0, a="bad")))
+        recorder.flush()
+
+        assert recorder.dropped == 3
+        assert np.isnan(Recording(recorder.path).read("foo")["a"]).all()
+
+    def test_write_error(self, recorder, caplog):
+        """
+        Test that the worker of the Recorder class drops batches it can not write and keeps going.
+        """
+
+        def wait_for(condition):
+            deadline = time.time() + 5
+            while time.time() < deadline and not condition():
+                time.sleep(0.01)
+
+        with patch.object(recorder, "_write", side_effect=OSError("disk full")):
+            recorder._on_message(None, None, Message("foo", get_payload(0, a=1)))
+            recorder._on_message(None, None, Message("foo", get_payload(1, a=2)))
+            recorder._wake.set()
+            wait_for(lambda: recorder.dropped == 2)
+
+        assert recorder._worker.is_alive()
+        assert "to a segment" in caplog.text
+        assert "disk full" in caplog.text
+        caplog.clear()
+
+        with patch.object(recorder, "_write_index", side_effect=OSError("no index")):
+            recorder._on_message(None, None, Message("foo", get_payload(1, a=2)))
+            recorder._wake.set()
+            wait_for(lambda: recorder.rows == 1)
+            wait_for(lambda: "no index" in caplog.text)
+
+        assert recorder._worker.is_alive()
+        assert "Could not write the index" in caplog.text
+        recorder._on_message(None, None, Message("foo", get_payload(2, a=3)))
+        recorder._wake.set()
+        wait_for(lambda: recorder.rows == 2)
+
+        assert recorder.dropped == 2
+        assert list(Recording(recorder.path).read("foo")["a"]) == [2, 3]
+
+    def test_continue(self, recorder):
+        """
+        Test that the Recorder class continues an existing recording.
+        """
+        recorder._on_message(None, None, Message("foo", get_payload(0, a=1)))
+        recorder.stop()
+
+        with patch("forger.engine.recorder.Connection"):
+            with Recorder(
+                ip="127.0.0.1", port=1234, topics=["foo"], path=recorder.path
+            ) as other:
+                other._on_message(None, None, Message("foo", get_payload(1, a=2)))
+
+        assert list(Recording(recorder.path).read("foo")["a"]) == [1, 2]
+
+    def test_record(self, tmp_path):
+        """
+        Test that the Recorder class records what is published on a broker.
+        """
+        with Broker() as broker:
+            recorder = Recorder(
+                ip=broker.host,
+                port=broker.port,
+                topics=["foo/#"],
+                path=str(tmp_path),
+                interval=0.01,
+            )
+            connection = Connection(ip=broker.host, port=broker.port)
+
+            # wait until the subscription is active.
+            deadline = time.monotonic() + 5
+            while not recorder.rows and time.monotonic() < deadline:
+                connection.publish("foo/bar", json.dumps(get_payload(0, a=-1)))
+                time.sleep(0.05)
+
+            for second in range(50):
+                connection.publish("foo/bar", json.dumps(get_payload(second, a=second)))
+            while recorder.rows < 50 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            recorder.stop()
+            connection.close()
+
+        data = Recording(str(tmp_path)).read("foo/bar")
+        assert list(data["a"][-50:]) == list(range(50))
+
+
+class TestRecording:
+    def test_empty(self, tmp_path):
+        """
+        Test the Recording class on a directory without recording.
+        """
+        assert Recording(str(tmp_path)).get_topics() == []
+
+    def test_read_empty(self, tmp_path):
+        """
+        Test the read method of the Recording class on topics without segments.
+        """
+        recording = Recording(str(tmp_path))
+        recording.index = {"foo": []}
+
+        data = recording.read("foo")
+        assert list(data) == ["timestamp"]
+        assert len(data["timestamp"]) == 0
+        with pytest.raises(InvalidInputValueError):
+            recording.read("bar")
+
+    def test_get_segments(self, recorder):
+        """
+        Test that the get_segments method of the Recording class memory maps the segments.
+        """
+        recorder._on_message(None, None, Message("foo", get_payload(0, a=1)))
+        recorder.flush()
+
+        segment = next(Recording(recorder.path).get_segments("foo"))
+        assert isinstance(segment, np.memmap)
+        assert len(segment) == 1
+        assert not segment.flags.writeable
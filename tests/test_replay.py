@@ -0,0 +1,205 @@
+"""This module is used to test the classes in forger.engine.replay"""
+
+import gc
+import json
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.engine.generator import Generator
+from forger.engine.replay import (
+    _LIMITS,
+    _TRACES,
+    Replay,
+    get_limits,
+    get_trace_limits,
+    intern,
+)
+
+
+class TestReplay:
+    @pytest.mark.parametrize(
+        "kwargs,seconds,expected",
+        [
+            ({"rate": 1}, [0, 0.9, 1, 3.5, 4, 5], [0, 0, 10, 30, 0, 10]),
+            ({"rate": 2}, [0, 0.5, 1.9, 2], [0, 10, 30, 0]),
+            ({"rate": 2, "speed": 2}, [0, 0.25, 0.5, 1], [0, 10, 20, 0]),
+            ({"rate": 1, "interpolate": True}, [0.5, 2.25, 3.5], [5, 22.5, 15]),
+            ({"timestamps": [0, 1, 3, 6]}, [0.5, 2.9, 3, 7.9, 8], [0, 10, 20, 30, 0]),
+            (
+                {"timestamps": [10, 11, 13, 16], "interpolate": True},
+                [2, 4.5],
+                [15, 25],
+            ),
+            (
+                {
+                    "timestamps": [
+                        "2021-08-07T00:00:00",
+                        "2021-08-07T00:00:01",
+                        "2021-08-07T00:00:02",
+                        "2021-08-07T00:00:03.5",
+                    ]
+                },
+                [1.5, 3.4, 3.6],
+                [10, 20, 30],
+            ),
+        ],
+    )
+    def test_get_block(self, kwargs, seconds, expected):
+        """
+        Test the get_block and get methods of the Replay class.
+        """
+        replay = Replay(data=[0, 10, 20, 30], **kwargs)
+        assert np.allclose(replay.get_block(np.array(seconds)), expected)
+        assert np.allclose([replay.get(second) for second in seconds], expected)
+
+    def test_get_at(self):
+        """
+        Test the get_at method of the Replay class.
+        """
+        start = datetime(2021, 8, 7)
+        replay = Replay(data=[0, 10, 20, 30], rate=10, start=start)
+        assert replay.get_at(start + timedelta(seconds=0.25)) == 20
+        assert replay.limits == [0, 30]
+        assert len(replay) == 4
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"data": []},
+            {"data": [1, 2], "timestamps": [0, 1], "rate": 1},
+            {"data": [1, 2], "timestamps": [0]},
+            {"data": [1, 2], "timestamps": [1, 1]},
+            {"data": [1, 2], "rate": 0},
+            {"data": [1, 2], "speed": -1},
+        ],
+    )
+    def test_invalid(self, kwargs):
+        """
+        Test that the Replay class rejects invalid input.
+        """
+        with pytest.raises(InvalidInputValueError):
+            Replay(**kwargs)
+
+    def test_from_file_npy(self, tmp_path):
+        """
+        Test the from_file method of the Replay class with a .npy file.
+        """
+        path = str(tmp_path / "trace.npy")
+        np.save(path, np.arange(1000, dtype=np.float32))
+
+        replay = Replay.from_file(path, rate=1, window=100)
+        assert isinstance(replay.data, np.memmap)
+        assert replay.limits == [0, 999]
+
+        seconds = np.arange(0, 1000, 7.5)
+        assert np.array_equal(replay.get_block(seconds), np.floor(seconds))
+        assert replay.get_block(np.array([0, 999])).tolist() == [0, 999]
+        assert len(replay._window[1]) <= 100
+
+        # limits are read from the sidecar file next time.
+        with open(path + ".limits.json") as file:
+            stored = json.load(file)
+        stored["limits"] = [-1, 1]
+        with open(path + ".limits.json", "w") as file:
+            json.dump(stored, file)
+        assert Replay.from_file(path).limits == [-1, 1]
+
+    def test_from_file_timestamps(self, tmp_path):
+        """
+        Test the from_file method of the Replay class with timestamps in a .npy file.
+        """
+        np.save(str(tmp_path / "data.npy"), np.array([0.0, 10, 20, 30]))
+        np.save(str(tmp_path / "time.npy"), np.array([100.0, 101, 103, 106]))
+
+        replay = Replay.from_file(
+            str(tmp_path / "data.npy"),
+            timestamps=str(tmp_path / "time.npy"),
+            interpolate=True,
+            window=2,
+        )
+        assert np.allclose(
+            replay.get_block(np.array([0.5, 2, 4.5, 7.5])), [5, 15, 25, 7.5]
+        )
+
+    def test_from_file_csv(self, tmp_path):
+        """
+        Test the from_file method of the Replay class with a .csv file.
+        """
+        path = str(tmp_path / "trace.csv")
+        with open(path, "w") as file:
+            file.write("time,value\n")
+            file.write("".join(f"{row},{row * 2}\n" for row in range(100)))
+
+        replay = Replay.from_file(path, column=1, skiprows=1, rate=10)
+        assert replay.limits == [0, 198]
+        assert replay.get(1.05) == 20
+        assert Replay.from_file(path, column=1, skiprows=1).data.filename.endswith(
+            "trace.csv.1.npy"
+        )
+
+    def test_from_file_invalid(self, tmp_path):
+        """
+        Test that the from_file method of the Replay class rejects unknown files.
+        """
+        with pytest.raises(InvalidInputValueError):
+            Replay.from_file(str(tmp_path / "trace.txt"))
+
+
+class TestIntern:
+    def test_intern(self):
+        """
+        Test that the intern function stores equal data only once.
+        """
+        first = intern([1.0, 2.0, 3.0])
+        assert intern([1, 2, 3]) is first
+        assert intern(np.array([1.0, 2.0, 3.0])) is first
+        assert intern([1.0, 2.0, 4.0]) is not first
+        assert not first.flags.writeable
+
+        compact = intern(np.array([1.0, 2.0, 3.0], dtype=np.float32))
+        assert compact is not first
+        assert compact.dtype == np.float32
+
+    def test_get_trace_limits(self):
+        """
+        Test that the limits of an interned array are only computed once, no matter how many channels use it.
+        """
+        with patch("forger.engine.replay.get_limits", wraps=get_limits) as limits:
+            generators = [
+                Generator(
+                    name=f"channel_{index}",
+                    frequency=1,
+                    channel_type="replay",
+                    dead_frequency=0,
+                    dead_period=0,
+                    scale=None,
+                    replay_data=[3.0, -1.0, np.nan, 5.0],
+                )
+                for index in range(3)
+            ]
+            assert limits.call_count == 1
+        assert all(generator.limits == [-1.0, 5.0] for generator in generators)
+        assert get_trace_limits(np.array([2.0, 1.0])) == [1.0, 2.0]
+
+    def test_intern_keeps_input_writeable(self):
+        """
+        Test that the intern function does not freeze arrays of the caller.
+        """
+        data = np.array([4.0, 5.0, 6.0])
+        interned = intern(data)
+        assert data.flags.writeable
+        data[0] = 0
+        assert interned[0] == 4
+
+    def test_intern_releases(self):
+        """
+        Test that the intern function does not keep arrays alive that are no longer used.
+        """
+        intern([7.0, 8.0, 9.0])
+        gc.collect()
+        assert not any(np.array_equal(array, [7, 8, 9]) for array in _TRACES.values())
+        assert [7.0, 9.0] not in _LIMITS.values()
@@ -0,0 +1,145 @@
+"""This module is used to test the classes in forger.engine.spool"""
+
+import os
+
+import pytest
+
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.engine.spool import RECORD, Spool
+
+
+def messages(count, start=0):
+    topics = [f"foo/{index % 3}" for index in range(start, start + count)]
+    payloads = [b"%i" % index for index in range(start, start + count)]
+    return topics, payloads
+
+
+class TestSpool:
+    def test_read(self, tmp_path):
+        """
+        Test the extend, read and commit methods of the Spool class.
+        """
+        spool = Spool(path=str(tmp_path), segment_size=1024, max_bytes=4096)
+        spool.extend(*messages(10))
+        assert len(spool) == 10
+
+        assert spool.read(count=4) == messages(4)
+        assert spool.read(count=100) == messages(6, start=4)
+        assert spool.read(count=100) == ([], [])
+        # messages are kept until they are committed.
+        assert len(spool) == 10
+        spool.commit(count=4)
+        assert len(spool) == 6
+        spool.commit(count=6)
+        assert len(spool) == 0
+        assert spool.get_stats()["spooled"] == 10
+        spool.close()
+
+    def test_rewind(self, tmp_path):
+        """
+        Test that the Spool class reads messages again that were read but not committed.
+        """
+        spool = Spool(path=str(tmp_path), segment_size=64, max_bytes=4096)
+        spool.extend(*messages(10))
+        spool.read(count=3)
+        spool.commit(count=3)
+        assert spool.read(count=5) == messages(5, start=3)
+
+        spool.rewind()
+        assert len(spool) == 7
+        assert spool.read(count=100) == messages(7, start=3)
+        spool.commit(count=7)
+        assert len(spool) == 0
+        assert spool.get_stats()["segments"] == 0
+        spool.close()
+
+    def test_segments(self, tmp_path):
+        """
+        Test that the Spool class starts new segments and deletes them once they were read.
+        """
+        spool = Spool(path=str(tmp_path), segment_size=64, max_bytes=4096)
+        spool.extend(*messages(20))
+        stats = spool.get_stats()
+        assert stats["segments"] > 1
+        assert stats["bytes"] == stats["segments"] * 64
+
+        topics, payloads = spool.read(count=20)
+        assert (topics, payloads) == messages(20)
+        assert spool.get_stats()["segments"] == stats["segments"]
+        spool.commit(count=20)
+        assert spool.get_stats()["segments"] == 0
+        assert os.listdir(tmp_path) == []
+
+        # messages that do not fit into a segment get a segment of their own.
+        spool.extend(["foo"], [b"x" * 100])
+        assert spool.read(count=1) == (["foo"], [b"x" * 100])
+        spool.commit(count=1)
+        spool.close()
+
+    def test_eviction(self, tmp_path):
+        """
+        Test that the Spool class deletes the oldest segment once max_bytes would be exceeded.
+        """
+        size = RECORD.size + len("foo/0") + 2
+        spool = Spool(path=str(tmp_path), segment_size=5 * size, max_bytes=10 * size)
+        spool.extend(*messages(15, start=10))
+
+        stats = spool.get_stats()
+        assert stats["evicted"] == 5
+        assert stats["depth"] == 10
+        assert stats["bytes"] <= 10 * size
+        assert spool.read(count=100) == messages(10, start=15)
+        spool.close()
+
+    def test_eviction_while_read(self, tmp_path):
+        """
+        Test that the Spool class only commits messages that are still there after read messages were evicted.
+        """
+        size = RECORD.size + len("foo/0") + 2
+        spool = Spool(path=str(tmp_path), segment_size=5 * size, max_bytes=10 * size)
+        spool.extend(*messages(7, start=10))
+        assert spool.read(count=7) == messages(7, start=10)
+
+        # the first segment (5 read messages) is evicted.
+        spool.extend(*messages(5, start=17))
+        assert spool.get_stats()["evicted"] == 5
+        spool.commit(count=7)
+        assert len(spool) == 5
+        assert spool.read(count=100) == messages(5, start=17)
+        spool.close()
+
+    def test_reopen(self, tmp_path):
+        """
+        Test that the Spool class continues with the messages that were not read before it was closed.
+        """
+        spool = Spool(path=str(tmp_path), segment_size=1024, max_bytes=4096)
+        spool.extend(*messages(10))
+        spool.read(count=5)
+        spool.commit(count=3)
+        spool.close()
+
+        # messages that were read but not committed are read again.
+        spool = Spool(path=str(tmp_path), segment_size=1024, max_bytes=4096)
+        assert len(spool) == 7
+        spool.extend(*messages(2, start=10))
+        assert spool.read(count=100) == messages(9, start=3)
+        spool.close()
+
+    @pytest.mark.parametrize(
+        "segment_size,max_bytes,rate",
+        [
+            (1024, 512, 1),
+            (1024, 1024, 0),
+        ],
+    )
+    def test_invalid(self, tmp_path, segment_size, max_bytes, rate):
+        """
+        Test that the Spool class rejects invalid settings.
+        """
+        with pytest.raises(InvalidInputValueError):
+            Spool(
+                path=str(tmp_path),
+                segment_size=segment_size,
+                max_bytes=max_bytes,
+                rate=rate,
+            )
@@ -0,0 +1,94 @@
+"""This module is used to test the classes in forger.engine.tls"""
+
+import ssl
+import time
+
+import pytest
+
+from forger.auxiliary.exceptions import OnConnectError
+from forger.engine.broker import Broker
+from forger.engine.connections import Connection
+from forger.engine.tls import TLSPool
+
+
+@pytest.fixture
+def broker(certificate):
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(*certificate)
+    with Broker(ssl_context=context) as broker:
+        yield broker
+
+
+def connect(broker, pool):
+    connection = Connection(ip=broker.host, port=broker.port, tls=pool)
+    deadline = time.monotonic() + 5
+    while not connection.is_connected() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return connection
+
+
+class TestTLSPool:
+    def test_resume(self, broker, certificate):
+        """
+        Test that connections of a TLSPool share its context and resume the session of the first one.
+        """
+        pool = TLSPool(ca_certs=certificate[0])
+        connections = [connect(broker, pool) for _ in range(4)]
+        connections[-1].publish(topic="foo", payload=b"bar").wait_for_publish(timeout=5)
+        for connection in connections:
+            connection.close()
+
+        assert all(
+            connection.mqtt_client._ssl_context.pool is pool
+            for connection in connections
+        )
+        assert broker.messages == 1
+        assert [connection.metrics.handshakes for connection in connections] == [1] * 4
+        assert [connection.metrics.resumed for connection in connections] == [
+            0,
+            1,
+            1,
+            1,
+        ]
+
+        stats = pool.get_stats()
+        assert stats["handshakes"] == 4
+        assert stats["resumed"] == 3
+        assert stats["sessions"] == 1
+        assert stats["handshake_time"]["count"] == 4
+        assert connections[0].metrics.get_stats()["handshake_time"]["count"] == 1
+
+    def test_reconnect(self, broker, certificate):
+        """
+        Test that a connection of a TLSPool resumes its session when it reconnects.
+        """
+        pool = TLSPool(ca_certs=certificate[0])
+        connection = Connection(
+            ip=broker.host, port=broker.port, tls=pool, min_delay=0.05, max_delay=0.05
+        )
+        deadline = time.monotonic() + 5
+        while not connection.metrics.connects and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for session in list(broker.sessions):
+            broker._loop.call_soon_threadsafe(session.transport.close)
+        while connection.metrics.connects < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        connection.close()
+
+        assert connection.metrics.reconnects == 1
+        assert connection.metrics.resumed == 1
+
+    def test_untrusted(self, broker):
+        """
+        Test that a TLSPool refuses brokers with a certificate it does not trust.
+        """
+        with pytest.raises(OnConnectError):
+            Connection(ip=broker.host, port=broker.port, tls=TLSPool())
+
+    def test_insecure(self, broker):
+        """
+        Test that a TLSPool without verification accepts any certificate.
+        """
+        connection = connect(broker, TLSPool(verify=False))
+        connection.close()
+        assert connection.metrics.connects == 1
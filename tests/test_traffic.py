@@ -0,0 +1,210 @@
+"""This module is used to test the classes in forger.engine.traffic"""
+
+import time
+from unittest.mock import patch
+
+import pytest
+
+from forger.auxiliary.exceptions import InvalidInputValueError
+from forger.engine.broker import Broker
+from forger.engine.connections import Connection
+from forger.engine.traffic import Capture, Playback, TrafficLog
+
+
+class Message:
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+@pytest.fixture()
+def capture(tmp_path):
+    with patch("forger.engine.traffic.Listener"):
+        capture = Capture(
+            ip="127.0.0.1",
+            port=1234,
+            topics="foo",
+            path=str(tmp_path / "log.bin"),
+            interval=60,
+        )
+    yield capture
+    capture.stop()
+
+
+class TestCapture:
+    def test_flush(self, capture):
+        """
+        Test the flush method of the Capture class.
+        """
+        for number in range(5):
+            capture._on_message(None, None, Message(f"foo/{number % 2}", b"x" * number))
+        capture.stop()
+
+        messages = [
+            (topic, bytes(payload)) for _, topic, payload in TrafficLog(capture.path)
+        ]
+        assert messages == [(f"foo/{number % 2}", b"x" * number) for number in range(5)]
+
+    def test_append(self, capture):
+        """
+        Test that the Capture class appends new sessions to an existing log.
+        """
+        capture._on_message(None, None, Message("foo", b"1"))
+        capture.stop()
+
+        with patch("forger.engine.traffic.Listener"):
+            with Capture(
+                ip="127.0.0.1", port=1234, topics=["bar", "baz"], path=capture.path
+            ) as other:
+                other._on_message(None, None, Message("bar", b"2"))
+                other._on_message(None, None, Message("foo", b"3"))
+
+        stats = TrafficLog(capture.path).get_stats()
+        assert stats["messages"] == 3
+        assert stats["bytes"] == 3
+        assert stats["topics"] == ["bar", "foo"]
+        arrivals = [arrival for arrival, _, _ in TrafficLog(capture.path)]
+        assert arrivals == sorted(arrivals)
+
+    def test_many_topics(self, capture):
+        """
+        Test that the Capture class handles more topics than fit into 2 bytes.
+        """
+        for number in range(70000):
+            capture._on_message(None, None, Message(f"foo/{number}", b"x"))
+        capture.stop()
+
+        stats = TrafficLog(capture.path).get_stats()
+        assert stats["messages"] == 70000
+        assert len(stats["topics"]) == 70000
+
+
+class TestTrafficLog:
+    def test_break(self, capture):
+        """
+        Test that the TrafficLog class closes the file when iteration stops early.
+        """
+        for _ in range(3):
+            capture._on_message(None, None, Message("foo", b"bar"))
+        capture.stop()
+
+        for _, _, payload in TrafficLog(capture.path):
+            break
+        with pytest.raises(ValueError):
+            bytes(payload)
+
+    def test_empty(self, tmp_path):
+        """
+        Test the TrafficLog class with an empty file.
+        """
+        (tmp_path / "log.bin").write_bytes(b"")
+        assert TrafficLog(str(tmp_path / "log.bin")).get_stats()["messages"] == 0
+
+    def test_truncated(self, capture):
+        """
+        Test that the TrafficLog class stops at a record that was only partially written.
+        """
+        for number in range(3):
+            capture._on_message(None, None, Message(f"foo/{number}", b"bar"))
+        capture.stop()
+
+        with open(capture.path, "rb") as file:
+            data = file.read()
+        expected = [
+            (topic, bytes(payload)) for _, topic, payload in TrafficLog(capture.path)
+        ]
+        assert len(expected) == 3
+
+        for end in range(len(data)):
+            with open(capture.path, "wb") as file:
+                file.write(data[:end])
+            messages = [
+                (topic, bytes(payload))
+                for _, topic, payload in TrafficLog(capture.path)
+            ]
+            assert messages == expected[: len(messages)]
+
+    def test_invalid(self, tmp_path):
+        """
+        Test that the TrafficLog class rejects files that are no traffic log.
+        """
+        (tmp_path / "log.bin").write_bytes(b"nope")
+        with pytest.raises(InvalidInputValueError):
+            list(TrafficLog(str(tmp_path / "log.bin")))
+
+
+class TestPlayback:
+    @pytest.mark.parametrize(
+        "speed,minimum,maximum",
+        [
+            (1, 0.2, 2),
+            (10, 0.02, 0.2),
+            (0, 0, 0.05),
+        ],
+    )
+    def test_run(self, capture, speed, minimum, maximum):
+        """
+        Test that the Playback class keeps the timing of the captured messages.
+        """
+        with patch(
+            "forger.engine.traffic.time.time_ns",
+            side_effect=[0, 100_000_000, 200_000_000],
+        ):
+            for number in range(3):
+                capture._on_message(None, None, Message("foo", str(number).encode()))
+        capture.stop()
+
+        with patch("forger.engine.traffic.Connection"):
+            playback = Playback(
+                path=capture.path,
+                ip="127.0.0.1",
+                port=1234,
+                speed=speed,
+                prefix="staging/",
+            )
+            start = time.perf_counter()
+            playback.run()
+            duration = time.perf_counter() - start
+
+        assert minimum <= duration < maximum
+        assert playback.messages == 3
+        assert [call[0] for call in playback.connection.publish.call_args_list] == [
+            ("staging/foo", b"0"),
+            ("staging/foo", b"1"),
+            ("staging/foo", b"2"),
+        ]
+
+    def test_capture_and_replay(self, tmp_path):
+        """
+        Test that messages captured on a broker can be replayed on another one.
+        """
+        path = str(tmp_path / "log.bin")
+        with Broker() as production, Broker() as staging:
+            capture = Capture(
+                ip=production.host,
+                port=production.port,
+                topics="fleet/#",
+                path=path,
+                interval=0.01,
+            )
+            connection = Connection(ip=production.host, port=production.port)
+
+            deadline = time.monotonic() + 5
+            while not capture.messages and time.monotonic() < deadline:
+                connection.publish("fleet/sentinel", b"")
+                time.sleep(0.05)
+            for number in range(20):
+                connection.publish(f"fleet/{number % 4}", str(number).encode())
+            while capture.messages < 21 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            capture.stop()
+            connection.close()
+
+            playback = Playback(path=path, ip=staging.host, port=staging.port, speed=0)
+            playback.start().wait(timeout=5)
+            while staging.messages < playback.messages and time.monotonic() < deadline:
+                time.sleep(0.01)
+            playback.stop()
+
+        assert playback.messages == TrafficLog(path).get_stats()["messages"] >= 21
+        assert staging.messages == playback.messages